@@ -0,0 +1,92 @@
+# Micro-benchmark for functions.language.
+#
+# Usage (from the repository root):
+#   python benchmarks/language_bench.py [--iterations N]
+
+import argparse
+import json
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from functions.language import LOCALES_DIRECTORY, Language, _cache_path  # noqa: E402
+
+CASES = [
+    ("directory_empty", ()),
+    ("error_invalid_dir", ("some/dir",)),
+    ("error_outside_directory", ("../etc", ROOT)),
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+from functions.language import language
+imported = time.perf_counter()
+language.get("directory_empty")
+first_get = time.perf_counter()
+print((imported - start) * 1000, (first_get - imported) * 1000)
+"""
+
+
+class NaiveLanguage:
+    """The previous implementation: json dict lookup plus str.format per call."""
+
+    def __init__(self, language_code="en"):
+        with open(LOCALES_DIRECTORY / f"{language_code}.json", encoding="utf-8") as f:
+            self.translations = json.load(f).get(language_code, {})
+
+    def get(self, key, *args, default=None):
+        message = self.translations.get(key, default or f"Missing translation: {key}")
+        try:
+            return message.format(*args)
+        except (IndexError, KeyError):
+            return message
+
+
+def bench_get(iterations):
+    print(f"get() throughput ({iterations} calls per case)")
+    for name, implementation in (("naive", NaiveLanguage()), ("compiled", Language())):
+        for key, args in CASES:
+            seconds = timeit.timeit(
+                lambda: implementation.get(key, *args), number=iterations
+            )
+            print(f"  {name:9} {key:25} {iterations / seconds:12,.0f} calls/s")
+
+
+def bench_import(runs):
+    cache_file = _cache_path((LOCALES_DIRECTORY / "en.json").resolve())
+    print(f"import + first get() (best of {runs}, ms)")
+    for label, cold in (("cold cache", True), ("warm cache", False)):
+        best = None
+        for _ in range(runs):
+            if cold and cache_file.exists():
+                cache_file.unlink()
+            output = subprocess.run(
+                [sys.executable, "-c", IMPORT_SNIPPET],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            timings = (float(output[0]), float(output[1]))
+            if best is None or sum(timings) < sum(best):
+                best = timings
+        print(f"  {label:10} import={best[0]:.2f}  first_get={best[1]:.3f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark functions.language")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--import-runs", type=int, default=5)
+    args = parser.parse_args()
+    bench_get(args.iterations)
+    bench_import(args.import_runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+# bench.py
+#
+# Throughput benchmarks for the calculator.
+#
+# Regression suite:
+#   python bench.py run --output benchmarks/baseline.json
+#   ...change the parser or evaluator...
+#   python bench.py run --output benchmarks/current.json
+#   python bench.py compare benchmarks/baseline.json benchmarks/current.json
+#
+# Ad-hoc reports: python bench.py evaluate | render | workbook
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pkg.calculator import Calculator
+from pkg.render import RENDERERS, BufferedRecordWriter, format_json_output
+from pkg.workbook import Workbook
+
+
+class LegacyCalculator:
+    """The original split + two-stack evaluator, kept as a baseline."""
+
+    def __init__(self):
+        self.operators = {
+            "+": lambda a, b: a + b,
+            "-": lambda a, b: a - b,
+            "*": lambda a, b: a * b,
+            "/": lambda a, b: a / b,
+        }
+        self.precedence = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+    def evaluate(self, expression):
+        if not expression or expression.isspace():
+            return None
+        values = []
+        operators = []
+        for token in expression.strip().split():
+            if token in self.operators:
+                while (
+                    operators
+                    and self.precedence[operators[-1]] >= self.precedence[token]
+                ):
+                    self._apply_operator(operators, values)
+                operators.append(token)
+            else:
+                values.append(float(token))
+        while operators:
+            self._apply_operator(operators, values)
+        return values[0]
+
+    def _apply_operator(self, operators, values):
+        operator = operators.pop()
+        b = values.pop()
+        a = values.pop()
+        values.append(self.operators[operator](a, b))
+
+
+def generate_expression(tokens, seed=0):
+    """Builds a mixed-precedence expression with roughly `tokens` tokens."""
+    rng = random.Random(seed)
+    parts = [str(rng.randint(1, 9))]
+    while len(parts) < tokens:
+        parts.append(rng.choice("+-*/"))
+        parts.append(str(rng.randint(1, 9)))
+    return " ".join(parts)
+
+
+def measure(function, seconds):
+    """Returns calls per second of `function` over roughly `seconds`."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        function()
+        calls += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def bench_evaluate(seconds):
+    print("Calculator.evaluate")
+    for label, tokens in (("short", 7), ("10k tokens", 10_000)):
+        expression = generate_expression(tokens)
+        for name, calculator in (
+            ("legacy", LegacyCalculator()),
+            ("compiled", Calculator(cache_size=0)),
+            ("cached", Calculator()),
+        ):
+            rate = measure(lambda: calculator.evaluate(expression), seconds)
+            print(f"  {label:10} {name:9} {rate:14,.0f} ops/s")
+
+
+def bench_render(records):
+    print(f"Rendering {records:,} records")
+    rng = random.Random(0)
+    pairs = [
+        (generate_expression(7, seed=i), rng.choice((float(i), i / 7)))
+        for i in range(records)
+    ]
+    with open(os.devnull, "w") as sink:
+        start = time.perf_counter()
+        for expression, result in pairs:
+            sink.write(format_json_output(expression, result))
+            sink.write("\n")
+        elapsed = time.perf_counter() - start
+    print(f"  {'format_json_output':18} {records / elapsed:14,.0f} records/s")
+    for name, renderer_class in RENDERERS.items():
+        renderer = renderer_class()
+        with open(os.devnull, "wb" if renderer.binary else "w") as sink:
+            start = time.perf_counter()
+            with BufferedRecordWriter(sink, renderer) as writer:
+                for offset in range(0, records, 1000):
+                    writer.write_batch(pairs[offset : offset + 1000])
+            elapsed = time.perf_counter() - start
+        print(f"  {name:18} {records / elapsed:14,.0f} records/s")
+
+
+def bench_workbook(cells):
+    print(f"Workbook with {cells:,} cells")
+    rng = random.Random(0)
+    layouts = {
+        "chain": lambda i: f"c{i - 1} * 1.0001 + 1",
+        "fan-out": lambda i: f"c0 * {i} + {i % 7}",
+        "random dag": lambda i: " + ".join(f"c{rng.randrange(i)}" for _ in range(3)),
+    }
+    for label, formula in layouts.items():
+        workbook = Workbook()
+        workbook.set_value("c0", 1)
+        start = time.perf_counter()
+        for i in range(1, cells):
+            workbook.set_formula(f"c{i}", formula(i))
+        built = time.perf_counter()
+        workbook.recalculate()
+        full = time.perf_counter()
+        print(
+            f"  {label:10} build {built - start:6.2f}s  "
+            f"full recalc {full - built:6.2f}s"
+        )
+        for cell in ("c0", f"c{cells // 2}", f"c{cells - 1}"):
+            start = time.perf_counter()
+            workbook.set_value(cell, 2)
+            recomputed = workbook.recalculate()
+            elapsed = time.perf_counter() - start
+            print(
+                f"  {'':10} update {cell:8} {elapsed * 1000:10.3f}ms "
+                f"({recomputed:,} cells recomputed)"
+            )
+
+
+# Regression suite: each case reports throughput (work units per second),
+# so higher is always better and comparisons are simple ratios.
+
+TOKEN_COUNTS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _repeat(tokens, first, pattern):
+    parts = [first]
+    while len(parts) < tokens:
+        parts.extend(pattern)
+    return " ".join(parts)
+
+
+SHAPES = {
+    # Random mix of + - * / over single digits
+    "mixed": generate_expression,
+    # Right-associative: every operator waits on the stack until the end
+    "power-chain": lambda tokens: _repeat(tokens, "2", ("^", "1")),
+    # Precedence flips on every operator, forcing a reduce each time
+    "alternating": lambda tokens: _repeat(tokens, "1", ("*", "1", "+", "1")),
+    # Nesting depth grows with the input
+    "nested": lambda tokens: "(" * (tokens // 2) + "1" + ")" * (tokens // 2),
+}
+
+
+def suite_cases(max_tokens):
+    """Yields (name, unit, setup) where setup() returns the callable to time."""
+    for shape, generate in SHAPES.items():
+        for tokens in TOKEN_COUNTS:
+            if tokens > max_tokens:
+                continue
+
+            def setup(generate=generate, tokens=tokens):
+                expression = generate(tokens)
+                calculator = Calculator(cache_size=0)
+                return lambda: calculator.evaluate(expression), tokens
+
+            yield f"evaluate/{shape}/{tokens}", "tokens/s", setup
+
+    def render_setup():
+        pairs = [(generate_expression(7, seed=i), i / 7) for i in range(1000)]
+
+        def run():
+            for expression, result in pairs:
+                format_json_output(expression, result)
+
+        return run, len(pairs)
+
+    yield "format_json_output", "records/s", render_setup
+
+
+def time_case(function, min_time, repeats):
+    """Returns the best seconds per call over `repeats` runs of >= min_time."""
+    best = None
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_call = elapsed / calls
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def run_suite(max_tokens, min_time, repeats, name_filter=None, out=sys.stdout):
+    results = {}
+    for name, unit, setup in suite_cases(max_tokens):
+        if name_filter and name_filter not in name:
+            continue
+        function, work = setup()
+        per_call = time_case(function, min_time, repeats)
+        results[name] = {
+            "unit": unit,
+            "value": work / per_call,
+            "seconds_per_call": per_call,
+        }
+        print(f"  {name:34} {work / per_call:16,.0f} {unit}", file=out)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "min_time": min_time,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """Returns (rows, regressions); a row is (name, baseline, current, ratio)."""
+    rows = []
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            rows.append((name, None, result["value"], None))
+            continue
+        ratio = result["value"] / reference["value"]
+        rows.append((name, reference["value"], result["value"], ratio))
+        if ratio < 1 - threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def compare_files(baseline_path, current_path, threshold, out=sys.stdout):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    rows, regressions = compare_results(baseline, current, threshold)
+    for name, before, after, ratio in rows:
+        if ratio is None:
+            print(f"  {name:34} {'new':>16} {after:16,.0f}", file=out)
+            continue
+        flag = "  REGRESSION" if name in regressions else ""
+        print(
+            f"  {name:34} {before:16,.0f} {after:16,.0f} {ratio:7.2f}x{flag}",
+            file=out,
+        )
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    for name in missing:
+        print(f"  {name:34} missing from current results", file=out)
+    print(
+        f"{len(regressions)} regression(s) beyond {threshold:.0%} "
+        f"across {len(rows)} benchmark(s)",
+        file=out,
+    )
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculator benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", help="run the regression suite")
+    run.add_argument("--output", help="write results as JSON to this file")
+    run.add_argument("--max-tokens", type=int, default=TOKEN_COUNTS[-1])
+    run.add_argument("--min-time", type=float, default=0.2)
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--filter", help="only run cases whose name contains this")
+
+    compare = commands.add_parser(
+        "compare", help="compare two result files, exit 1 on regressions"
+    )
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="flag slowdowns larger than this fraction (default: 0.10)",
+    )
+
+    legacy = commands.add_parser("evaluate", help="compare against the old evaluator")
+    legacy.add_argument("--seconds", type=float, default=1.0)
+    render = commands.add_parser("render", help="records/s for each output format")
+    render.add_argument("--records", type=int, default=200_000)
+    workbook = commands.add_parser("workbook", help="large workbook recalculation")
+    workbook.add_argument("--cells", type=int, default=100_000)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        return compare_files(args.baseline, args.current, args.threshold)
+    if args.command == "evaluate":
+        bench_evaluate(args.seconds)
+    elif args.command == "render":
+        bench_render(args.records)
+    elif args.command == "workbook":
+        bench_workbook(args.cells)
+    elif args.command == "run":
+        print("Regression suite")
+        results = run_suite(args.max_tokens, args.min_time, args.repeats, args.filter)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,140 @@
 # main.py
 
+import argparse
+import asyncio
 import sys
+from pkg.batch import evaluate_chunks
 from pkg.calculator import Calculator
-from pkg.render import format_json_output
-from config.settings import schema_get_files_info
+from pkg.render import RENDERERS, BufferedRecordWriter, format_json_output
+from pkg.server import FRAMINGS, CalculatorServer
+
+
+def run_batch(lines, writer, workers=None, chunk_size=1000, ordered=True):
+    """Writes each chunk of results as it arrives; returns the error count."""
+    errors = 0
+    for chunk in evaluate_chunks(lines, workers, chunk_size, ordered):
+        pairs = []
+        for result in chunk:
+            if result.error is None:
+                pairs.append((result.expression, result.result))
+                continue
+            errors += 1
+            if pairs:
+                writer.write_batch(pairs)
+                pairs = []
+            writer.write_error(result.line, result.expression, result.error)
+        if pairs:
+            writer.write_batch(pairs)
+        writer.flush()
+    return errors
 
 
 def main():
-    calculator = Calculator()
+    parser = argparse.ArgumentParser(description="Calculator App")
+    parser.add_argument("expression", nargs="*")
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="evaluate newline-delimited expressions from FILE (default: stdin)",
+    )
+    parser.add_argument(
+        "--file",
+        metavar="FILE",
+        help="stream a single (arbitrarily large) expression from FILE or - for stdin",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="show what the optimizer does to the expression instead of its result",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="fold constants and share repeated subexpressions before evaluating",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        help="run an evaluation server on host:port or unix:/path/to/socket",
+    )
+    parser.add_argument(
+        "--framing",
+        choices=FRAMINGS,
+        default="line",
+        help="server request framing (default: line)",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--format",
+        choices=sorted(RENDERERS),
+        default="ndjson",
+        help="batch output format (default: ndjson)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="write batch results as they complete instead of in input order",
+    )
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        server = CalculatorServer(framing=args.framing)
+        try:
+            asyncio.run(server.serve_forever(args.serve))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.batch is not None:
+        renderer = RENDERERS[args.format]()
+        out = sys.stdout.buffer if renderer.binary else sys.stdout
+        writer = BufferedRecordWriter(out, renderer)
+        options = (args.workers, args.chunk_size, not args.unordered)
+        if args.batch == "-":
+            errors = run_batch(sys.stdin, writer, *options)
+        else:
+            with open(args.batch, "r", encoding="utf-8") as f:
+                errors = run_batch(f, writer, *options)
+        return 1 if errors else 0
 
-    if len(sys.argv) <= 1:
+    calculator = Calculator(optimize=args.optimize)
+
+    if args.file is not None:
+        try:
+            if args.file == "-":
+                result = calculator.evaluate_stream(sys.stdin)
+            else:
+                with open(args.file, "r", encoding="utf-8") as f:
+                    result = calculator.evaluate_stream(f)
+            if result is None:
+                print("Error: Expression is empty or contains only whitespace.")
+                return 1
+            print(format_json_output(args.file, result))
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        return
+
+    if not args.expression:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
         print('Example: python main.py "3 + 5"')
+        print("Batch:   python main.py --batch [FILE] < expressions.txt")
+        print("Stream:  python main.py --file huge_expression.txt")
+        print("Server:  python main.py --serve 127.0.0.1:8765")
         return
 
-    expression = " ".join(sys.argv[1:])
+    expression = " ".join(args.expression)
+
+    if args.explain:
+        try:
+            print(calculator.explain(expression))
+        except Exception as e:
+            print(f"Error: {e}")
+        return
 
     try:
         result = calculator.evaluate(expression)
@@ -29,4 +148,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
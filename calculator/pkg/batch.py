@@ -0,0 +1,101 @@
+# batch.py
+
+import os
+from collections import deque, namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from itertools import islice
+
+from pkg.calculator import Calculator
+
+# One evaluated input line: result is None when error is set.
+BatchResult = namedtuple("BatchResult", ["line", "expression", "result", "error"])
+
+# Per-process calculator so worker processes keep their compile cache
+_calculator = None
+
+
+def _get_calculator():
+    global _calculator
+    if _calculator is None:
+        _calculator = Calculator()
+    return _calculator
+
+
+def numbered_expressions(lines):
+    """Yields (line number, expression) for each non-blank line."""
+    for number, line in enumerate(lines, 1):
+        expression = line.strip()
+        if expression:
+            yield number, expression
+
+
+def evaluate_chunk(chunk):
+    """Evaluates a list of (line number, expression) pairs; errors are captured."""
+    calculator = _get_calculator()
+    results = []
+    for number, expression in chunk:
+        try:
+            results.append(
+                BatchResult(number, expression, calculator.evaluate(expression), None)
+            )
+        except Exception as e:
+            results.append(BatchResult(number, expression, None, str(e)))
+    return results
+
+
+def _chunks(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def evaluate_chunks(lines, workers=None, chunk_size=1000, ordered=True):
+    """Evaluates newline-delimited expressions, yielding lists of BatchResult.
+
+    Lines are read lazily and evaluated in chunks across a process pool;
+    at most two chunks per worker are in flight, so memory stays constant
+    whatever the input size. With ordered=False chunks are yielded as they
+    complete rather than in input order. workers=1 evaluates in the current
+    process.
+    """
+    chunks = _chunks(numbered_expressions(lines), chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            yield evaluate_chunk(chunk)
+        return
+
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if ordered:
+            pending = deque()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(evaluate_chunk, chunk))
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(evaluate_chunk, chunk))
+            for future in as_completed(pending):
+                yield future.result()
+
+
+def evaluate_stream(lines, workers=None, chunk_size=1000, ordered=True):
+    """Like evaluate_chunks, but yields one BatchResult per line."""
+    for chunk in evaluate_chunks(lines, workers, chunk_size, ordered):
+        yield from chunk
@@ -1,61 +1,174 @@
 # calculator.py
 
+from collections import OrderedDict
+from itertools import chain
+from pkg.optimizer import Load, Store, explain, optimize
+from pkg.parser import NEGATE, Parser
+from pkg.tokenizer import tokenize, tokenize_stream
+from pkg.vectorized import evaluate_vectorized
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+class CompiledExpression:
+    """An expression compiled once into a flat postfix program.
+
+    The program is a list whose items are float operands, variable names,
+    NEGATE, binary operator functions and, after optimization, Load/Store
+    of shared subexpressions; the parser only emits well-formed programs,
+    so running one never has to check the stack.
+    """
+
+    __slots__ = ("expression", "program", "variables", "stats", "_value")
+
+    def __init__(self, expression, program, stats=None):
+        self.expression = expression
+        self.program = program
+        self.stats = stats
+        self.variables = tuple(
+            dict.fromkeys(item for item in program if item.__class__ is str)
+        )
+        self._value = None
+
+    def evaluate(self, variables=None):
+        if self._value is not None:
+            return self._value
+        if self.variables:
+            variables = self.check_variables(variables or {})
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        slots = {}
+        for instruction in self.program:
+            if instruction.__class__ is float:
+                push(instruction)
+            elif instruction.__class__ is str:
+                push(variables[instruction])
+            elif instruction is NEGATE:
+                stack[-1] = -stack[-1]
+            elif instruction.__class__ is Load:
+                push(slots[instruction.slot])
+            elif instruction.__class__ is Store:
+                slots[instruction.slot] = stack[-1]
+            else:
+                b = pop()
+                stack[-1] = instruction(stack[-1], b)
+        if self.variables:
+            return stack[0]
+        self._value = stack[0]
+        return self._value
+
+    def check_variables(self, variables):
+        for name in self.variables:
+            if name not in variables:
+                raise ValueError(f"undefined variable: {name}")
+        return variables
+
+
+class _Reducer:
+    """Evaluates postfix items as the parser emits them.
+
+    Operands are folded into their operator as soon as it is emitted, so
+    the stack only ever holds values still waiting on an operator.
+    """
+
+    __slots__ = ("stack", "variables")
+
+    def __init__(self, variables):
+        self.stack = []
+        self.variables = variables
+
+    def emit(self, item):
+        stack = self.stack
+        if item.__class__ is float:
+            stack.append(item)
+        elif item.__class__ is str:
+            if item not in self.variables:
+                raise ValueError(f"undefined variable: {item}")
+            stack.append(self.variables[item])
+        elif item is NEGATE:
+            stack[-1] = -stack[-1]
+        else:
+            b = stack.pop()
+            stack[-1] = item(stack[-1], b)
+
+
 class Calculator:
-    def __init__(self):
-        self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
-        }
-        self.precedence = {
-            "+": 1,
-            "-": 1,
-            "*": 2,
-            "/": 2,
-        }
-
-    def evaluate(self, expression):
+    """Compiles expressions to postfix programs and caches the last `cache_size`.
+
+    With optimize=True each cold compile also runs the optimizer, which folds
+    constants and computes repeated subexpressions once. The pass costs
+    about as much as parsing, so it is opt-in: it pays off only for large
+    expressions with repeated subterms or programs evaluated many times,
+    while batch and server workloads of mostly unique expressions would
+    pay for it on every line.
+    """
+
+    def __init__(self, cache_size=256, optimize=False):
+        self.parser = Parser()
+        self.cache_size = cache_size
+        self.optimize = optimize
+        self._cache = OrderedDict()
+
+    def evaluate(self, expression, /, **variables):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
-
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
-
-        for token in tokens:
-            if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
-            else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+        return self.compile(expression).evaluate(variables)
+
+    def evaluate_stream(self, source, /, **variables):
+        """Evaluates one expression read incrementally from `source`.
 
-        while operators:
-            self._apply_operator(operators, values)
+        `source` is a text file object or an iterable of text chunks. Tokens
+        are reduced as they are parsed and never collected, so peak memory
+        depends on the nesting depth of the expression, not its length.
+        Nothing is cached. Error columns count from the start of the input.
+        """
+        if hasattr(source, "read"):
+            read = source.read
+            source = iter(lambda: read(STREAM_CHUNK_SIZE), "")
+        tokens = tokenize_stream(source)
+        first = next(tokens, None)
+        if first is None:
+            return None
+        reducer = _Reducer(variables)
+        self.parser.parse(chain((first,), tokens), reducer.emit)
+        return reducer.stack[0]
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+    def evaluate_batch(self, expression, /, **columns):
+        """Evaluates `expression` once per row of the given variable columns.
 
-        return values[0]
+        Columns are equal-length sequences (or scalars, which broadcast).
+        Uses NumPy arrays when available and a pure-Python loop otherwise;
+        either way division or modulo by zero yields inf/nan for that row
+        instead of raising.
+        """
+        if not expression or expression.isspace():
+            return None
+        return evaluate_vectorized(self.compile(expression), columns)
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def compile(self, expression):
+        cache = self._cache
+        compiled = cache.get(expression)
+        if compiled is not None:
+            cache.move_to_end(expression)
+            return compiled
+        program = []
+        self.parser.parse(tokenize(expression), program.append)
+        stats = None
+        if self.optimize:
+            program, stats = optimize(program)
+        compiled = CompiledExpression(expression, program, stats)
+        if self.cache_size > 0:
+            cache[expression] = compiled
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return compiled
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+    def explain(self, expression):
+        """Describes what the optimizer did to `expression`."""
+        program = []
+        self.parser.parse(tokenize(expression), program.append)
+        return explain(optimize(program)[1])
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+    def clear_cache(self):
+        self._cache.clear()
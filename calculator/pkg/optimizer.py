@@ -0,0 +1,198 @@
+# optimizer.py
+
+import math
+import operator
+from collections import namedtuple
+
+from pkg.parser import NEGATE, power
+
+OptimizationStats = namedtuple(
+    "OptimizationStats",
+    [
+        "nodes_before",
+        "nodes_after",
+        "folded",
+        "simplified",
+        "shared",
+        "program_length",
+    ],
+)
+
+
+class Load:
+    """Pushes the value saved in `slot` by an earlier Store."""
+
+    __slots__ = ("slot",)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __repr__(self):
+        return f"Load({self.slot})"
+
+
+class Store:
+    """Saves the value on top of the stack in `slot`, leaving it in place."""
+
+    __slots__ = ("slot",)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __repr__(self):
+        return f"Store({self.slot})"
+
+
+# Rewrites that hold for every float, including nan, inf and -0.0.
+# x + 0 -> x is deliberately missing: -0.0 + 0 is 0.0, not -0.0.
+_RIGHT_IDENTITIES = {
+    operator.mul: 1.0,
+    operator.truediv: 1.0,
+    operator.sub: 0.0,
+    operator.add: -0.0,
+    power: 1.0,
+}
+_LEFT_IDENTITIES = {
+    operator.mul: 1.0,
+    operator.add: -0.0,
+}
+
+
+def _is_constant(value, identity):
+    return value == identity and math.copysign(1.0, value) == math.copysign(
+        1.0, identity
+    )
+
+
+def _constant_key(value):
+    # 0.0 and -0.0 compare (and hash) equal, so the sign is part of the key
+    return (float, value, math.copysign(1.0, value))
+
+
+def optimize(program):
+    """Folds constants, applies identities and shares repeated subexpressions.
+
+    Takes a postfix program from the parser and returns an equivalent one
+    in which every distinct subexpression is computed once (later uses
+    Load the value a Store saved), together with OptimizationStats.
+    Operations that would raise, such as 1 / 0, are left for run time.
+    """
+    # Hash-consed DAG: node id -> operation (a float, a variable name or a
+    # function) and its argument node ids.
+    operations = []
+    arguments = []
+    interned = {}
+    folded = simplified = 0
+
+    def intern(key, operation, args):
+        node = interned.get(key)
+        if node is None:
+            node = interned[key] = len(operations)
+            operations.append(operation)
+            arguments.append(args)
+        return node
+
+    def constant(value):
+        return intern(_constant_key(value), value, ())
+
+    stack = []
+    for item in program:
+        if item.__class__ is float:
+            stack.append(constant(item))
+        elif item.__class__ is str:
+            stack.append(intern(item, item, ()))
+        elif item is NEGATE:
+            a = stack.pop()
+            value = operations[a]
+            if value.__class__ is float:
+                folded += 1
+                stack.append(constant(-value))
+            elif value is NEGATE:
+                simplified += 1
+                stack.append(arguments[a][0])
+            else:
+                stack.append(intern((NEGATE, a), NEGATE, (a,)))
+        else:
+            b = stack.pop()
+            a = stack.pop()
+            left, right = operations[a], operations[b]
+            if left.__class__ is float and right.__class__ is float:
+                try:
+                    value = item(left, right)
+                except (ArithmeticError, ValueError):
+                    pass
+                else:
+                    folded += 1
+                    stack.append(constant(value))
+                    continue
+            if right.__class__ is float and item in _RIGHT_IDENTITIES:
+                if _is_constant(right, _RIGHT_IDENTITIES[item]):
+                    simplified += 1
+                    stack.append(a)
+                    continue
+            if left.__class__ is float and item in _LEFT_IDENTITIES:
+                if _is_constant(left, _LEFT_IDENTITIES[item]):
+                    simplified += 1
+                    stack.append(b)
+                    continue
+            stack.append(intern((item, a, b), item, (a, b)))
+    root = stack[0]
+
+    # Count how often each reachable node is used
+    uses = [0] * len(operations)
+    uses[root] = 1
+    reachable = 0
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        reachable += 1
+        for child in arguments[node]:
+            uses[child] += 1
+            if uses[child] == 1:
+                pending.append(child)
+
+    # Emit postfix again, depth first without recursion; shared interior
+    # nodes are stored the first time and loaded afterwards.
+    output = []
+    slots = {}
+    work = [(root, False)]
+    while work:
+        node, expanded = work.pop()
+        slot = slots.get(node)
+        if slot is not None:
+            output.append(Load(slot))
+            continue
+        children = arguments[node]
+        if not children:
+            output.append(operations[node])
+        elif not expanded:
+            work.append((node, True))
+            work.extend((child, False) for child in reversed(children))
+        else:
+            output.append(operations[node])
+            if uses[node] > 1:
+                slots[node] = len(slots)
+                output.append(Store(slots[node]))
+
+    stats = OptimizationStats(
+        nodes_before=len(program),
+        nodes_after=reachable,
+        folded=folded,
+        simplified=simplified,
+        shared=len(slots),
+        program_length=len(output),
+    )
+    return output, stats
+
+
+def explain(stats):
+    """Formats OptimizationStats as a short human-readable report."""
+    return "\n".join(
+        [
+            f"nodes: {stats.nodes_before} -> {stats.nodes_after}",
+            f"program length: {stats.nodes_before} -> {stats.program_length}",
+            f"constants folded: {stats.folded}",
+            f"identities simplified: {stats.simplified}",
+            f"shared subexpressions: {stats.shared}",
+        ]
+    )
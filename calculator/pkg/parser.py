@@ -0,0 +1,129 @@
+# parser.py
+
+import math
+import operator
+
+from pkg.tokenizer import LPAREN, NAME, NUMBER, OPERATOR, RPAREN, ExpressionError
+
+# Infix operators: symbol -> (left binding power, right binding power).
+# Left-associative operators bind tighter on the right, right-associative
+# ones on the left.
+BINDING_POWERS = {
+    "+": (1, 2),
+    "-": (1, 2),
+    "*": (3, 4),
+    "/": (3, 4),
+    "%": (3, 4),
+    "**": (7, 6),
+    "^": (7, 6),
+}
+# Prefix operators: symbol -> right binding power. Binds looser than `**`,
+# so -2 ** 2 == -(2 ** 2).
+PREFIX_BINDING_POWERS = {
+    "-": 5,
+}
+
+NEGATE = operator.neg
+
+
+def power(a, b):
+    return math.pow(a, b)
+
+
+OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+    "**": power,
+    "^": power,
+}
+PREFIX_OPERATORS = {
+    "-": NEGATE,
+}
+
+
+class Parser:
+    """A Pratt parser driven by an explicit operator stack.
+
+    Each token is handled once and nesting only grows the stack, so parsing
+    is linear and never recurses, regardless of how deeply the input nests.
+    Output is a postfix program passed item by item to `emit`: floats for
+    numbers, strings for variable names, NEGATE for unary minus and
+    two-argument functions for infix operators.
+    """
+
+    def __init__(
+        self,
+        operators=OPERATORS,
+        binding_powers=BINDING_POWERS,
+        prefix_operators=PREFIX_OPERATORS,
+        prefix_binding_powers=PREFIX_BINDING_POWERS,
+    ):
+        self.operators = operators
+        self.binding_powers = binding_powers
+        self.prefix_operators = prefix_operators
+        self.prefix_binding_powers = prefix_binding_powers
+
+    def parse(self, tokens, emit):
+        # Stack entries: (right binding power, function, symbol, column);
+        # open parentheses have binding power 0 and no function.
+        stack = []
+        push = stack.append
+        operators = self.operators
+        binding_powers = self.binding_powers
+        prefix_operators = self.prefix_operators
+        expect_operand = True
+        column = 1
+
+        for kind, value, column in tokens:
+            if expect_operand:
+                if kind == NUMBER or kind == NAME:
+                    emit(value)
+                    expect_operand = False
+                elif kind == LPAREN:
+                    push((0, None, LPAREN, column))
+                elif kind == OPERATOR and value in prefix_operators:
+                    push(
+                        (
+                            self.prefix_binding_powers[value],
+                            prefix_operators[value],
+                            value,
+                            column,
+                        )
+                    )
+                elif kind == OPERATOR:
+                    raise ExpressionError(
+                        f"not enough operands for operator {value}", column
+                    )
+                else:
+                    raise ExpressionError(f"unexpected '{value}'", column)
+            elif kind == OPERATOR:
+                left_power, right_power = binding_powers[value]
+                while stack and left_power < stack[-1][0]:
+                    emit(stack.pop()[1])
+                push((right_power, operators[value], value, column))
+                expect_operand = True
+            elif kind == RPAREN:
+                while stack and stack[-1][1] is not None:
+                    emit(stack.pop()[1])
+                if not stack:
+                    raise ExpressionError("unmatched ')'", column)
+                stack.pop()
+            else:
+                shown = f"{value:g}" if kind == NUMBER else value
+                raise ExpressionError(f"unexpected '{shown}'", column)
+
+        if expect_operand:
+            if not stack:
+                raise ExpressionError("unexpected end of expression", column)
+            _, function, symbol, column = stack[-1]
+            if function is None:
+                raise ExpressionError("unclosed '('", column)
+            raise ExpressionError(f"not enough operands for operator {symbol}", column)
+        while stack:
+            _, function, symbol, column = stack.pop()
+            if function is None:
+                raise ExpressionError("unclosed '('", column)
+            emit(function)
@@ -1,16 +1,218 @@
 # render.py
 
+import csv
+import io
 import json
+import math
+import struct
+from json.encoder import encode_basestring_ascii
 
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
+def collapse_result(result):
+    """Returns whole floats as ints, so 8.0 renders as 8."""
     if isinstance(result, float) and result.is_integer():
-        result_to_dump = int(result)
-    else:
-        result_to_dump = result
+        return int(result)
+    return result
+
 
+def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     output_data = {
         "expression": expression,
-        "result": result_to_dump,
+        "result": collapse_result(result),
     }
     return json.dumps(output_data, indent=indent)
+
+
+def _json_number(value):
+    """Encodes a result the way json.dumps does, without building a dict."""
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        if value != value:
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return repr(value)
+    return str(value)
+
+
+class NDJSONRenderer:
+    """One compact JSON object per line."""
+
+    name = "ndjson"
+    binary = False
+    record = '{"expression":%s,"result":%s}\n'
+    error_record = '{"line":%d,"expression":%s,"error":%s}\n'
+
+    def header(self):
+        return ""
+
+    def encode_batch(self, pairs):
+        record = self.record
+        encode = encode_basestring_ascii
+        number = _json_number
+        return "".join(
+            [
+                record % (encode(expression), number(result))
+                for expression, result in pairs
+            ]
+        )
+
+    def encode_error(self, line, expression, error):
+        encode = encode_basestring_ascii
+        return self.error_record % (line, encode(expression), encode(error))
+
+
+class CSVRenderer:
+    """RFC 4180 CSV with an expression,result,error header."""
+
+    name = "csv"
+    binary = False
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _take(self):
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+    def header(self):
+        self._writer.writerow(("expression", "result", "error"))
+        return self._take()
+
+    def encode_batch(self, pairs):
+        self._writer.writerows(
+            [(expression, _json_number(result), "") for expression, result in pairs]
+        )
+        return self._take()
+
+    def encode_error(self, line, expression, error):
+        self._writer.writerow((expression, "", error))
+        return self._take()
+
+
+BINARY_MAGIC = b"CALC"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sBH")
+
+FLAG_INTEGER = 1
+FLAG_ERROR = 2
+FLAG_TRUNCATED = 4
+
+
+class BinaryRenderer:
+    """Fixed-width little-endian records after a 7-byte header.
+
+    Each record is a float64 result, a flags byte, the UTF-8 length of the
+    expression and the expression padded or truncated to `width` bytes.
+    Error records carry a NaN result and FLAG_ERROR; the message is not
+    stored. Fixed width allows seeking straight to record N.
+    """
+
+    name = "binary"
+    binary = True
+
+    def __init__(self, width=64):
+        self.width = width
+        self.record = struct.Struct(f"<dBH{width}s")
+
+    def header(self):
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.width)
+
+    def _pack(self, expression, result, flags):
+        encoded = expression.encode("utf-8")
+        if len(encoded) > self.width:
+            encoded = encoded[: self.width]
+            flags |= FLAG_TRUNCATED
+        return self.record.pack(result, flags, len(encoded), encoded)
+
+    def encode_batch(self, pairs):
+        pack = self._pack
+        return b"".join(
+            [
+                pack(
+                    expression,
+                    result,
+                    FLAG_INTEGER if float(result).is_integer() else 0,
+                )
+                for expression, result in pairs
+            ]
+        )
+
+    def encode_error(self, line, expression, error):
+        return self._pack(expression, math.nan, FLAG_ERROR)
+
+
+def read_binary_records(stream):
+    """Yields (expression, result) from a BinaryRenderer stream.
+
+    Integer-valued results come back as ints and error records as
+    (expression, None).
+    """
+    magic, version, width = BINARY_HEADER.unpack(stream.read(BINARY_HEADER.size))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("not a calculator binary record stream")
+    record = struct.Struct(f"<dBH{width}s")
+    while True:
+        data = stream.read(record.size * 4096)
+        if not data:
+            return
+        for result, flags, length, encoded in record.iter_unpack(data):
+            expression = encoded[:length].decode("utf-8", errors="ignore")
+            if flags & FLAG_ERROR:
+                yield expression, None
+            elif flags & FLAG_INTEGER:
+                yield expression, int(result)
+            else:
+                yield expression, result
+
+
+RENDERERS = {
+    renderer.name: renderer
+    for renderer in (NDJSONRenderer, CSVRenderer, BinaryRenderer)
+}
+
+
+class BufferedRecordWriter:
+    """Batches encoded records and writes them to `stream` in large blocks.
+
+    `stream` must be binary for renderers with binary = True.
+    """
+
+    def __init__(self, stream, renderer, buffer_size=1 << 16):
+        self.stream = stream
+        self.renderer = renderer
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+        self._append(renderer.header())
+
+    def _append(self, encoded):
+        if encoded:
+            self._parts.append(encoded)
+            self._size += len(encoded)
+            if self._size >= self.buffer_size:
+                self.flush()
+
+    def write_batch(self, pairs):
+        self._append(self.renderer.encode_batch(pairs))
+
+    def write_error(self, line, expression, error):
+        self._append(self.renderer.encode_error(line, expression, error))
+
+    def flush(self):
+        if self._parts:
+            empty = b"" if self.renderer.binary else ""
+            self.stream.write(empty.join(self._parts))
+            self._parts = []
+            self._size = 0
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
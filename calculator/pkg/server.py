@@ -0,0 +1,148 @@
+# server.py
+
+import asyncio
+import json
+import struct
+import sys
+import time
+
+from pkg.calculator import Calculator
+from pkg.render import format_json_output
+
+FRAMINGS = ("line", "length")
+LENGTH_PREFIX = struct.Struct(">I")
+MAX_REQUEST_SIZE = 1 << 20
+STATS_REQUEST = "#stats"
+# Write buffer size above which a connection waits for the client to read
+HIGH_WATER_MARK = 1 << 16
+
+
+class ConnectionStats:
+    __slots__ = ("peer", "requests", "errors", "bytes_in", "bytes_out", "started")
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.requests = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "peer": str(self.peer),
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "seconds": round(elapsed, 6),
+            "requests_per_second": (
+                round(self.requests / elapsed, 1) if elapsed > 0 else 0.0
+            ),
+        }
+
+
+class CalculatorServer:
+    """Evaluates expressions for many clients over one shared Calculator.
+
+    With "line" framing each request and response is a line; with "length"
+    framing each is a 4-byte big-endian length followed by UTF-8 text.
+    Clients may pipeline any number of requests; responses come back in
+    request order, as compact format_json_output JSON or
+    {"expression", "error"} objects. Sending "#stats" returns the
+    connection's throughput counters.
+    """
+
+    def __init__(self, calculator=None, framing="line", log=sys.stderr):
+        if framing not in FRAMINGS:
+            raise ValueError(f"unknown framing: {framing}")
+        self.calculator = calculator or Calculator(cache_size=4096)
+        self.framing = framing
+        self.log = log
+        self.active = set()
+        self.totals = {"connections": 0, "requests": 0, "errors": 0}
+
+    def respond(self, expression):
+        """Returns (response text, failed) for one request."""
+        try:
+            result = self.calculator.evaluate(expression)
+        except Exception as e:
+            return json.dumps({"expression": expression, "error": str(e)}), True
+        if result is None:
+            error = "Expression is empty or contains only whitespace."
+            return json.dumps({"expression": expression, "error": error}), True
+        return format_json_output(expression, result, indent=None), False
+
+    async def _read_request(self, reader):
+        if self.framing == "line":
+            line = await reader.readline()
+            return line or None
+        try:
+            header = await reader.readexactly(LENGTH_PREFIX.size)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return None
+        (length,) = LENGTH_PREFIX.unpack(header)
+        if length > MAX_REQUEST_SIZE:
+            raise ValueError(f"request longer than {MAX_REQUEST_SIZE} bytes")
+        return header + await reader.readexactly(length)
+
+    def _encode_response(self, response):
+        data = response.encode("utf-8")
+        if self.framing == "line":
+            return data + b"\n"
+        return LENGTH_PREFIX.pack(len(data)) + data
+
+    async def handle(self, reader, writer):
+        stats = ConnectionStats(writer.get_extra_info("peername") or "unix")
+        self.active.add(stats)
+        prefix = 0 if self.framing == "line" else LENGTH_PREFIX.size
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                stats.bytes_in += len(request)
+                expression = request[prefix:].decode("utf-8", errors="replace").strip()
+                if expression == STATS_REQUEST:
+                    response, failed = json.dumps(stats.as_dict()), False
+                else:
+                    stats.requests += 1
+                    response, failed = self.respond(expression)
+                    stats.errors += failed
+                data = self._encode_response(response)
+                stats.bytes_out += len(data)
+                writer.write(data)
+                # Keep reading pipelined requests; only wait on slow readers,
+                # and let other connections run now and then
+                if writer.transport.get_write_buffer_size() > HIGH_WATER_MARK:
+                    await writer.drain()
+                elif stats.requests % 256 == 0:
+                    await asyncio.sleep(0)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            writer.write(self._encode_response(json.dumps({"error": str(e)})))
+        finally:
+            self.active.discard(stats)
+            self.totals["connections"] += 1
+            self.totals["requests"] += stats.requests
+            self.totals["errors"] += stats.errors
+            writer.close()
+            if self.log is not None:
+                print(json.dumps(stats.as_dict()), file=self.log)
+
+    async def start(self, address):
+        """Starts listening on "host:port" or "unix:/path/to/socket"."""
+        if address.startswith("unix:"):
+            return await asyncio.start_unix_server(self.handle, address[5:])
+        host, _, port = address.rpartition(":")
+        return await asyncio.start_server(self.handle, host or None, int(port))
+
+    async def serve_forever(self, address):
+        server = await self.start(address)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,90 @@
+# tokenizer.py
+
+import re
+
+NUMBER = "number"
+NAME = "name"
+OPERATOR = "operator"
+LPAREN = "("
+RPAREN = ")"
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+        ((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)  # 1: number
+      | (\*\*|[-+*/%^()])                         # 2: operator or parenthesis
+      | ([A-Za-z_]\w*)                             # 3: variable name
+      | (\S)                                       # 4: anything else
+    """,
+    re.VERBOSE,
+)
+_SYMBOL_KINDS = {LPAREN: LPAREN, RPAREN: RPAREN}
+_WHITESPACE = re.compile(r"\s*")
+_LOOKAHEAD = 3
+
+
+class ExpressionError(ValueError):
+    """A malformed expression; `column` is the 1-based position of the problem."""
+
+    def __init__(self, message, column):
+        super().__init__(f"{message} at column {column}")
+        self.column = column
+
+
+def _token(found, offset):
+    group = found.lastindex
+    value = found.group(group)
+    column = offset + found.start(group) + 1
+    if group == 1:
+        return NUMBER, float(value), column
+    if group == 2:
+        return _SYMBOL_KINDS.get(value, OPERATOR), value, column
+    if group == 3:
+        return NAME, value, column
+    raise ExpressionError(f"invalid token: {value}", column)
+
+
+def _scan(text, offset, limit=None):
+    """Yields the tokens of `text` in one left-to-right pass.
+
+    Whitespace is skipped before each token is matched at the current
+    position, so no character is scanned twice. With a `limit`, stops
+    before the first token that ends past it.
+
+    Returns:
+        int: where scanning stopped, after any trailing whitespace.
+    """
+    end = len(text)
+    position = 0
+    while True:
+        position = _WHITESPACE.match(text, position).end()
+        if position == end:
+            return position
+        found = _TOKEN_PATTERN.match(text, position)
+        if limit is not None and found.end() > limit:
+            return position
+        yield _token(found, offset)
+        position = found.end()
+
+
+def tokenize(text, offset=0):
+    """Yields (kind, value, column) tokens of `text`, with 1-based columns."""
+    yield from _scan(text, offset)
+
+
+def tokenize_stream(chunks):
+    """Tokenizes an iterable of text chunks without joining them.
+
+    Only the unfinished tail of each chunk is carried over, so memory is
+    bounded by the chunk size rather than the input. Columns count
+    characters from the start of the whole input, newlines included.
+    """
+    buffer = ""
+    offset = 0
+    for chunk in chunks:
+        buffer += chunk
+        # A match ending this close to the end of the buffer may still grow
+        # with the next chunk ("1" -> "1e+5", "*" -> "**", "ab" -> "abc").
+        position = yield from _scan(buffer, offset, len(buffer) - _LOOKAHEAD)
+        buffer = buffer[position:]
+        offset += position
+    yield from tokenize(buffer, offset)
@@ -0,0 +1,155 @@
+# vectorized.py
+
+import math
+import operator
+from itertools import repeat
+
+from pkg.optimizer import Load, Store
+from pkg.parser import NEGATE, power
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _is_odd_integer(value):
+    return value.is_integer() and value % 2 == 1
+
+
+def safe_divide(a, b):
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def safe_modulo(a, b):
+    if b == 0:
+        return math.nan
+    return a % b
+
+
+def safe_power(a, b):
+    try:
+        return math.pow(a, b)
+    except OverflowError:
+        return -math.inf if a < 0 and _is_odd_integer(b) else math.inf
+    except ValueError:
+        if a == 0:
+            return math.copysign(math.inf, a) if _is_odd_integer(b) else math.inf
+        return math.nan
+
+
+# Row-wise replacements that follow IEEE 754 (as NumPy does) instead of raising
+SAFE_OPERATORS = {
+    operator.truediv: safe_divide,
+    operator.mod: safe_modulo,
+    power: safe_power,
+}
+
+if np is not None:
+    NUMPY_OPERATORS = {
+        operator.add: np.add,
+        operator.sub: np.subtract,
+        operator.mul: np.multiply,
+        operator.truediv: np.true_divide,
+        operator.mod: np.remainder,
+        power: np.power,
+    }
+
+
+def evaluate_vectorized(compiled, columns):
+    """Runs a compiled expression over whole columns of variable values.
+
+    Returns a float64 ndarray when NumPy is installed, otherwise a list of
+    floats. Columns that are not referenced still set the number of rows.
+    """
+    compiled.check_variables(columns)
+    if np is not None:
+        return _evaluate_numpy(compiled.program, columns)
+    return _evaluate_python(compiled.program, columns)
+
+
+def _evaluate_numpy(program, columns):
+    arrays = {
+        name: np.asarray(column, dtype=np.float64) for name, column in columns.items()
+    }
+    shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    functions = NUMPY_OPERATORS
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    slots = {}
+    with np.errstate(all="ignore"):
+        for instruction in program:
+            if instruction.__class__ is float:
+                push(instruction)
+            elif instruction.__class__ is str:
+                push(arrays[instruction])
+            elif instruction is NEGATE:
+                stack[-1] = np.negative(stack[-1])
+            elif instruction.__class__ is Load:
+                push(slots[instruction.slot])
+            elif instruction.__class__ is Store:
+                slots[instruction.slot] = stack[-1]
+            else:
+                b = pop()
+                stack[-1] = functions[instruction](stack[-1], b)
+    result = np.asarray(stack[0], dtype=np.float64)
+    if any(result is array for array in arrays.values()):
+        result = result.copy()
+    if result.shape != shape:
+        result = np.array(np.broadcast_to(result, shape))
+    return result
+
+
+def _apply(function, a, b):
+    if a.__class__ is list:
+        if b.__class__ is list:
+            return list(map(function, a, b))
+        return list(map(function, a, repeat(b, len(a))))
+    if b.__class__ is list:
+        return list(map(function, repeat(a, len(b)), b))
+    return function(a, b)
+
+
+def _evaluate_python(program, columns):
+    rows = None
+    values = {}
+    for name, column in columns.items():
+        if isinstance(column, (int, float)):
+            values[name] = float(column)
+            continue
+        values[name] = [float(value) for value in column]
+        if rows is None:
+            rows = len(values[name])
+        elif len(values[name]) != rows:
+            raise ValueError(
+                f"column {name} has {len(values[name])} rows, expected {rows}"
+            )
+    rows = 1 if rows is None else rows
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    slots = {}
+    for instruction in program:
+        if instruction.__class__ is float:
+            push(instruction)
+        elif instruction.__class__ is str:
+            push(values[instruction])
+        elif instruction is NEGATE:
+            top = stack[-1]
+            stack[-1] = [-x for x in top] if top.__class__ is list else -top
+        elif instruction.__class__ is Load:
+            push(slots[instruction.slot])
+        elif instruction.__class__ is Store:
+            slots[instruction.slot] = stack[-1]
+        else:
+            b = pop()
+            function = SAFE_OPERATORS.get(instruction, instruction)
+            stack[-1] = _apply(function, stack[-1], b)
+    result = stack[0]
+    return result if result.__class__ is list else [result] * rows
@@ -0,0 +1,138 @@
+# workbook.py
+
+from collections import defaultdict, deque
+
+from pkg.calculator import Calculator
+
+
+class CycleError(ValueError):
+    pass
+
+
+class Workbook:
+    """Named cells holding values or formulas that reference other cells.
+
+    Changing a cell only marks the cells downstream of it dirty; they are
+    recomputed, in dependency order, the next time a value is read or
+    recalculate() is called. Everything else keeps its cached value.
+    Graph walks are iterative, so long dependency chains are fine.
+    """
+
+    def __init__(self, calculator=None):
+        self.calculator = calculator or Calculator()
+        self._formulas = {}  # name -> CompiledExpression
+        self._values = {}  # name -> float, for cells computed without error
+        self._errors = {}  # name -> exception raised computing the cell
+        self._dependencies = {}  # name -> names its formula references
+        self._dependents = defaultdict(set)  # name -> names referencing it
+        self._dirty = set()
+
+    def __contains__(self, name):
+        return name in self._formulas or name in self._values
+
+    def set_value(self, name, value):
+        self._remove_formula(name)
+        self._values[name] = float(value)
+        self._errors.pop(name, None)
+        self._mark_dependents_dirty(name)
+
+    def set_formula(self, name, expression):
+        compiled = self.calculator.compile(expression)
+        self._check_cycle(name, compiled.variables)
+        self._remove_formula(name)
+        self._formulas[name] = compiled
+        self._dependencies[name] = compiled.variables
+        for dependency in compiled.variables:
+            self._dependents[dependency].add(name)
+        self._values.pop(name, None)
+        self._dirty.add(name)
+        self._mark_dependents_dirty(name)
+
+    def delete(self, name):
+        self._remove_formula(name)
+        self._values.pop(name, None)
+        self._errors.pop(name, None)
+        self._dirty.discard(name)
+        self._mark_dependents_dirty(name)
+
+    def get(self, name):
+        if self._dirty:
+            self.recalculate()
+        if name in self._errors:
+            raise self._errors[name]
+        if name not in self._values:
+            raise KeyError(name)
+        return self._values[name]
+
+    def formula(self, name):
+        compiled = self._formulas.get(name)
+        return compiled.expression if compiled is not None else None
+
+    def recalculate(self):
+        """Recomputes every dirty cell; returns how many were recomputed."""
+        dirty = self._dirty
+        if not dirty:
+            return 0
+        # Kahn's algorithm restricted to the dirty cells
+        waiting = {
+            name: sum(
+                1 for dependency in self._dependencies[name] if dependency in dirty
+            )
+            for name in dirty
+        }
+        ready = deque(name for name, count in waiting.items() if count == 0)
+        values = self._values
+        errors = self._errors
+        computed = 0
+        while ready:
+            name = ready.popleft()
+            computed += 1
+            try:
+                values[name] = self._formulas[name].evaluate(values)
+                errors.pop(name, None)
+            except Exception as e:
+                values.pop(name, None)
+                errors[name] = e
+            for dependent in self._dependents.get(name, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+        self._dirty = set()
+        return computed
+
+    def _remove_formula(self, name):
+        if self._formulas.pop(name, None) is None:
+            return
+        for dependency in self._dependencies.pop(name):
+            dependents = self._dependents[dependency]
+            dependents.discard(name)
+            if not dependents:
+                del self._dependents[dependency]
+        self._dirty.discard(name)
+
+    def _mark_dependents_dirty(self, name):
+        dirty = self._dirty
+        pending = [name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in dirty:
+                    dirty.add(dependent)
+                    pending.append(dependent)
+
+    def _check_cycle(self, name, references):
+        """Raises CycleError if `name` referencing `references` closes a loop."""
+        if name in references:
+            raise CycleError(f"cell {name} references itself")
+        references = set(references)
+        seen = {name}
+        pending = [name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent in references:
+                    raise CycleError(
+                        f"cell {name} would form a cycle through {dependent}"
+                    )
+                if dependent not in seen:
+                    seen.add(dependent)
+                    pending.append(dependent)
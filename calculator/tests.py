@@ -1,7 +1,29 @@
 # tests.py
 
+import asyncio
+import csv
+import io
+import json
+import math
+import random
+import struct
 import unittest
+from unittest import mock
+from bench import compare_results
+from pkg import vectorized
+from pkg.batch import evaluate_stream
 from pkg.calculator import Calculator
+from pkg.render import (
+    BinaryRenderer,
+    BufferedRecordWriter,
+    CSVRenderer,
+    NDJSONRenderer,
+    format_json_output,
+    read_binary_records,
+)
+from pkg.server import CalculatorServer
+from pkg.tokenizer import ExpressionError
+from pkg.workbook import CycleError, Workbook
 
 
 class TestCalculator(unittest.TestCase):
@@ -44,6 +66,350 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_parentheses(self):
+        self.assertEqual(self.calculator.evaluate("(3+5)*2"), 16)
+        self.assertEqual(self.calculator.evaluate("((2))"), 2)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-3 + 5"), 2)
+        self.assertEqual(self.calculator.evaluate("2 * -(1 - 4)"), 6)
+        self.assertEqual(self.calculator.evaluate("--2"), 2)
+
+    def test_exponentiation(self):
+        self.assertEqual(self.calculator.evaluate("2 ** 3 ** 2"), 512)
+        self.assertEqual(self.calculator.evaluate("2^-1"), 0.5)
+        self.assertEqual(self.calculator.evaluate("-2 ** 2"), -4)
+
+    def test_modulo(self):
+        self.assertEqual(self.calculator.evaluate("7 % 4 * 2"), 6)
+
+    def test_numbers(self):
+        self.assertEqual(self.calculator.evaluate("1.5e2 + .5"), 150.5)
+
+    def test_error_columns(self):
+        cases = {
+            "3 + $": 5,
+            "(3 + 5": 1,
+            "3 + 5)": 6,
+            "3 5": 3,
+            "2 * ()": 6,
+            "4 *": 3,
+        }
+        for expression, column in cases.items():
+            with self.assertRaises(ExpressionError) as context:
+                self.calculator.evaluate(expression)
+            self.assertEqual(context.exception.column, column, expression)
+            self.assertIn(f"at column {column}", str(context.exception))
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = 50_000
+        self.assertEqual(self.calculator.evaluate("(" * depth + "1" + ")" * depth), 1)
+        self.assertEqual(self.calculator.evaluate("1" + "-(1" * depth + ")" * depth), 1)
+
+    def test_long_whitespace_runs_are_linear(self):
+        # A failed match used to rescan the rest of the run from each position
+        for space in (" ", "\n"):
+            trailing = "1 + 2" + space * 50_000
+            self.assertEqual(self.calculator.evaluate(trailing), 3)
+        with self.assertRaises(ExpressionError):
+            self.calculator.evaluate("1 +" + " " * 50_000)
+
+    def test_variables(self):
+        self.assertEqual(self.calculator.evaluate("a * 2 + b", a=3, b=1), 7)
+        self.assertEqual(self.calculator.evaluate("a * 2 + b", a=1, b=1), 3)
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("a + 1")
+
+    def test_evaluate_batch(self):
+        result = self.calculator.evaluate_batch(
+            "a * 2 + b / c", a=[1, 2, 3, 0], b=[4, 1, -1, 0], c=[2, 0, 0, 0]
+        )
+        self.assertEqual(list(result[:1]), [4])
+        self.assertEqual(result[1], math.inf)
+        self.assertEqual(result[2], -math.inf)
+        self.assertTrue(math.isnan(result[3]))
+
+    def test_evaluate_batch_without_numpy(self):
+        columns = {"a": [1, 2, 3, -1], "b": [2, 0, 0, 2]}
+        with mock.patch.object(vectorized, "np", None):
+            result = self.calculator.evaluate_batch("-a % b + a / b + 2 ^ 3", **columns)
+        self.assertEqual(result[0], 9.5)
+        self.assertTrue(math.isnan(result[1]))
+        self.assertTrue(math.isnan(result[2]))
+        self.assertEqual(result[3], 8.5)
+        with mock.patch.object(vectorized, "np", None):
+            self.assertEqual(self.calculator.evaluate_batch("1 + 1", a=[1, 2]), [2, 2])
+
+    def test_evaluate_stream_across_chunk_boundaries(self):
+        expression = "12.5e+1 ** 1 - (3 * -abc) % 7 + 2 ^ 2"
+        expected = self.calculator.evaluate(expression, abc=2)
+        for size in range(1, 8):
+            chunks = [expression[i : i + size] for i in range(0, len(expression), size)]
+            self.assertEqual(
+                self.calculator.evaluate_stream(iter(chunks), abc=2), expected
+            )
+        self.assertEqual(
+            self.calculator.evaluate_stream(io.StringIO(expression), abc=2), expected
+        )
+
+    def test_evaluate_stream_whitespace_across_chunks_is_linear(self):
+        # The run crosses the default 64 KiB chunk boundary
+        source = io.StringIO("1 + 2 +" + " " * 70_000 + "3")
+        self.assertEqual(self.calculator.evaluate_stream(source), 6)
+        chunks = ["1 +"] + ["\n" * 1000] * 100 + ["2"]
+        self.assertEqual(self.calculator.evaluate_stream(iter(chunks)), 3)
+
+    def test_evaluate_stream_errors_and_empty_input(self):
+        self.assertIsNone(self.calculator.evaluate_stream(["  ", "\n"]))
+        with self.assertRaises(ExpressionError) as context:
+            self.calculator.evaluate_stream(["1 +\n", "2 $"])
+        self.assertEqual(context.exception.column, 7)
+
+    def test_compiled_expressions_are_cached(self):
+        compiled = self.calculator.compile("3 * 4 + 5")
+        self.assertIs(self.calculator.compile("3 * 4 + 5"), compiled)
+        self.assertEqual(compiled.evaluate(), 17)
+
+    def test_cache_evicts_least_recently_used(self):
+        calculator = Calculator(cache_size=2)
+        first = calculator.compile("1 + 1")
+        calculator.compile("2 + 2")
+        calculator.compile("1 + 1")
+        calculator.compile("3 + 3")
+        self.assertIs(calculator.compile("1 + 1"), first)
+        self.assertNotIn("2 + 2", calculator._cache)
+
+    def test_division_by_zero_is_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                self.calculator.evaluate("1 / 0")
+
+
+class TestOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator(optimize=True)
+        self.plain = Calculator()
+
+    def test_constant_folding(self):
+        compiled = self.calculator.compile("2 * 3 - 8 / 2 + 5")
+        self.assertEqual(compiled.program, [7.0])
+        self.assertEqual(compiled.stats.nodes_before, 9)
+        self.assertEqual(compiled.stats.folded, 4)
+
+    def test_shared_subexpressions_computed_once(self):
+        compiled = self.calculator.compile("(a * b + 1) * (a * b + 1) - (a * b)")
+        self.assertEqual(compiled.stats.nodes_after, 7)
+        self.assertEqual(compiled.stats.shared, 2)
+        self.assertEqual(compiled.evaluate({"a": 2, "b": 3}), 43)
+        self.assertEqual(
+            list(self.calculator.evaluate_batch(compiled.expression, a=[2, 1], b=3)),
+            [43, 13],
+        )
+
+    def test_identities_keep_float_semantics(self):
+        self.assertEqual(self.calculator.compile("x * 1 / 1 - 0").program, ["x"])
+        self.assertEqual(self.calculator.compile("--x ** 1").program, ["x"])
+        keeps_zero = self.calculator.compile("x + 0")
+        self.assertEqual(keeps_zero.stats.simplified, 0)
+        self.assertEqual(str(keeps_zero.evaluate({"x": -0.0})), "0.0")
+
+    def test_errors_are_not_folded(self):
+        self.assertEqual(len(self.calculator.compile("1 / 0").program), 3)
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("2 * (1 / 0)")
+
+    def test_matches_unoptimized_results(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            parts = [rng.choice(["a", "b", "2", "1", "0"])]
+            for _ in range(rng.randint(1, 12)):
+                parts += [rng.choice(["+", "-", "*", "/", "^"])]
+                parts += [rng.choice(["a", "b", "2", "1", "0", "-a"])]
+            expression = " ".join(parts)
+            try:
+                expected = self.plain.evaluate(expression, a=1.5, b=-0.0)
+            except (ArithmeticError, ValueError) as e:
+                with self.assertRaises(type(e)):
+                    self.calculator.evaluate(expression, a=1.5, b=-0.0)
+                continue
+            actual = self.calculator.evaluate(expression, a=1.5, b=-0.0)
+            self.assertEqual(repr(actual), repr(expected), expression)
+
+    def test_optimization_is_opt_in(self):
+        self.assertEqual(len(self.plain.compile("2 * 3").program), 3)
+        self.assertIsNone(self.plain.compile("2 * 3").stats)
+        self.assertIn("nodes: 3 -> 1", self.plain.explain("2 * 3"))
+
+    def test_explain(self):
+        report = self.calculator.explain("x * 1 + 2 * 3 + (x * 1 + 2 * 3)")
+        self.assertIn("nodes: 15 -> 4", report)
+
+
+class TestWorkbook(unittest.TestCase):
+    def setUp(self):
+        self.workbook = Workbook()
+        self.workbook.set_value("price", 10)
+        self.workbook.set_value("quantity", 3)
+        self.workbook.set_value("rate", 0.5)
+        self.workbook.set_formula("subtotal", "price * quantity")
+        self.workbook.set_formula("tax", "subtotal * rate")
+        self.workbook.set_formula("total", "subtotal + tax")
+        self.workbook.set_formula("discount", "rate * 2")
+
+    def test_formulas(self):
+        self.assertEqual(self.workbook.get("total"), 45)
+        self.assertEqual(self.workbook.get("discount"), 1)
+
+    def test_update_recomputes_only_downstream(self):
+        self.workbook.recalculate()
+        self.workbook.set_value("quantity", 4)
+        self.assertEqual(self.workbook.recalculate(), 3)
+        self.assertEqual(self.workbook.get("total"), 60)
+        self.workbook.set_formula("tax", "subtotal * rate * 0")
+        self.assertEqual(self.workbook.recalculate(), 2)
+        self.assertEqual(self.workbook.get("total"), 40)
+
+    def test_cycles_are_rejected(self):
+        with self.assertRaises(CycleError):
+            self.workbook.set_formula("price", "total / 2")
+        with self.assertRaises(CycleError):
+            self.workbook.set_formula("rate", "rate + 1")
+        self.assertEqual(self.workbook.get("total"), 45)
+
+    def test_errors_stay_in_their_cells(self):
+        self.workbook.set_formula("ratio", "price / missing")
+        with self.assertRaises(ValueError):
+            self.workbook.get("ratio")
+        self.assertEqual(self.workbook.get("total"), 45)
+        self.workbook.set_value("missing", 4)
+        self.assertEqual(self.workbook.get("ratio"), 2.5)
+        self.workbook.delete("missing")
+        with self.assertRaises(ValueError):
+            self.workbook.get("ratio")
+
+    def test_long_chain(self):
+        workbook = Workbook()
+        workbook.set_value("c0", 0)
+        for i in range(1, 20_000):
+            workbook.set_formula(f"c{i}", f"c{i - 1} + 1")
+        self.assertEqual(workbook.get("c19999"), 19999)
+        workbook.set_value("c0", 1)
+        self.assertEqual(workbook.get("c19999"), 20000)
+
+
+class TestBatch(unittest.TestCase):
+    lines = ["1 + 1\n", "\n", "2 * (3\n", "10 / 4\n"] * 50
+
+    def test_results_in_input_order_with_errors_per_line(self):
+        results = list(evaluate_stream(self.lines, workers=2, chunk_size=7))
+        self.assertEqual([r.line for r in results][:3], [1, 3, 4])
+        self.assertEqual(len(results), 150)
+        self.assertEqual(results[0].result, 2)
+        self.assertIn("column 5", results[1].error)
+        self.assertEqual(results[2].result, 2.5)
+
+    def test_unordered_yields_every_line(self):
+        results = evaluate_stream(self.lines, workers=2, chunk_size=7, ordered=False)
+        self.assertEqual(
+            sorted(r.line for r in results),
+            [r.line for r in evaluate_stream(self.lines, workers=1)],
+        )
+
+
+class TestRender(unittest.TestCase):
+    pairs = [("3 + 5", 8.0), ("10 / 4", 2.5), ('"x"', 1.5)]
+
+    def _render(self, renderer, stream):
+        with BufferedRecordWriter(stream, renderer, buffer_size=16) as writer:
+            writer.write_batch(self.pairs)
+            writer.write_error(4, "2 *", "not enough operands")
+        return stream.getvalue()
+
+    def test_format_json_output_collapses_whole_floats(self):
+        self.assertEqual(
+            format_json_output("3 + 5", 8.0, indent=None),
+            '{"expression": "3 + 5", "result": 8}',
+        )
+
+    def test_ndjson_matches_json_dumps(self):
+        lines = self._render(NDJSONRenderer(), io.StringIO()).splitlines()
+        expected = [json.loads(format_json_output(*pair)) for pair in self.pairs]
+        self.assertEqual([json.loads(line) for line in lines[:3]], expected)
+        self.assertEqual(json.loads(lines[3])["line"], 4)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self._render(CSVRenderer(), io.StringIO()))))
+        self.assertEqual(rows[0], ["expression", "result", "error"])
+        self.assertEqual(rows[1], ["3 + 5", "8", ""])
+        self.assertEqual(rows[4], ["2 *", "", "not enough operands"])
+
+    def test_binary_round_trip(self):
+        data = self._render(BinaryRenderer(width=4), io.BytesIO())
+        records = list(read_binary_records(io.BytesIO(data)))
+        self.assertEqual(
+            records, [("3 + ", 8), ("10 /", 2.5), ('"x"', 1.5), ("2 *", None)]
+        )
+        self.assertIsInstance(records[0][1], int)
+
+
+class TestServer(unittest.TestCase):
+    def _exchange(self, framing, requests):
+        async def run():
+            server = CalculatorServer(framing=framing, log=None)
+            listener = await server.start("127.0.0.1:0")
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            responses = []
+            if framing == "line":
+                writer.write("".join(f"{r}\n" for r in requests).encode())
+                writer.write_eof()
+                async for line in reader:
+                    responses.append(json.loads(line))
+            else:
+                for request in requests:
+                    data = request.encode()
+                    writer.write(struct.pack(">I", len(data)) + data)
+                writer.write_eof()
+                while True:
+                    header = await reader.read(4)
+                    if not header:
+                        break
+                    length = struct.unpack(">I", header)[0]
+                    responses.append(json.loads(await reader.readexactly(length)))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            return server, responses
+
+        return asyncio.run(run())
+
+    def test_pipelined_line_requests(self):
+        requests = [f"{i} * 2" for i in range(500)] + ["2 * (3", "#stats"]
+        server, responses = self._exchange("line", requests)
+        self.assertEqual(responses[0], {"expression": "0 * 2", "result": 0})
+        self.assertEqual(responses[499]["result"], 998)
+        self.assertIn("column 5", responses[500]["error"])
+        self.assertEqual(responses[501]["requests"], 501)
+        self.assertEqual(responses[501]["errors"], 1)
+
+    def test_length_prefixed_requests(self):
+        server, responses = self._exchange("length", ["3 + 5", "x"])
+        self.assertEqual(responses[0], {"expression": "3 + 5", "result": 8})
+        self.assertIn("undefined variable", responses[1]["error"])
+
+
+class TestBenchCompare(unittest.TestCase):
+    def _results(self, **values):
+        return {"results": {name: {"value": v} for name, v in values.items()}}
+
+    def test_flags_slowdowns_past_threshold_only(self):
+        baseline = self._results(fast=100.0, slow=100.0, same=100.0)
+        current = self._results(fast=150.0, slow=85.0, same=95.0, new=1.0)
+        rows, regressions = compare_results(baseline, current, threshold=0.1)
+        self.assertEqual(regressions, ["slow"])
+        self.assertIn(("new", None, 1.0, None), rows)
+        self.assertEqual(dict((r[0], r[3]) for r in rows)["fast"], 1.5)
+
 
 if __name__ == "__main__":
     unittest.main()
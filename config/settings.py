@@ -4,13 +4,75 @@ from pathlib import Path
 from google.genai import types
 
 MAX_FILE_READ_CHARS = 10000
+# Characters get_files_content returns in total, shared by all its files
+MAX_BATCH_READ_CHARS = 30000
 LANGUAGE = "en"
-WORKING_DIRECTORY = Path("/Users/pomegranate/ai-agent/calculator").resolve()
+# Upper bound on tool calls from one response running at the same time
+MAX_TOOL_WORKERS = 8
+# Where main.py keeps session logs for --resume
+SESSIONS_DIRECTORY = Path(__file__).resolve().parent.parent / "sessions"
+
+# Models the router chooses between. cost is relative; a request goes to the
+# cheapest healthy model whose max_prompt_chars (None: unlimited) fits it and
+# that has tools=True if the prompt looks like it needs the file tools.
+MODEL_ROUTES = [
+    {
+        "model": "gemini-2.0-flash-lite-001",
+        "cost": 1,
+        "max_prompt_chars": 8000,
+        "tools": False,
+    },
+    {
+        "model": "gemini-2.0-flash-001",
+        "cost": 4,
+        "max_prompt_chars": None,
+        "tools": True,
+    },
+]
+# A model whose p95 latency (seconds) or error rate over its last
+# ROUTER_WINDOW requests exceeds these is tried after healthy ones
+ROUTER_LATENCY_BUDGET = 10.0
+ROUTER_MAX_ERROR_RATE = 0.25
+ROUTER_WINDOW = 50
+ROUTER_STATS_FILE = SESSIONS_DIRECTORY / "router_stats.json"
+
+# Context caching: the system prompt, tool declarations and earlier turns are
+# sent as a server-side cached-content handle once they are at least
+# CONTEXT_CACHE_MIN_TOKENS (estimated); a longer handle is made when the
+# uncached history has grown by CONTEXT_CACHE_MIN_GROWTH_TOKENS. Handles live
+# CONTEXT_CACHE_TTL seconds and are extended when less than
+# CONTEXT_CACHE_REFRESH is left; a model that refuses caching is retried after
+# CONTEXT_CACHE_RETRY seconds
+CONTEXT_CACHE_ENABLED = True
+CONTEXT_CACHE_FILE = SESSIONS_DIRECTORY / "context_cache.json"
+CONTEXT_CACHE_TTL = 3600
+CONTEXT_CACHE_REFRESH = 600
+CONTEXT_CACHE_MIN_TOKENS = 4096
+CONTEXT_CACHE_MIN_GROWTH_TOKENS = 8192
+CONTEXT_CACHE_RETRY = 3600
 
-if not WORKING_DIRECTORY.is_dir():
-    raise ValueError(
-        f"Working directory '{WORKING_DIRECTORY}' does not exist or is not a directory"
-    )
+# Prometheus metrics: serve them on HOST:PORT while running and/or write
+# them to a file at exit (both off by default)
+METRICS_ADDRESS = None
+METRICS_FILE = None
+
+# Default report path for --profile-memory
+MEMORY_REPORT_FILE = SESSIONS_DIRECTORY / "memory_profile.json"
+# Default workspace for the tools, and the directory that workspaces given
+# as plain paths must lie within; see functions/workspace.py
+WORKING_DIRECTORY = Path("/Users/pomegranate/ai-agent/calculator").resolve()
+# Seconds run_python_file lets a script run
+EXECUTION_TIMEOUT = 30
+# --prefetch: while waiting on the model, list the workspace and read up to
+# PREFETCH_MAX_FILES of its most recently modified files no larger than
+# PREFETCH_MAX_FILE_BYTES, at most PREFETCH_DEPTH directories down, holding no
+# more than PREFETCH_MEMORY_LIMIT bytes
+PREFETCH_MAX_FILES = 20
+PREFETCH_MAX_FILE_BYTES = 32 * 1024
+PREFETCH_DEPTH = 1
+PREFETCH_MEMORY_LIMIT = 2 * 1024 * 1024
+# Where find_symbol and outline_file persist their index, one file per workspace
+SYMBOL_INDEX_DIRECTORY = SESSIONS_DIRECTORY / "symbol_index"
 
 # SCHEMA FOR AI-AGENT BELOW
 
@@ -30,7 +92,7 @@ schema_get_files_info = types.FunctionDeclaration(
 
 schema_get_file_content = types.FunctionDeclaration(
     name="get_file_content",
-    description="Read first 10000 characters of a file, and output those characters.",
+    description="Read first 10000 characters of a file, and output those characters. With start_line and/or end_line, read only those lines, numbered.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -38,6 +100,57 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The file to read, relative to the working directory.",
             ),
+            "start_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="First line to read, counting from 1. Defaults to the start of the file.",
+            ),
+            "end_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="Last line to read, inclusive. Defaults to the end of the file.",
+            ),
+        },
+    ),
+)
+
+schema_get_files_content = types.FunctionDeclaration(
+    name="get_files_content",
+    description="Read several files in one call. Returns each file's content, or an error for that file; 30000 characters are shared across all the files, so small files are returned whole and the largest ones are truncated first.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "files": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="The files to read, relative to the working directory.",
+            ),
+        },
+    ),
+)
+
+schema_find_symbol = types.FunctionDeclaration(
+    name="find_symbol",
+    description="Find where Python classes, functions or methods are defined in the working directory. Lists file, line range, signature and docstring summary for each match.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "name": types.Schema(
+                type=types.Type.STRING,
+                description="The symbol name, e.g. 'evaluate' or 'Calculator.evaluate'. Partial names match if nothing matches exactly.",
+            ),
+        },
+    ),
+)
+
+schema_outline_file = types.FunctionDeclaration(
+    name="outline_file",
+    description="List the classes, functions and methods of a Python file with their line ranges and signatures.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file": types.Schema(
+                type=types.Type.STRING,
+                description="The Python file to outline, relative to the working directory.",
+            ),
         },
     ),
 )
@@ -80,6 +193,9 @@ available_functions = types.Tool(
     function_declarations=[
         schema_get_files_info,
         schema_get_file_content,
+        schema_get_files_content,
+        schema_find_symbol,
+        schema_outline_file,
         schema_run_python_file,
         schema_write_file,
     ]
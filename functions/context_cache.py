@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import time
+
+from google.genai import types
+
+from config.settings import (
+    CONTEXT_CACHE_MIN_GROWTH_TOKENS,
+    CONTEXT_CACHE_MIN_TOKENS,
+    CONTEXT_CACHE_REFRESH,
+    CONTEXT_CACHE_RETRY,
+    CONTEXT_CACHE_TTL,
+)
+from functions.metrics import CACHE_REQUESTS
+
+# Handles this close to expiry are not used, so a request cannot race the TTL
+EXPIRY_MARGIN = 60
+
+
+def _estimate_tokens(text):
+    return len(text) // 4
+
+
+def _static_text(config):
+    """The system instruction and tool declarations, serialized."""
+    return json.dumps(
+        [
+            str(config.system_instruction or ""),
+            [tool.model_dump_json(exclude_none=True) for tool in config.tools or ()],
+            (
+                config.tool_config.model_dump_json(exclude_none=True)
+                if config.tool_config
+                else None
+            ),
+        ]
+    )
+
+
+def _chain(digest, text):
+    return hashlib.sha256(f"{digest}\n{text}".encode("utf-8")).hexdigest()
+
+
+class ContextCache:
+    """
+    Server-side cached-content handles for the static prefix of requests.
+
+    A handle caches the system instruction, the tool declarations and the
+    conversation before the newest message, for one model. Requests that
+    start with a cached prefix send only the rest, with
+    config.cached_content naming the handle. A prefix is identified by a
+    hash chain over its parts, so a handle is reused by any later request
+    whose conversation begins the same way, in this run or a later one.
+
+    A new handle is created once the prefix is worth caching at all and the
+    history after the longest usable handle has grown by at least
+    min_growth_tokens. Handles close to expiry get their TTL extended. If
+    the API refuses to create a cache, the model is sent uncached requests
+    for `retry` seconds.
+
+    Args:
+        path (str or Path): JSON file the handles are kept in across runs,
+            or None to keep them in memory only.
+        ttl (int): Seconds a new or refreshed handle lives.
+        refresh (int): Extend a handle's TTL when less than this is left.
+        min_tokens (int): Smallest prefix, in estimated tokens, to cache.
+        min_growth_tokens (int): Uncached history that warrants a new handle.
+        retry (int): Seconds before trying a model that refused again.
+        clock (callable): Seconds since the epoch.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        ttl=CONTEXT_CACHE_TTL,
+        refresh=CONTEXT_CACHE_REFRESH,
+        min_tokens=CONTEXT_CACHE_MIN_TOKENS,
+        min_growth_tokens=CONTEXT_CACHE_MIN_GROWTH_TOKENS,
+        retry=CONTEXT_CACHE_RETRY,
+        clock=None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.min_tokens = min_tokens
+        self.min_growth_tokens = min_growth_tokens
+        self.retry = retry
+        self.clock = clock or time.time
+        self.handles = {}  # name -> {"model", "digest", "contents", "expires"}
+        self.unavailable = {}  # model -> time to try caching again
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            now = self.clock()
+            handles = {
+                name: handle
+                for name, handle in saved["handles"].items()
+                if set(handle) >= {"model", "digest", "contents", "expires"}
+                and handle["expires"] > now
+            }
+            unavailable = {
+                model: until
+                for model, until in saved["unavailable"].items()
+                if until > now
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return  # Missing or malformed; handles are recreated as needed
+        self.handles = handles
+        self.unavailable = unavailable
+
+    def save(self):
+        """
+        Writes the handles atomically so the next run can reuse them.
+
+        The file is best-effort: a failure to write it is ignored.
+
+        Returns:
+            bool: Whether the handles were written.
+        """
+        if self.path is None:
+            return False
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"handles": self.handles, "unavailable": self.unavailable},
+                    f,
+                    indent=2,
+                )
+            os.replace(temporary, self.path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def discard(self, name):
+        """Forgets a handle the API no longer accepts."""
+        self.handles.pop(name, None)
+
+    def _best_handle(self, model, digests, now):
+        best = None
+        for name, handle in list(self.handles.items()):
+            if handle["expires"] <= now:
+                del self.handles[name]
+                continue
+            if (
+                handle["model"] == model
+                and handle["contents"] < len(digests)
+                and digests[handle["contents"]] == handle["digest"]
+                and handle["expires"] - now > EXPIRY_MARGIN
+                and (best is None or handle["contents"] > best[1]["contents"])
+            ):
+                best = (name, handle)
+        return best
+
+    def _create(self, client, model, prefix, config, digests, now):
+        cached = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=prefix or None,
+                system_instruction=config.system_instruction,
+                tools=config.tools,
+                tool_config=config.tool_config,
+                ttl=f"{self.ttl}s",
+                display_name="ai-agent prefix",
+            ),
+        )
+        expires = (
+            cached.expire_time.timestamp() if cached.expire_time else now + self.ttl
+        )
+        # Handles of this conversation that the new one extends are
+        # superseded. Handles of other conversations, and the static-only
+        # one, are kept, as other sessions still use them.
+        for name, handle in list(self.handles.items()):
+            if (
+                handle["model"] == model
+                and 0 < handle["contents"] < len(prefix)
+                and digests[handle["contents"]] == handle["digest"]
+            ):
+                try:
+                    client.caches.delete(name=name)
+                except Exception:
+                    pass  # It expires on its own
+                del self.handles[name]
+        self.handles[cached.name] = {
+            "model": model,
+            "digest": digests[-1],
+            "contents": len(prefix),
+            "expires": expires,
+        }
+        return cached.name
+
+    def prepare(self, client, model, messages, config):
+        """
+        Works out how to send a request to `model` using a cached prefix.
+
+        Creates or refreshes a handle when worthwhile. Any failure of the
+        caches API falls back to the full, uncached request.
+
+        Args:
+            client: A genai.Client or FakeClient.
+            model (str): The model the request goes to.
+            messages (list): The conversation as types.Content, newest last.
+            config (types.GenerateContentConfig): The uncached request config.
+
+        Returns:
+            tuple: (contents, config, info) to send, where info records the
+                   handle "name" (None if uncached), how many "contents" it
+                   covers and the "result": hit, miss (created), refresh,
+                   skipped (not worth caching), unavailable or error (the
+                   handle was lost).
+        """
+        now = self.clock()
+        info = {"name": None, "contents": 0, "result": "skipped"}
+        if self.unavailable.get(model, 0) > now:
+            info["result"] = "unavailable"
+            CACHE_REQUESTS.inc(cache="context", result="unavailable")
+            return messages, config, info
+
+        prefix = messages[:-1]
+        texts = [_static_text(config)] + [
+            content.model_dump_json(exclude_none=True) for content in prefix
+        ]
+        digests = []
+        digest = model
+        for text in texts:
+            digest = _chain(digest, text)
+            digests.append(digest)
+
+        best = self._best_handle(model, digests, now)
+        covered = best[1]["contents"] + 1 if best else 0
+        uncached_tokens = sum(_estimate_tokens(text) for text in texts[covered:])
+        total_tokens = sum(_estimate_tokens(text) for text in texts)
+        name = best[0] if best else None
+        if total_tokens >= self.min_tokens and (
+            best is None or uncached_tokens >= self.min_growth_tokens
+        ):
+            try:
+                name = self._create(client, model, prefix, config, digests, now)
+                info["result"] = "miss"
+            except Exception:
+                if best is None:
+                    self.unavailable[model] = now + self.retry
+                    info["result"] = "unavailable"
+                # Otherwise the shorter prefix still works
+        if best is not None and name == best[0]:
+            info["result"] = "hit"
+            handle = best[1]
+            if handle["expires"] - now < self.refresh:
+                try:
+                    cached = client.caches.update(
+                        name=name,
+                        config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"),
+                    )
+                    handle["expires"] = (
+                        cached.expire_time.timestamp()
+                        if cached.expire_time
+                        else now + self.ttl
+                    )
+                    info["result"] = "refresh"
+                except Exception:
+                    self.discard(name)
+                    name = None
+                    info["result"] = "error"
+        CACHE_REQUESTS.inc(cache="context", result=info["result"])
+        if name is None:
+            return messages, config, info
+
+        contents = self.handles[name]["contents"]
+        info.update(name=name, contents=contents)
+        cached_config = config.model_copy(
+            update={
+                "cached_content": name,
+                "system_instruction": None,
+                "tools": None,
+                "tool_config": None,
+            }
+        )
+        return messages[contents:], cached_config, info
@@ -0,0 +1,201 @@
+import difflib
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from functions.metrics import CACHE_REQUESTS, DEDUP_SAVED_CHARS
+from functions.path_utils import read_file_content, read_files_content
+
+# Lines of context around each change in a diff
+DIFF_CONTEXT_LINES = 2
+# A diff is only sent when it is at most this fraction of the full content
+MAX_DIFF_RATIO = 0.6
+
+
+# How each delivery kind is reported in the cache metrics
+CACHE_RESULTS = {"full": "miss", "unchanged": "hit", "diff": "diff"}
+
+
+def content_digest(text):
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class ContentLedger:
+    """
+    Which version of each file the model has already been given.
+
+    Versions are keyed by resolved path and identified by the SHA-256 of
+    the delivered text. The texts live in a content-addressed blob
+    directory, one file per digest, so diffs can still be computed after
+    a session is resumed in a new process.
+
+    Args:
+        blob_directory (Path): Where delivered texts are stored, or None to
+            keep them in memory only.
+    """
+
+    def __init__(self, blob_directory=None):
+        self.blob_directory = Path(blob_directory) if blob_directory else None
+        self._delivered = {}  # path -> (digest, turn)
+        self._texts = {}  # digest -> text, for blobs read or written here
+        self._recorded = {}  # path -> digest, delivered since take_recorded()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_session(cls, session):
+        """Rebuilds the ledger from the "files" recorded in a session's turns."""
+        ledger = cls(session.blob_directory)
+        for turn in session.turns:
+            for path, digest in (turn.get("files") or {}).items():
+                ledger._delivered[path] = (digest, turn["turn"])
+        return ledger
+
+    def take_recorded(self):
+        """Returns and resets {path: digest} for newly delivered versions."""
+        with self._lock:
+            recorded, self._recorded = self._recorded, {}
+            return recorded
+
+    def _load_text(self, digest):
+        text = self._texts.get(digest)
+        if text is None and self.blob_directory is not None:
+            try:
+                with open(self.blob_directory / digest, "r", encoding="utf-8") as f:
+                    text = self._texts[digest] = f.read()
+            except (OSError, UnicodeDecodeError):
+                return None
+        return text
+
+    def _store_text(self, digest, text):
+        self._texts[digest] = text
+        if self.blob_directory is None:
+            return
+        path = self.blob_directory / digest
+        if path.exists():
+            return
+        # Unique per process and thread, as sessions may share the directory
+        temporary = path.with_name(
+            f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            self.blob_directory.mkdir(parents=True, exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temporary, path)
+        except OSError:
+            # The text stays in memory; a resumed session sends it in full
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def deliver(self, key, text, turn):
+        """
+        Decides how to send `text` for file `key` to the model.
+
+        Returns:
+            tuple: (kind, payload, since_turn) where kind is "full" (payload is
+                   the text), "unchanged" (payload is None) or "diff" (payload
+                   is a unified diff from the version sent in since_turn).
+        """
+        digest = content_digest(text)
+        with self._lock:
+            previous = self._delivered.get(key)
+            if previous is not None and previous[0] == digest:
+                return "unchanged", None, previous[1]
+            old_text = self._load_text(previous[0]) if previous else None
+            self._store_text(digest, text)
+            self._delivered[key] = (digest, turn)
+            self._recorded[key] = digest
+        if old_text is None:
+            return "full", text, None
+        diff = "".join(
+            difflib.unified_diff(
+                old_text.splitlines(keepends=True),
+                text.splitlines(keepends=True),
+                fromfile=f"turn {previous[1]}",
+                tofile=f"turn {turn}",
+                n=DIFF_CONTEXT_LINES,
+            )
+        )
+        if len(diff) > len(text) * MAX_DIFF_RATIO:
+            return "full", text, None
+        return "diff", diff, previous[1]
+
+
+def deduplicated_get_file_content(ledger, turn):
+    """
+    Returns a get_file_content tool that avoids resending known content.
+
+    A file the model already has is answered with a one-line reference to
+    the turn it was sent in; a changed file with a unified diff against
+    that version, if the diff is clearly smaller than the file.
+
+    Args:
+        ledger (ContentLedger): The session's delivered versions.
+        turn (int): The current turn number.
+    """
+
+    def get_file_content(given_work_directory, file, start_line=None, end_line=None):
+        workspace, path, content, error_message = read_file_content(
+            given_work_directory, file, start_line, end_line
+        )
+        if content is None:
+            return error_message
+        key = str(path)
+        if start_line is not None or end_line is not None:
+            # Line ranges are tracked apart from the whole file
+            key += f"#{start_line or ''}-{end_line or ''}"
+        kind, payload, since_turn = ledger.deliver(key, content, turn)
+        CACHE_REQUESTS.inc(cache="file_content", result=CACHE_RESULTS[kind])
+        if kind == "full":
+            return content
+        if kind == "unchanged":
+            result = workspace.language.get("file_unchanged", file, since_turn)
+        else:
+            result = workspace.language.get("file_changed", file, since_turn, payload)
+        DEDUP_SAVED_CHARS.inc(max(0, len(content) - len(result)))
+        return result
+
+    return get_file_content
+
+
+def deduplicated_get_files_content(ledger, turn):
+    """
+    Returns a get_files_content tool that avoids resending known content.
+
+    Files the model already has are listed with "unchanged_since_turn"
+    instead of "content", and changed ones with a "diff" against the
+    version sent in "since_turn", as for deduplicated_get_file_content.
+
+    Args:
+        ledger (ContentLedger): The session's delivered versions.
+        turn (int): The current turn number.
+    """
+
+    def get_files_content(given_work_directory, files):
+        workspace, items, error_message = read_files_content(
+            given_work_directory, files
+        )
+        if workspace is None:
+            return error_message
+        for item in items:
+            path = item.pop("path")
+            if "content" not in item:
+                continue
+            content = item["content"]
+            kind, payload, since_turn = ledger.deliver(str(path), content, turn)
+            CACHE_REQUESTS.inc(cache="file_content", result=CACHE_RESULTS[kind])
+            if kind == "full":
+                continue
+            del item["content"]
+            if kind == "unchanged":
+                item["unchanged_since_turn"] = since_turn
+            else:
+                item["diff"] = payload
+                item["since_turn"] = since_turn
+            DEDUP_SAVED_CHARS.inc(max(0, len(content) - len(payload or "")))
+        return {"files": items}
+
+    return get_files_content
@@ -0,0 +1,215 @@
+import datetime
+import itertools
+import re
+import time
+
+from google.genai import errors, types
+
+
+def _content_chars(contents):
+    total = 0
+    for content in contents:
+        for part in content.parts or ():
+            if part.text:
+                total += len(part.text)
+            elif part.function_call or part.function_response:
+                total += len(str(part.function_call or part.function_response))
+    return total
+
+
+def _client_error(code, status, message):
+    return errors.ClientError(
+        code, {"error": {"code": code, "message": message, "status": status}}
+    )
+
+
+def _ttl_seconds(ttl):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)s", ttl or "")
+    if not match:
+        raise _client_error(400, "INVALID_ARGUMENT", f"Invalid ttl: {ttl!r}")
+    return float(match.group(1))
+
+
+def echo_responder(model, contents, config):
+    """Default responder: answers every request with a short text part."""
+    return [types.Part(text=f"[{model}] ok")]
+
+
+class FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        client = self._client
+        client.calls.append({"model": model, "contents": contents, "config": config})
+        cached = None
+        if config is not None and config.cached_content:
+            if config.system_instruction or config.tools or config.tool_config:
+                raise _client_error(
+                    400,
+                    "INVALID_ARGUMENT",
+                    "CachedContent can not be used with system_instruction, "
+                    "tools or tool_config",
+                )
+            cached = client.caches._live(config.cached_content)
+            if cached["model"] != model:
+                raise _client_error(
+                    400, "INVALID_ARGUMENT", "Model does not match the cached content"
+                )
+        latency = client.latencies.get(model, 0.0)
+        if latency:
+            client.sleep(latency)
+        if client.failures.get(model, 0):
+            if client.failures[model] > 0:
+                client.failures[model] -= 1
+            raise errors.ServerError(
+                503,
+                {
+                    "error": {
+                        "code": 503,
+                        "message": "overloaded",
+                        "status": "UNAVAILABLE",
+                    }
+                },
+            )
+        parts = client.responder(model, contents, config)
+        cached_tokens = cached["tokens"] if cached else None
+        prompt_tokens = max(1, _content_chars(contents) // 4) + (cached_tokens or 0)
+        response_tokens = max(1, _content_chars([types.Content(parts=parts)]) // 4)
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(content=types.Content(role="model", parts=parts))
+            ],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                cached_content_token_count=cached_tokens,
+                candidates_token_count=response_tokens,
+                total_token_count=prompt_tokens + response_tokens,
+            ),
+        )
+
+
+class FakeCaches:
+    """
+    The cachedContents endpoints: create, get, update and delete.
+
+    Tokens are estimated as four characters each, for the contents plus the
+    system instruction and tool declarations. Entries expire by the
+    client's clock like real ones, after which using them is a 404.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._ids = itertools.count(1)
+        self.entries = {}  # name -> {"model", "tokens", "expires", ...}
+
+    def _cached_content(self, name):
+        entry = self.entries[name]
+        return types.CachedContent(
+            name=name,
+            model=entry["model"],
+            display_name=entry["display_name"],
+            expire_time=datetime.datetime.fromtimestamp(
+                entry["expires"], datetime.timezone.utc
+            ),
+            usage_metadata=types.CachedContentUsageMetadata(
+                total_token_count=entry["tokens"]
+            ),
+        )
+
+    def _live(self, name):
+        entry = self.entries.get(name)
+        if entry is None or entry["expires"] <= self._client.clock():
+            self.entries.pop(name, None)
+            raise _client_error(404, "NOT_FOUND", f"CachedContent not found: {name}")
+        return entry
+
+    def create(self, model, config=None):
+        client = self._client
+        client.cache_calls.append(("create", model))
+        if not client.caching:
+            raise _client_error(
+                400, "FAILED_PRECONDITION", "Context caching is not available"
+            )
+        config = config or types.CreateCachedContentConfig()
+        chars = _content_chars(config.contents or [])
+        if config.system_instruction:
+            chars += len(str(config.system_instruction))
+        chars += sum(len(tool.model_dump_json()) for tool in config.tools or ())
+        tokens = chars // 4
+        if tokens < client.cache_min_tokens:
+            raise _client_error(
+                400,
+                "INVALID_ARGUMENT",
+                f"Cached content is too small. total_token_count={tokens}, "
+                f"min_total_token_count={client.cache_min_tokens}",
+            )
+        name = f"cachedContents/fake-{next(self._ids)}"
+        self.entries[name] = {
+            "model": model,
+            "display_name": config.display_name,
+            "tokens": tokens,
+            "expires": client.clock() + _ttl_seconds(config.ttl or "3600s"),
+        }
+        return self._cached_content(name)
+
+    def get(self, name, config=None):
+        self._client.cache_calls.append(("get", name))
+        self._live(name)
+        return self._cached_content(name)
+
+    def update(self, name, config=None):
+        self._client.cache_calls.append(("update", name))
+        entry = self._live(name)
+        if config is not None and config.ttl:
+            entry["expires"] = self._client.clock() + _ttl_seconds(config.ttl)
+        return self._cached_content(name)
+
+    def delete(self, name, config=None):
+        self._client.cache_calls.append(("delete", name))
+        self._live(name)
+        del self.entries[name]
+        return types.DeleteCachedContentResponse()
+
+
+class FakeClient:
+    """
+    An offline stand-in for genai.Client, for tests and --fake-backend runs.
+
+    Only the parts of the client the agent uses are implemented: model
+    requests, recorded in `calls`, and context caches, whose calls are
+    recorded in `cache_calls`.
+
+    Args:
+        responder (callable): (model, contents, config) -> list of
+            types.Part to answer with. Defaults to echo_responder.
+        latencies (dict): Model name -> seconds each request sleeps.
+        failures (dict): Model name -> number of requests that fail with a
+            503 ServerError before it recovers; -1 fails forever.
+        sleep (callable): Used for latencies; tests can pass a fake clock.
+        caching (bool): Whether caches.create succeeds at all.
+        cache_min_tokens (int): Smallest cache caches.create accepts.
+        clock (callable): Seconds since the epoch, for cache expiry.
+    """
+
+    def __init__(
+        self,
+        responder=None,
+        latencies=None,
+        failures=None,
+        sleep=None,
+        caching=True,
+        cache_min_tokens=0,
+        clock=None,
+    ):
+        self.responder = responder or echo_responder
+        self.latencies = dict(latencies or {})
+        self.failures = dict(failures or {})
+        self.sleep = sleep or time.sleep
+        self.caching = caching
+        self.cache_min_tokens = cache_min_tokens
+        self.clock = clock or time.time
+        self.calls = []
+        self.cache_calls = []
+        self.models = FakeModels(self)
+        self.caches = FakeCaches(self)
@@ -1,35 +1,306 @@
+import importlib.util
 import json
+import marshal
 import os
+import sys
+import threading
 from pathlib import Path
-from config.settings import *
+from string import Formatter
+from types import CodeType, FunctionType
+from config.settings import LANGUAGE
+from functions.metrics import CACHE_REQUESTS, ERRORS
 
+DEFAULT_LANGUAGE = "en"
+LOCALES_DIRECTORY = Path(__file__).resolve().parent.parent / "locales"
+# Keys of error messages; every use of one is counted in the errors metric
+ERROR_KEY_PREFIX = "error_"
+CATALOG_CACHE_VERSION = 1
 
-class Language:
-    def __init__(self, language_code="en", language_dir="locales"):
+# Shared, read-only catalogs keyed by resolved locale file path
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def _compile_template(message):
+    """
+    Pre-parses a translation template into an f-string code object so that
+    formatting runs as bytecode instead of going through str.format's parser.
+
+    Returns:
+        str for messages without fields, a code object taking the argument
+        tuple for positional templates, or None when the template needs the
+        full str.format machinery.
+    """
+    pieces = []
+    auto_index = 0
+    manual = automatic = False
+    try:
+        parsed = list(Formatter().parse(message))
+    except ValueError:
+        return None
+    for literal, field_name, format_spec, conversion in parsed:
+        if literal:
+            pieces.append(literal)
+        if field_name is None:
+            continue
+        if field_name == "":
+            index = auto_index
+            auto_index += 1
+            automatic = True
+        elif field_name.isdigit():
+            index = int(field_name)
+            manual = True
+        else:
+            return None
+        if manual and automatic or any(c in format_spec for c in "{}'\"\\"):
+            return None
+        pieces.append((index, format_spec, conversion))
+    if all(isinstance(piece, str) for piece in pieces):
+        return "".join(pieces)
+    source = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            source.append("f" + repr(piece.replace("{", "{{").replace("}", "}}")))
+        else:
+            index, format_spec, conversion = piece
+            field = f"a[{index}]"
+            if conversion:
+                field += f"!{conversion}"
+            if format_spec:
+                field += f":{format_spec}"
+            source.append("f'{" + field + "}'")
+    try:
+        module = compile(f"lambda a: {' '.join(source)}", "<catalog>", "eval")
+    except SyntaxError:
+        return None  # e.g. an invalid conversion; str.format reports it per call
+    return next(c for c in module.co_consts if isinstance(c, CodeType))
+
+
+def _link_template(message, compiled):
+    """Turns a cached template into a str or a callable taking the args tuple."""
+    if isinstance(compiled, CodeType):
+        return FunctionType(compiled, {})
+    if compiled is None:
+        return lambda args: message.format(*args)
+    return compiled
+
+
+def _cache_path(language_file):
+    """
+    Where the compiled catalog is cached, or None if this interpreter has no
+    cache tag. Like .pyc files, the name carries the interpreter's tag, as
+    the cache holds marshalled bytecode.
+    """
+    cache_tag = sys.implementation.cache_tag
+    if cache_tag is None:
+        return None
+    return (
+        language_file.parent
+        / "__pycache__"
+        / f"{language_file.stem}.{cache_tag}.catalog-v{CATALOG_CACHE_VERSION}.bin"
+    )
+
+
+def _read_cached_entries(language_file, source_stat):
+    """Returns cached entries if the binary cache matches the source file."""
+    cache_file = _cache_path(language_file)
+    if cache_file is None:
+        return None
+    try:
+        with open(cache_file, "rb") as f:
+            cached = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (
+        not isinstance(cached, dict)
+        or cached.get("version") != CATALOG_CACHE_VERSION
+        or cached.get("magic") != importlib.util.MAGIC_NUMBER
+        or cached.get("mtime_ns") != source_stat.st_mtime_ns
+        or cached.get("size") != source_stat.st_size
+    ):
+        return None
+    return cached.get("entries")
+
+
+def _write_cached_entries(language_file, source_stat, entries):
+    """Writes the compiled catalog next to the source; failures are ignored."""
+    cache_file = _cache_path(language_file)
+    if cache_file is None:
+        return
+    payload = {
+        "version": CATALOG_CACHE_VERSION,
+        "magic": importlib.util.MAGIC_NUMBER,
+        "mtime_ns": source_stat.st_mtime_ns,
+        "size": source_stat.st_size,
+        "entries": entries,
+    }
+    try:
+        cache_file.parent.mkdir(exist_ok=True)
+        temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(temp_file, "wb") as f:
+            marshal.dump(payload, f)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        pass
+
+
+class Catalog:
+    """Compiled, read-only translations for a single locale file."""
+
+    __slots__ = ("language_code", "path", "entries")
+
+    def __init__(self, language_code, path, entries):
         self.language_code = language_code
-        self.translations = {}
-        self.load_language(language_dir)
+        self.path = path
+        # key -> (source, compiled) where compiled is the formatted str for
+        # static messages or a callable taking the argument tuple
+        self.entries = entries
 
-    def load_language(self, language_dir):
-        """Load the language file for the specified language code."""
-        try:
-            language_file = Path(language_dir) / f"{self.language_code}.json"
+    @classmethod
+    def load(cls, language_code, language_dir):
+        """
+        Loads a catalog from its binary cache, compiling the JSON source if needed.
+
+        Raises:
+            FileNotFoundError, json.JSONDecodeError: if the locale file is unusable.
+        """
+        language_file = (Path(language_dir) / f"{language_code}.json").resolve()
+        source_stat = language_file.stat()
+        entries = _read_cached_entries(language_file, source_stat)
+        CACHE_REQUESTS.inc(cache="catalog", result="miss" if entries is None else "hit")
+        if entries is None:
             with open(language_file, "r", encoding="utf-8") as f:
-                self.translations = json.load(f).get(self.language_code, {})
-        except (FileNotFoundError, json.JSONDecodeError):
-            print(
-                f"Warning: Language file for '{self.language_code}' not found or invalid. Using defaults."
-            )
-            self.translations = {}
+                translations = json.load(f).get(language_code, {})
+            entries = {
+                key: (message, _compile_template(message))
+                for key, message in translations.items()
+                if isinstance(message, str)
+            }
+            _write_cached_entries(language_file, source_stat, entries)
+        entries = {
+            key: (message, _link_template(message, compiled))
+            for key, (message, compiled) in entries.items()
+        }
+        return cls(language_code, language_file, entries)
+
+
+def get_catalog(language_code, language_dir=LOCALES_DIRECTORY):
+    """
+    Returns the shared catalog for a locale, loading it on first use.
+
+    Returns:
+        Catalog or None if the locale file is missing or invalid.
+    """
+    key = (Path(language_dir).resolve(), language_code)
+    catalog = _catalogs.get(key)
+    if catalog is not None or key in _catalogs:
+        return catalog
+    with _catalogs_lock:
+        if key not in _catalogs:
+            try:
+                _catalogs[key] = Catalog.load(language_code, language_dir)
+            except (FileNotFoundError, json.JSONDecodeError):
+                _catalogs[key] = None
+        return _catalogs[key]
+
+
+def clear_catalog_cache():
+    """Drops all shared catalogs so the next lookup re-reads the locale files."""
+    with _catalogs_lock:
+        _catalogs.clear()
+
+
+def _count_uses(key, compiled):
+    """Wraps a compiled error message so each use is counted in ERRORS."""
+    count = ERRORS.labels(key=key).inc
+    if compiled.__class__ is str:
+
+        def message(args):
+            count()
+            return compiled
+
+    else:
+
+        def message(args):
+            count()
+            return compiled(args)
+
+    return message
+
+
+def fallback_chain(language_code):
+    """Returns locale codes to try in order, e.g. 'pt-BR' -> ['pt_BR', 'pt', 'en']."""
+    code = language_code.replace("-", "_")
+    chain = [code]
+    while "_" in code:
+        code = code.rsplit("_", 1)[0]
+        chain.append(code)
+    if DEFAULT_LANGUAGE not in chain:
+        chain.append(DEFAULT_LANGUAGE)
+    return chain
+
+
+class Language:
+    def __init__(self, language_code="en", language_dir=LOCALES_DIRECTORY):
+        self.language_code = language_code
+        self.language_dir = language_dir
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def load_language(self, language_dir=None):
+        """Resolve the shared catalogs for this language and its fallbacks."""
+        if language_dir is not None:
+            self.language_dir = language_dir
+        entries = {}
+        for code in reversed(fallback_chain(self.language_code)):
+            catalog = get_catalog(code, self.language_dir)
+            if catalog is not None:
+                entries.update(catalog.entries)
+            elif code == self.language_code:
+                print(
+                    f"Warning: Language file for '{self.language_code}' not found or invalid. Using defaults."
+                )
+        # Error messages count their uses; other lookups stay on the fast path
+        for key, (message, compiled) in entries.items():
+            if key.startswith(ERROR_KEY_PREFIX):
+                entries[key] = (message, _count_uses(key, compiled))
+        self._entries = entries
+        return entries
+
+    @property
+    def translations(self):
+        """Raw translation strings, with fallback locales filling missing keys."""
+        entries = self._entries
+        if entries is None:
+            entries = self._load()
+        return {key: message for key, (message, _) in entries.items()}
+
+    def _load(self):
+        with self._lock:
+            if self._entries is None:
+                self.load_language()
+            return self._entries
 
     def get(self, key, *args, default=None):
         """Get a translated string by key, with optional formatting."""
-        message = self.translations.get(key, default or f"Missing translation: {key}")
+        entries = self._entries
+        if entries is None:
+            entries = self._load()
+        entry = entries.get(key)
+        if entry is None:
+            message = default or f"Missing translation: {key}"
+            try:
+                return message.format(*args)
+            except (IndexError, KeyError, ValueError):
+                return message
+        compiled = entry[1]
+        if compiled.__class__ is str:
+            return compiled
         try:
-            return message.format(*args)
-        except (IndexError, KeyError):
-            return message  # Return unformatted if formatting fails
+            return compiled(args)
+        except (IndexError, KeyError, ValueError):
+            return entry[0]  # Return unformatted if formatting fails
 
 
-# Initialize language (load once at startup)
+# Initialize language (catalog is loaded lazily on first get)
 language = Language(LANGUAGE)
@@ -0,0 +1,174 @@
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+REPORT_VERSION = 1
+# How many call sites each phase reports, and stack depth to record
+TOP_SITES = 10
+TRACE_FRAMES = 5
+# A tool is flagged once its retained memory has grown this many turns in a row
+GROWTH_TURNS = 3
+
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+    )
+
+
+def growing_phases(phases, turns=GROWTH_TURNS):
+    """
+    Finds phases whose retained memory grew on each of the last `turns` turns.
+
+    Args:
+        phases (list): Phase records, as in a report's "phases".
+        turns (int): How many consecutive increases count as growing.
+
+    Returns:
+        list: {"kind", "name", "retained"} for each growing phase, where
+              retained is the total per turn, oldest first.
+    """
+    per_turn = {}
+    for phase in phases:
+        totals = per_turn.setdefault((phase["kind"], phase["name"]), {})
+        totals[phase["turn"]] = totals.get(phase["turn"], 0) + phase["retained"]
+    growing = []
+    for (kind, name), totals in per_turn.items():
+        retained = [totals[turn] for turn in sorted(totals)]
+        recent = retained[-(turns + 1) :]
+        if len(recent) > turns and all(a < b for a, b in zip(recent, recent[1:])):
+            growing.append({"kind": kind, "name": name, "retained": retained})
+    return growing
+
+
+class MemoryProfiler:
+    """
+    Measures memory around each model call and tool invocation.
+
+    Each phase records how much traced memory it still held when it ended
+    (retained), the highest point it reached above its starting level
+    (peak), and the call sites that allocated the most. Does nothing
+    unless enabled, so callers can wrap phases unconditionally.
+
+    Args:
+        enabled (bool): Whether to trace allocations at all.
+        top (int): Number of allocation sites to keep per phase.
+    """
+
+    def __init__(self, enabled=True, top=TOP_SITES):
+        self.enabled = enabled
+        self.top = top
+        self.phases = []
+        self.peak = 0
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    @contextmanager
+    def phase(self, kind, name, turn):
+        """Records one phase; `kind` is e.g. "model" or "tool"."""
+        if not self.enabled:
+            yield
+            return
+        before = _snapshot()
+        start_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            end_size, peak_size = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak_size)
+            after = _snapshot()
+            self.phases.append(
+                {
+                    "turn": turn,
+                    "kind": kind,
+                    "name": name,
+                    "seconds": round(seconds, 6),
+                    "retained": end_size - start_size,
+                    "peak": peak_size - start_size,
+                    "top": [
+                        {
+                            "site": f"{stat.traceback[0].filename}:"
+                            f"{stat.traceback[0].lineno}",
+                            "size_diff": stat.size_diff,
+                            "count_diff": stat.count_diff,
+                        }
+                        for stat in after.compare_to(before, "lineno")[: self.top]
+                        if stat.size_diff
+                    ],
+                }
+            )
+
+    def wrap_tools(self, function_map, turn):
+        """Returns function_map with every tool call recorded as a phase."""
+        if not self.enabled:
+            return function_map
+
+        def wrap(name, function):
+            def profiled(*args, **kwargs):
+                with self.phase("tool", name, turn):
+                    return function(*args, **kwargs)
+
+            return profiled
+
+        return {name: wrap(name, function) for name, function in function_map.items()}
+
+    def write_report(self, path, session_id=None):
+        """
+        Adds this run's phases to the JSON report at `path`.
+
+        An existing report for the same session is extended, so phases from
+        resumed runs accumulate and growth can be tracked across turns; any
+        other file is replaced.
+
+        Returns:
+            tuple: (report, error) where report is the merged report and
+                   error is None, or the OSError if it could not be written;
+                   the report is best-effort and never fails the run.
+        """
+        report = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if (
+            not isinstance(report, dict)
+            or report.get("version") != REPORT_VERSION
+            or report.get("session") != session_id
+        ):
+            report = {
+                "version": REPORT_VERSION,
+                "session": session_id,
+                "runs": [],
+                "phases": [],
+            }
+        report["runs"].append(
+            {
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "peak": max(self.peak, tracemalloc.get_traced_memory()[1]),
+            }
+        )
+        report["phases"].extend(self.phases)
+        report["growing"] = growing_phases(report["phases"])
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            os.replace(temporary, path)
+        except OSError as e:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return report, e
+        return report, None
@@ -0,0 +1,289 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the default latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            key = tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            key = None
+        if key is None or len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    """A value that only goes up, per combination of label values."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def labels(self, **labels):
+        """Returns a BoundCounter for these label values, for hot paths."""
+        key = self._key(labels)
+        with self._lock:
+            self._values.setdefault(key, 0)
+        return BoundCounter(self, key)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        for key, value in items:
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class BoundCounter:
+    """A Counter with its label values already resolved."""
+
+    __slots__ = ("_values", "_lock", "_key")
+
+    def __init__(self, counter, key):
+        self._values = counter._values
+        self._lock = counter._lock
+        self._key = key
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._values[self._key] += amount
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the with block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def _render_samples(self, items):
+        bounds = self.buckets + (math.inf,)
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, [("le", _format_value(float(bound)))]
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in the Prometheus text exposition format.
+
+    Metrics are created once, usually at import time, and updated from any
+    thread. The registry can be scraped over HTTP with serve() or written
+    to a file with dump().
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"metric {metric.name} already registered")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def clear(self):
+        """Resets every metric's values, keeping the metrics registered."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Writes the current values to `path`, replacing it atomically."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(self, address):
+        """
+        Serves the metrics at http://<address>/metrics from a daemon thread.
+
+        Args:
+            address (str): "host:port"; port 0 picks a free port.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop.
+        """
+        registry = self
+        host, _, port = address.rpartition(":")
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+metrics = MetricsRegistry()
+
+MODEL_REQUESTS = metrics.counter(
+    "agent_model_requests_total",
+    "Model requests by model and outcome (ok or error).",
+    ["model", "outcome"],
+)
+MODEL_LATENCY = metrics.histogram(
+    "agent_model_request_seconds", "Model request latency.", ["model"]
+)
+TOKENS = metrics.counter(
+    "agent_tokens_total",
+    "Tokens by model and kind (prompt or response).",
+    ["model", "kind"],
+)
+TOOL_CALLS = metrics.counter(
+    "agent_tool_calls_total", "Tool calls by tool and outcome.", ["tool", "outcome"]
+)
+TOOL_LATENCY = metrics.histogram(
+    "agent_tool_call_seconds", "Tool call latency.", ["tool"]
+)
+ERRORS = metrics.counter(
+    "agent_errors_total", "Error messages produced, by language key.", ["key"]
+)
+DEDUP_SAVED_CHARS = metrics.counter(
+    "agent_dedup_saved_chars_total",
+    "Characters of file content not resent because the model already had them.",
+)
+CACHE_REQUESTS = metrics.counter(
+    "agent_cache_requests_total",
+    "Cache lookups by cache and result (hit, miss, ...).",
+    ["cache", "result"],
+)
+PREFETCH_ENTRIES = metrics.counter(
+    "agent_prefetch_entries_total",
+    "Prefetched entries by kind (listing or file) and outcome (used or unused).",
+    ["kind", "outcome"],
+)
@@ -1,8 +1,51 @@
-from pathlib import Path
-from config.settings import MAX_FILE_READ_CHARS, WORKING_DIRECTORY
-import os
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import MAX_TOOL_WORKERS, WORKING_DIRECTORY
+import itertools
 import subprocess
 from functions.language import language  # Import the language module
+from functions.workspace import Workspace, get_workspace
+
+
+def resolve_workspace(given_work_directory):
+    """
+    Returns the Workspace the tools should operate in.
+
+    Args:
+        given_work_directory (Workspace or str): A Workspace, or a directory
+            path, which must then lie within the configured WORKING_DIRECTORY.
+
+    Returns:
+        tuple: (workspace, error_message) where workspace is None and
+               error_message explains the failure if it is not usable.
+    """
+    if isinstance(given_work_directory, Workspace):
+        return given_work_directory, ""
+    try:
+        workspace = get_workspace(given_work_directory)
+    except ValueError:
+        return None, language.get("error_invalid_dir", given_work_directory)
+    except (FileNotFoundError, RuntimeError, TypeError):
+        return None, language.get("error_path_resolution", given_work_directory, "")
+    if not workspace.root.is_relative_to(WORKING_DIRECTORY):
+        return None, language.get(
+            "error_outside_directory", workspace.root, WORKING_DIRECTORY
+        )
+    return workspace, ""
+
+
+def resolve_tool_path(given_work_directory, file_path):
+    """
+    Resolves a tool's path argument inside its workspace.
+
+    Returns:
+        tuple: (workspace, resolved_path, error_message); on failure
+               resolved_path is None and error_message says why.
+    """
+    workspace, error_message = resolve_workspace(given_work_directory)
+    if workspace is None:
+        return None, None, error_message
+    resolved_path, error_message = workspace.resolve_path(file_path)
+    return workspace, resolved_path, error_message
 
 
 def check_path_within_directory(given_work_directory, file_path):
@@ -10,140 +53,312 @@ def check_path_within_directory(given_work_directory, file_path):
     Checks if a file or directory is within a valid working directory.
 
     Args:
-        given_work_directory (str): The base working directory path
+        given_work_directory (Workspace or str): The workspace, or its path
         file_path (str): The file or directory path to check
 
     Returns:
         tuple: (is_valid, error_message) where is_valid is True if within valid directory,
                False otherwise, and error_message explains the failure reason if applicable
     """
-    try:
-        abs_given_work_directory = Path(given_work_directory).resolve()
-        if not abs_given_work_directory.is_dir():
-            return (False, language.get("error_invalid_dir", given_work_directory))
-        if not abs_given_work_directory.is_relative_to(WORKING_DIRECTORY):
-            return (
-                False,
-                language.get(
-                    "error_outside_directory",
-                    abs_given_work_directory,
-                    WORKING_DIRECTORY,
-                ),
-            )
+    _, resolved_path, error_message = resolve_tool_path(given_work_directory, file_path)
+    return (resolved_path is not None, error_message)
 
-        abs_joined_file_path = Path(
-            os.path.join(abs_given_work_directory, file_path)
-        ).resolve()
-        if abs_joined_file_path.is_relative_to(abs_given_work_directory):
-            return (True, "")
-        return (
-            False,
-            language.get(
-                "error_outside_directory", file_path, abs_given_work_directory
-            ),
-        )
-    except (FileNotFoundError, ValueError):
-        return (
-            False,
-            language.get("error_path_resolution", given_work_directory, file_path),
-        )
 
+def take_prefetched(workspace, kind, path):
+    """
+    Returns what a Prefetcher warmed for `path`, or None.
+
+    Args:
+        workspace (Workspace): The workspace the tool runs in.
+        kind (str): "listing" for get_files_info output, or "file" for the
+            whole content of a file.
+        path (Path): The resolved path.
+    """
+    prefetcher = workspace.cache.get("prefetch")
+    if prefetcher is None:
+        return None
+    return prefetcher.take(kind, path)
+
+
+def forget_prefetched(workspace):
+    """Drops everything prefetched for the workspace, e.g. after a write."""
+    prefetcher = workspace.cache.get("prefetch")
+    if prefetcher is not None:
+        prefetcher.invalidate()
+
+
+def list_directory(workspace, abs_directory):
+    """
+    Formats the entries of a directory as get_files_info reports them.
 
-def get_files_info(given_work_directory: str, directory: str = "."):
-    is_valid, error_message = check_path_within_directory(
+    Raises:
+        OSError: If the directory cannot be listed.
+    """
+    result = []
+    for item in sorted(abs_directory.iterdir(), key=lambda x: x.name):
+        try:
+            file_size = item.stat().st_size
+            is_dir = item.is_dir()
+            formatted_line = (
+                f"- {item.name}: file_size={file_size} bytes, is_dir={is_dir}"
+            )
+            result.append(formatted_line)
+        except (PermissionError, FileNotFoundError):
+            result.append(
+                f"- {item.name}: file_size=unknown, is_dir=unknown (access error)"
+            )
+    return "\n".join(result) if result else workspace.language.get("directory_empty")
+
+
+def get_files_info(given_work_directory, directory: str = "."):
+    workspace, abs_directory, error_message = resolve_tool_path(
         given_work_directory, directory
     )
 
-    if not is_valid:
+    if abs_directory is None:
         return error_message
 
+    listing = take_prefetched(workspace, "listing", abs_directory)
+    if listing is not None:
+        return listing
     try:
-        abs_directory = Path(os.path.join(given_work_directory, directory)).resolve()
-        result = []
-        for item in sorted(abs_directory.iterdir(), key=lambda x: x.name):
-            try:
-                file_size = item.stat().st_size
-                is_dir = item.is_dir()
-                formatted_line = (
-                    f"- {item.name}: file_size={file_size} bytes, is_dir={is_dir}"
-                )
-                result.append(formatted_line)
-            except (PermissionError, FileNotFoundError):
-                result.append(
-                    f"- {item.name}: file_size=unknown, is_dir=unknown (access error)"
-                )
-        return "\n".join(result) if result else language.get("directory_empty")
+        return list_directory(workspace, abs_directory)
     except (PermissionError, OSError) as e:
-        return language.get("error_list_files", directory, str(e))
+        return workspace.language.get("error_list_files", directory, str(e))
 
 
-def get_file_content(given_work_directory, file):
-    is_valid, error_message = check_path_within_directory(given_work_directory, file)
+def _read_lines(path, start_line, end_line, max_chars):
+    """Returns lines start_line..end_line (1-based, inclusive), numbered."""
+    result = []
+    length = 0
+    with open(path, "r") as f:
+        lines = itertools.islice(f, start_line - 1, end_line)
+        for number, line in enumerate(lines, start_line):
+            numbered = f"{number}: {line}"
+            result.append(numbered)
+            length += len(numbered)
+            if length >= max_chars:
+                break
+    return "".join(result)
 
-    if not is_valid:
-        return error_message
 
-    try:
-        abs_joined_file_path = Path(os.path.join(given_work_directory, file)).resolve()
+def read_file_content(given_work_directory, file, start_line=None, end_line=None):
+    """
+    Reads a file for get_file_content, truncated to the workspace limit.
+
+    Args:
+        given_work_directory (Workspace or str): The workspace, or its path
+        file (str): The file to read, relative to the workspace
+        start_line (int): First line to read (1-based), or None
+        end_line (int): Last line to read (inclusive), or None; with either
+            line given only that range is read, each line prefixed with its
+            number
 
+    Returns:
+        tuple: (workspace, resolved_path, content, error_message) where content
+               is None and error_message explains why if the read failed
+    """
+    workspace, abs_joined_file_path, error_message = resolve_tool_path(
+        given_work_directory, file
+    )
+
+    if abs_joined_file_path is None:
+        return workspace, None, None, error_message
+
+    try:
         if not abs_joined_file_path.is_file():
-            return language.get("error_file_not_found", abs_joined_file_path)
+            return (
+                workspace,
+                abs_joined_file_path,
+                None,
+                workspace.language.get("error_file_not_found", abs_joined_file_path),
+            )
 
-        with open(abs_joined_file_path, "r") as f:
-            file_content_string = f.read(MAX_FILE_READ_CHARS)
+        max_chars = workspace.limits.max_file_read_chars
+        if start_line is None and end_line is None:
+            prefetched = take_prefetched(workspace, "file", abs_joined_file_path)
+            if prefetched is not None:
+                file_content_string = prefetched[:max_chars]
+            else:
+                with open(abs_joined_file_path, "r") as f:
+                    file_content_string = f.read(max_chars)
+        else:
+            try:
+                first = int(start_line) if start_line is not None else 1
+                last = int(end_line) if end_line is not None else None
+            except (TypeError, ValueError):
+                first, last = 0, None
+            if first < 1 or (last is not None and last < first):
+                return (
+                    workspace,
+                    abs_joined_file_path,
+                    None,
+                    workspace.language.get(
+                        "error_line_range", start_line, end_line, file
+                    ),
+                )
+            file_content_string = _read_lines(
+                abs_joined_file_path, first, last, max_chars
+            )
 
-        if len(file_content_string) >= MAX_FILE_READ_CHARS:
+        if len(file_content_string) >= max_chars:
             truncated_message = (
-                f'[...File "{file}" truncated at {MAX_FILE_READ_CHARS} characters].'
-            )
-            file_content_string = (
-                file_content_string[:MAX_FILE_READ_CHARS] + truncated_message
+                f'[...File "{file}" truncated at {max_chars} characters].'
             )
-        return file_content_string
+            file_content_string = file_content_string[:max_chars] + truncated_message
+        return workspace, abs_joined_file_path, file_content_string, ""
 
     except (FileNotFoundError, PermissionError):
-        return language.get("error_file_access")
+        return (
+            workspace,
+            abs_joined_file_path,
+            None,
+            workspace.language.get("error_file_access"),
+        )
+
+
+def get_file_content(given_work_directory, file, start_line=None, end_line=None):
+    _, _, content, error_message = read_file_content(
+        given_work_directory, file, start_line, end_line
+    )
+    return content if content is not None else error_message
+
+
+def share_budget(lengths, budget):
+    """
+    Splits a character budget across texts of the given lengths.
+
+    Every text gets an equal share, and the share a shorter text does not
+    use goes to the longer ones, so only the largest texts are cut.
+
+    Returns:
+        list: How many characters of each text to keep, in the given order.
+    """
+    allotments = [0] * len(lengths)
+    remaining = budget
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        allotments[index] = min(lengths[index], share)
+        remaining -= allotments[index]
+    return allotments
+
+
+def read_files_content(given_work_directory, files):
+    """
+    Reads several files for get_files_content within one shared budget.
+
+    All paths are validated first, then the files are read concurrently.
+    The workspace's max_batch_read_chars is split across the files with
+    share_budget, instead of each file getting max_file_read_chars.
+
+    Args:
+        given_work_directory (Workspace or str): The workspace, or its path
+        files (list): The files to read, relative to the workspace
+
+    Returns:
+        tuple: (workspace, items, error_message) where items holds, per
+               distinct file in the given order, a dict with "file" and
+               "path" (the resolved path, or None), and either "content"
+               (plus "truncated": True if it was cut) or "error"; workspace
+               is None and error_message says why if it is not usable
+    """
+    workspace, error_message = resolve_workspace(given_work_directory)
+    if workspace is None:
+        return None, [], error_message
+    if isinstance(files, str):
+        files = [files]
+    budget = workspace.limits.max_batch_read_chars
+
+    items = []
+    seen = set()
+    for file in files:
+        path, error_message = workspace.resolve_path(file)
+        if path is None:
+            items.append({"file": file, "path": None, "error": error_message})
+        elif path not in seen:
+            seen.add(path)
+            items.append({"file": file, "path": path})
+    pending = [item for item in items if item["path"] is not None]
+
+    def read(item):
+        try:
+            if not item["path"].is_file():
+                item["error"] = workspace.language.get(
+                    "error_file_not_found", item["path"]
+                )
+                return
+            # One character over the budget shows whether the file was cut
+            prefetched = take_prefetched(workspace, "file", item["path"])
+            if prefetched is not None:
+                item["content"] = prefetched[: budget + 1]
+                return
+            with open(item["path"], "r") as f:
+                item["content"] = f.read(budget + 1)
+        except (OSError, UnicodeDecodeError):
+            item["error"] = workspace.language.get("error_file_access")
+
+    if len(pending) > 1:
+        with ThreadPoolExecutor(min(MAX_TOOL_WORKERS, len(pending))) as executor:
+            list(executor.map(read, pending))
+    else:
+        for item in pending:
+            read(item)
+
+    readable = [item for item in pending if "content" in item]
+    allotments = share_budget([len(item["content"]) for item in readable], budget)
+    for item, allotment in zip(readable, allotments):
+        if allotment < len(item["content"]):
+            item["content"] = item["content"][:allotment]
+            item["truncated"] = True
+    return workspace, items, ""
+
+
+def get_files_content(given_work_directory, files):
+    workspace, items, error_message = read_files_content(given_work_directory, files)
+    if workspace is None:
+        return error_message
+    for item in items:
+        del item["path"]
+    return {"files": items}
 
 
 def write_file(given_work_directory, file_path, content):
-    is_valid, error_message = check_path_within_directory(
+    workspace, abs_joined_file_path, error_message = resolve_tool_path(
         given_work_directory, file_path
     )
 
-    if not is_valid:
+    if abs_joined_file_path is None:
         return error_message
 
+    forget_prefetched(workspace)
     try:
-        abs_joined_file_path = Path(
-            os.path.join(given_work_directory, file_path)
-        ).resolve()
-
         with open(abs_joined_file_path, "w") as file:
             file.write(content)
-        return language.get("success_write_file", file_path, len(content))
+        return workspace.language.get("success_write_file", file_path, len(content))
 
     except (FileNotFoundError, PermissionError):
-        return language.get("error_file_access")
+        return workspace.language.get("error_file_access")
 
 
 def run_python_file(given_work_directory, file_path, args=[]):
-    is_valid, error_message = check_path_within_directory(
+    workspace, abs_joined_file_path, error_message = resolve_tool_path(
         given_work_directory, file_path
     )
 
-    if not is_valid:
+    if abs_joined_file_path is None:
         return error_message
 
+    messages = workspace.language
+    timeout = workspace.limits.execution_timeout
+    # The script may change anything in the workspace
+    forget_prefetched(workspace)
     try:
-        abs_joined_file_path = Path(
-            os.path.join(given_work_directory, file_path)
-        ).resolve()
-
         if not abs_joined_file_path.is_file():
-            return language.get("error_file_not_exists", file_path)
+            return messages.get("error_file_not_exists", file_path)
 
         if not has_python_extension(abs_joined_file_path):
-            return language.get("error_no_py_extension", file_path)
+            return messages.get("error_no_py_extension", file_path)
 
         try:
             if isinstance(args, str):
@@ -152,19 +367,19 @@ def run_python_file(given_work_directory, file_path, args=[]):
             result = subprocess.run(
                 runwithargs,
                 capture_output=True,
-                cwd=str(Path(given_work_directory).resolve()),
-                timeout=30,
+                cwd=str(workspace.root),
+                timeout=timeout,
                 check=False,
                 text=True,
             )
             return f"STDOUT:{result.stdout} STDERR:{result.stderr}"
         except subprocess.TimeoutExpired:
-            return language.get("error_execution_timeout", file_path)
+            return messages.get("error_execution_timeout", file_path, timeout)
         except Exception as e:
-            return language.get("error_execution", str(e))
+            return messages.get("error_execution", str(e))
 
     except (FileNotFoundError, PermissionError):
-        return language.get("error_file_access")
+        return messages.get("error_file_access")
 
 
 def has_python_extension(filename):
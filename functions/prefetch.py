@@ -0,0 +1,217 @@
+import os
+import stat
+import sys
+import threading
+from pathlib import Path
+
+from config.settings import (
+    PREFETCH_DEPTH,
+    PREFETCH_MAX_FILE_BYTES,
+    PREFETCH_MAX_FILES,
+    PREFETCH_MEMORY_LIMIT,
+)
+from functions.metrics import CACHE_REQUESTS, PREFETCH_ENTRIES
+from functions.path_utils import list_directory
+
+# Directories never prefetched from, in addition to hidden ones
+SKIPPED_DIRECTORIES = {"__pycache__", "node_modules"}
+
+
+def _stamp(path):
+    status = os.stat(path)
+    return status.st_mtime_ns, status.st_size
+
+
+def _listing_stamp(directory):
+    """
+    The directory's mtime plus the mtime and size of every entry in it, as
+    in-place edits change what list_directory reports without touching the
+    directory's own mtime.
+    """
+    entries = []
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            try:
+                status = entry.stat()
+            except OSError:
+                entries.append((entry.name, None))
+            else:
+                entries.append((entry.name, status.st_mtime_ns, status.st_size))
+    entries.sort()
+    return os.stat(directory).st_mtime_ns, entries
+
+
+class Prefetcher:
+    """
+    Warms the workspace listing and small files while the model is thinking.
+
+    start() runs a background thread that lists the workspace root and then
+    reads the most recently modified small files near the top of the tree,
+    newest first, until PREFETCH_MAX_FILES files or the memory limit is
+    reached. cancel() stops it as soon as the model responds; nothing is
+    stored after that. The tools in path_utils find the prefetcher in the
+    workspace cache and use an entry only if the file's mtime and size (for
+    a listing, the directory's mtime and those of its entries) are
+    unchanged, and writes drop everything.
+
+    Args:
+        workspace (Workspace): The workspace to prefetch from.
+        memory_limit (int): Most bytes the prefetched strings may occupy.
+        max_files (int): Most files to read.
+        max_file_bytes (int): Larger files are skipped.
+        depth (int): How many directory levels below the root to consider.
+    """
+
+    def __init__(
+        self,
+        workspace,
+        memory_limit=PREFETCH_MEMORY_LIMIT,
+        max_files=PREFETCH_MAX_FILES,
+        max_file_bytes=PREFETCH_MAX_FILE_BYTES,
+        depth=PREFETCH_DEPTH,
+    ):
+        self.workspace = workspace
+        self.memory_limit = memory_limit
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.depth = depth
+        self.memory = 0
+        self.stored_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # (kind, path) -> (stamp, text)
+        self._stored = set()
+        self._used = set()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Registers with the workspace and starts prefetching."""
+        self.workspace.cache["prefetch"] = self
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def cancel(self, timeout=1.0):
+        """Stops prefetching; entries stored so far stay usable."""
+        self._cancelled.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _store(self, kind, path, stamp, text):
+        size = sys.getsizeof(text)
+        with self._lock:
+            if self._cancelled.is_set() or self.memory + size > self.memory_limit:
+                return False
+            self._entries[(kind, path)] = (stamp, text)
+            self._stored.add((kind, path))
+            self.memory += size
+            self.stored_bytes += size
+            return True
+
+    def _candidates(self):
+        """Small files up to `depth` levels down, newest first."""
+        candidates = []
+        for directory, subdirectories, filenames in os.walk(self.workspace.root):
+            if self._cancelled.is_set():
+                return []
+            relative = os.path.relpath(directory, self.workspace.root)
+            level = 0 if relative == os.curdir else relative.count(os.sep) + 1
+            if level >= self.depth:
+                subdirectories[:] = []
+            else:
+                subdirectories[:] = [
+                    name
+                    for name in subdirectories
+                    if not name.startswith(".") and name not in SKIPPED_DIRECTORIES
+                ]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    status = os.lstat(path)
+                except OSError:
+                    continue
+                # Symlinks are left to the tools, which resolve and check them
+                if (
+                    stat.S_ISREG(status.st_mode)
+                    and status.st_size <= self.max_file_bytes
+                ):
+                    candidates.append((status.st_mtime_ns, path))
+        candidates.sort(reverse=True)
+        return [path for _, path in candidates[: self.max_files]]
+
+    def _run(self):
+        root = self.workspace.root
+        try:
+            stamp = _listing_stamp(root)
+            self._store("listing", root, stamp, list_directory(self.workspace, root))
+        except OSError:
+            pass
+        for path in self._candidates():
+            if self._cancelled.is_set():
+                return
+            try:
+                stamp = _stamp(path)
+                with open(path, "r") as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue  # Binary or unreadable; the tool will say so itself
+            if not self._store("file", Path(path), stamp, text):
+                return
+
+    def take(self, kind, path):
+        """
+        Returns the prefetched text for a tool, or None if it is missing or
+        stale. Counts a hit or a miss either way.
+        """
+        key = (kind, path)
+        with self._lock:
+            entry = self._entries.get(key)
+        text = None
+        if entry is not None:
+            stamp, text = entry
+            try:
+                current = _listing_stamp(path) if kind == "listing" else _stamp(path)
+            except OSError:
+                current = None
+            if current != stamp:
+                text = None
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._used.add(key)
+        CACHE_REQUESTS.inc(cache="prefetch", result="miss" if text is None else "hit")
+        return text
+
+    def invalidate(self):
+        """Drops all entries, e.g. because a tool wrote to the workspace."""
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+
+    def finish(self):
+        """
+        Cancels prefetching, detaches from the workspace and reports.
+
+        Returns:
+            dict: entries prefetched, bytes they held, how many a tool used,
+                  and the tools' lookups that hit and missed.
+        """
+        self.cancel()
+        if self.workspace.cache.get("prefetch") is self:
+            del self.workspace.cache["prefetch"]
+        with self._lock:
+            for kind, path in self._stored:
+                used = (kind, path) in self._used
+                PREFETCH_ENTRIES.inc(kind=kind, outcome="used" if used else "unused")
+            return {
+                "entries": len(self._stored),
+                "bytes": self.stored_bytes,
+                "used": len(self._used),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import re
+import time
+from collections import deque, namedtuple
+
+from google.genai import errors
+
+from config.settings import (
+    MODEL_ROUTES,
+    ROUTER_LATENCY_BUDGET,
+    ROUTER_MAX_ERROR_RATE,
+    ROUTER_WINDOW,
+)
+from functions.metrics import MODEL_LATENCY, MODEL_REQUESTS
+
+# One row of the routing table. max_prompt_chars of None means no limit;
+# tools says whether the model should handle requests likely to call tools.
+Route = namedtuple("Route", ["model", "cost", "max_prompt_chars", "tools"])
+
+# Words in a prompt that suggest the model will want the file tools
+TOOL_HINTS = re.compile(
+    r"\b(files?|director(y|ies)|folders?|read|write|run|execute|list|open|"
+    r"fix|debug|tests?|code|script)\b|\.py\b",
+    re.IGNORECASE,
+)
+
+
+def request_signals(messages):
+    """
+    Computes the cheap request features routing decisions are based on.
+
+    Args:
+        messages (list): The conversation as types.Content, newest last.
+
+    Returns:
+        dict: prompt_chars, the total text length, and needs_tools, whether
+              the latest prompt mentions files or code or the conversation
+              already used tools.
+    """
+    prompt_chars = 0
+    used_tools = False
+    for content in messages:
+        for part in content.parts or ():
+            if part.text:
+                prompt_chars += len(part.text)
+            if part.function_call or part.function_response:
+                used_tools = True
+    latest = ""
+    if messages and messages[-1].parts:
+        latest = "".join(part.text or "" for part in messages[-1].parts)
+    return {
+        "prompt_chars": prompt_chars,
+        "needs_tools": used_tools or bool(TOOL_HINTS.search(latest)),
+    }
+
+
+class ModelHealth:
+    """Latency and outcome of a model's most recent requests."""
+
+    __slots__ = ("latencies", "outcomes")
+
+    def __init__(self, window=ROUTER_WINDOW, latencies=(), outcomes=()):
+        self.latencies = deque(latencies, maxlen=window)
+        self.outcomes = deque(outcomes, maxlen=window)
+
+    def record(self, latency, ok):
+        if ok:
+            self.latencies.append(latency)
+        self.outcomes.append(ok)
+
+    def p95(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class Router:
+    """
+    Picks a model for each request from a routing table.
+
+    Routes that fit the prompt and, if tools look likely, handle tools are
+    eligible. Healthy eligible routes (p95 latency within budget and error
+    rate under the limit) are tried cheapest first, then unhealthy ones.
+    When a request fails the next route in that order is tried.
+
+    Args:
+        routes (list): Route tuples or dicts with the same fields.
+        latency_budget (float): p95 latency in seconds above which a model
+            counts as slow.
+        max_error_rate (float): Error rate above which a model counts as
+            failing.
+        window (int): How many recent requests per model the stats keep.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        routes=MODEL_ROUTES,
+        latency_budget=ROUTER_LATENCY_BUDGET,
+        max_error_rate=ROUTER_MAX_ERROR_RATE,
+        window=ROUTER_WINDOW,
+        clock=time.perf_counter,
+    ):
+        self.routes = [
+            route if isinstance(route, Route) else Route(**route) for route in routes
+        ]
+        self.latency_budget = latency_budget
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.clock = clock
+        self.health = {route.model: ModelHealth(window) for route in self.routes}
+
+    def _unhealthy_reason(self, model):
+        health = self.health[model]
+        p95 = health.p95()
+        if p95 is not None and p95 > self.latency_budget:
+            return f"p95 {p95:.2f}s over budget"
+        if health.error_rate() > self.max_error_rate:
+            return f"error rate {health.error_rate():.0%}"
+        return None
+
+    def choose(self, messages):
+        """
+        Orders the routes to try for a request.
+
+        Args:
+            messages (list): The conversation as types.Content.
+
+        Returns:
+            tuple: (models, signals, reason) where models is the try order,
+                   signals the request_signals used and reason a short
+                   explanation of the first choice.
+        """
+        signals = request_signals(messages)
+        fits = [
+            route
+            for route in self.routes
+            if route.max_prompt_chars is None
+            or signals["prompt_chars"] <= route.max_prompt_chars
+        ]
+        if not fits:
+            # Nothing is big enough; the largest model is the best bet
+            fits = [max(self.routes, key=lambda r: r.max_prompt_chars)]
+        eligible = [r for r in fits if r.tools or not signals["needs_tools"]]
+        healthy, unhealthy, skipped = [], [], []
+        for route in sorted(eligible or fits, key=lambda r: r.cost):
+            problem = self._unhealthy_reason(route.model)
+            if problem is None:
+                healthy.append(route.model)
+            else:
+                unhealthy.append(route.model)
+                skipped.append(f"{route.model}: {problem}")
+        models = healthy + unhealthy
+        # Models that fit the prompt but not the tool hint are a last resort
+        models += [
+            r.model for r in sorted(fits, key=lambda r: r.cost) if r.model not in models
+        ]
+        kind = "tool use" if signals["needs_tools"] else "chat"
+        if healthy:
+            reason = f"cheapest healthy route for {kind}"
+        else:
+            reason = f"no healthy route for {kind}"
+        if skipped:
+            reason += " (skipped " + "; ".join(skipped) + ")"
+        return models, signals, reason
+
+    def record(self, model, latency, ok):
+        health = self.health.get(model)
+        if health is None:
+            health = self.health[model] = ModelHealth(self.window)
+        health.record(latency, ok)
+
+    def _send(self, client, model, messages, config, context_cache):
+        if context_cache is None:
+            response = client.models.generate_content(
+                model=model, contents=messages, config=config
+            )
+            return response, None
+        contents, cached_config, cache = context_cache.prepare(
+            client, model, messages, config
+        )
+        if cache["name"] is None:
+            response = client.models.generate_content(
+                model=model, contents=messages, config=config
+            )
+            return response, cache
+        try:
+            response = client.models.generate_content(
+                model=model, contents=contents, config=cached_config
+            )
+        except errors.ClientError:
+            # The handle expired or was deleted early; send the whole prompt
+            context_cache.discard(cache["name"])
+            cache = {"name": None, "contents": 0, "result": "error"}
+            response = client.models.generate_content(
+                model=model, contents=messages, config=config
+            )
+        return response, cache
+
+    def generate(self, client, messages, config, context_cache=None):
+        """
+        Sends a request, falling back along the route order on failure.
+
+        Args:
+            client: A genai.Client or FakeClient.
+            messages (list): The conversation as types.Content.
+            config (types.GenerateContentConfig): The request config.
+            context_cache (ContextCache): Sends the static prefix of the
+                request as a cached-content handle where possible.
+
+        Returns:
+            tuple: (response, route) where route records the model used, the
+                   reason, the signals, every attempt made and, with a
+                   context_cache, how the cache was used.
+
+        Raises:
+            Exception: The last model's error if every route failed.
+        """
+        models, signals, reason = self.choose(messages)
+        route = {"model": None, "reason": reason, "signals": signals, "attempts": []}
+        error = None
+        for model in models:
+            start = self.clock()
+            try:
+                response, cache = self._send(
+                    client, model, messages, config, context_cache
+                )
+            except Exception as e:
+                latency = self.clock() - start
+                self.record(model, latency, False)
+                MODEL_REQUESTS.inc(model=model, outcome="error")
+                MODEL_LATENCY.observe(latency, model=model)
+                route["attempts"].append(
+                    {"model": model, "seconds": round(latency, 3), "error": str(e)}
+                )
+                error = e
+                continue
+            latency = self.clock() - start
+            self.record(model, latency, True)
+            MODEL_REQUESTS.inc(model=model, outcome="ok")
+            MODEL_LATENCY.observe(latency, model=model)
+            route["attempts"].append({"model": model, "seconds": round(latency, 3)})
+            route["model"] = model
+            if cache is not None:
+                route["cache"] = cache
+            return response, route
+        raise error
+
+    def load_stats(self, path):
+        """
+        Restores stats saved by save_stats.
+
+        A missing or unreadable file is ignored, as are malformed entries.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(saved, dict):
+            return
+        for model, stats in saved.items():
+            try:
+                latencies = [float(latency) for latency in stats["latencies"]]
+                outcomes = [bool(ok) for ok in stats["outcomes"]]
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.health[model] = ModelHealth(self.window, latencies, outcomes)
+
+    def save_stats(self, path):
+        """
+        Writes the stats atomically so the next run starts with them.
+
+        The stats are best-effort: a failure to write them is ignored.
+
+        Returns:
+            bool: Whether the stats were written.
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        model: {
+                            "latencies": list(health.latencies),
+                            "outcomes": list(health.outcomes),
+                        }
+                        for model, health in self.health.items()
+                    },
+                    f,
+                )
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return False
+        return True
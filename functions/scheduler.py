@@ -0,0 +1,209 @@
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import MAX_TOOL_WORKERS
+from functions.language import language
+from functions.metrics import TOOL_CALLS, TOOL_LATENCY
+
+# Key standing for the whole working directory; it overlaps every path.
+WORKSPACE = "."
+
+READ = "read"
+WRITE = "write"
+
+# Tool name -> (access mode, path argument, default path). The argument may
+# hold one path or a list of them; a path argument of None means the call may
+# touch anything in the working directory.
+TOOL_ACCESS = {
+    "get_files_info": (READ, "directory", "."),
+    "get_file_content": (READ, "file", None),
+    "get_files_content": (READ, "files", None),
+    "find_symbol": (READ, None, None),
+    "outline_file": (READ, "file", None),
+    "write_file": (WRITE, "file_path", None),
+    "run_python_file": (WRITE, None, None),
+}
+
+# Outcome of one tool call; error is a translated message, or None on success.
+ToolResult = namedtuple("ToolResult", ["name", "args", "result", "error"])
+
+
+def normalize_path(path):
+    """
+    Returns the lock key for a path relative to the working directory.
+
+    Args:
+        path (str): The path as given by the model.
+
+    Returns:
+        str: The normalized relative path, or WORKSPACE for the root and for
+             anything that is absolute or climbs out with "..".
+    """
+    if not isinstance(path, str) or os.path.isabs(path):
+        return WORKSPACE
+    normalized = os.path.normpath(path)
+    if normalized == os.pardir or normalized.startswith(os.pardir + os.sep):
+        return WORKSPACE
+    return normalized
+
+
+def classify_call(name, args):
+    """
+    Determines which paths a tool call reads and writes.
+
+    Unknown tools, and run_python_file, whose script can do anything, are
+    treated as writing the whole working directory.
+
+    Args:
+        name (str): The tool name.
+        args (dict): The arguments the model passed.
+
+    Returns:
+        tuple: (reads, writes), two frozensets of lock keys.
+    """
+    mode, argument, default = TOOL_ACCESS.get(name, (WRITE, None, None))
+    if argument is None:
+        paths = frozenset([WORKSPACE])
+    else:
+        path = args.get(argument, default)
+        if path is None:
+            paths = frozenset([WORKSPACE])
+        elif isinstance(path, (list, tuple)):
+            paths = frozenset(map(normalize_path, path)) or frozenset([WORKSPACE])
+        else:
+            paths = frozenset([normalize_path(path)])
+    if mode == READ:
+        return paths, frozenset()
+    return frozenset(), paths
+
+
+def paths_overlap(a, b):
+    """Returns True if one path is the other or contains it."""
+    if a == b or a == WORKSPACE or b == WORKSPACE:
+        return True
+    return a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def _sets_overlap(paths, others):
+    return any(paths_overlap(a, b) for a in paths for b in others)
+
+
+class _LockRequest:
+    __slots__ = ("reads", "writes")
+
+    def __init__(self, reads, writes):
+        self.reads = reads
+        self.writes = writes
+
+    def conflicts_with(self, other):
+        return (
+            _sets_overlap(self.writes, other.writes)
+            or _sets_overlap(self.writes, other.reads)
+            or _sets_overlap(self.reads, other.writes)
+        )
+
+
+class PathLockTable:
+    """
+    Reader/writer locks on working directory paths, granted in request order.
+
+    Every call registers all of its paths at once with request(), in the
+    order the model issued the calls. acquire() then blocks until no earlier
+    request that is still registered conflicts with it: readers of a path
+    share it, a writer excludes everything overlapping it, and conflicting
+    requests are granted strictly in ticket order. Taking all paths in a
+    single step means requests can never deadlock on each other.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._requests = {}  # ticket -> _LockRequest, in ticket order
+        self._next_ticket = 0
+
+    def request(self, reads, writes):
+        """Registers a request and returns its ticket."""
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._requests[ticket] = _LockRequest(reads, writes)
+            return ticket
+
+    def _blocked(self, ticket):
+        request = self._requests[ticket]
+        for earlier, other in self._requests.items():
+            if earlier >= ticket:
+                return False
+            if request.conflicts_with(other):
+                return True
+        return False
+
+    def acquire(self, ticket):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._blocked(ticket))
+
+    def release(self, ticket):
+        with self._condition:
+            del self._requests[ticket]
+            self._condition.notify_all()
+
+
+def _run_call(function_map, work_directory, call):
+    name, args = call["name"], call["args"]
+    function = function_map.get(name)
+    if function is None:
+        TOOL_CALLS.inc(tool=name, outcome="unknown")
+        return ToolResult(
+            name, args, None, language.get("error_unknown_function", name)
+        )
+    try:
+        with TOOL_LATENCY.time(tool=name):
+            result = function(work_directory, **args)
+    except Exception as e:
+        TOOL_CALLS.inc(tool=name, outcome="error")
+        return ToolResult(
+            name, args, None, language.get("error_function_execution", name, str(e))
+        )
+    TOOL_CALLS.inc(tool=name, outcome="ok")
+    return ToolResult(name, args, result, None)
+
+
+def run_tool_calls(calls, function_map, work_directory, max_workers=MAX_TOOL_WORKERS):
+    """
+    Runs one turn's tool calls, concurrently where they do not conflict.
+
+    Calls touching overlapping paths, with at least one of them writing,
+    run one after the other in the order the model issued them; all other
+    calls run in parallel on a thread pool.
+
+    Args:
+        calls (list): Dicts with "name" and "args", in model order.
+        function_map (dict): Tool name -> function taking the working
+            directory followed by the call's arguments.
+        work_directory: Passed as the first argument of every tool.
+        max_workers (int): Upper bound on calls running at once.
+
+    Returns:
+        list: One ToolResult per call, in the original call order.
+    """
+    if len(calls) <= 1 or max_workers <= 1:
+        return [_run_call(function_map, work_directory, call) for call in calls]
+
+    locks = PathLockTable()
+    # Register every ticket before anything runs, so a later call can never
+    # overtake an earlier conflicting one.
+    tickets = [locks.request(*classify_call(c["name"], c["args"])) for c in calls]
+
+    def run(ticket, call):
+        locks.acquire(ticket)
+        try:
+            return _run_call(function_map, work_directory, call)
+        finally:
+            locks.release(ticket)
+
+    # The pool starts tasks in submission order, so any call waiting in
+    # acquire() only waits on calls that are already running.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as pool:
+        futures = [pool.submit(run, t, c) for t, c in zip(tickets, calls)]
+        return [future.result() for future in futures]
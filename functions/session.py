@@ -0,0 +1,248 @@
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+
+from google.genai import types
+
+from config.settings import SESSIONS_DIRECTORY
+
+INDEX_FILE = "index.jsonl"
+TITLE_LENGTH = 80
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+def _append_line(path, record):
+    """Appends one JSON record as a single write, so a crash loses at most it."""
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_records(path):
+    """
+    Reads a JSON lines file, ignoring torn lines left by a crash.
+
+    Args:
+        path (Path): The file to read.
+
+    Returns:
+        tuple: (records, valid_size) where valid_size is the byte length up to
+               the end of the last newline-terminated line.
+    """
+    records = []
+    valid_size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            valid_size += len(line)
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A torn line that was later appended to; skip it
+                continue
+    return records, valid_size
+
+
+def turn_to_contents(turn):
+    """
+    Rebuilds the Gemini messages for one logged turn.
+
+    Args:
+        turn (dict): A record written by Session.append_turn.
+
+    Returns:
+        list: The user, model and (if tools ran) tool types.Content objects.
+    """
+    contents = [types.Content(role="user", parts=[types.Part(text=turn["user"])])]
+    model_parts = []
+    if turn["response"]:
+        model_parts.append(types.Part(text=turn["response"]))
+    for call in turn["function_calls"]:
+        model_parts.append(
+            types.Part.from_function_call(name=call["name"], args=call["args"])
+        )
+    if model_parts:
+        contents.append(types.Content(role="model", parts=model_parts))
+    if turn["tool_results"]:
+        contents.append(
+            types.Content(
+                role="tool",
+                parts=[
+                    types.Part.from_function_response(
+                        name=result["name"],
+                        response=(
+                            {"error": result["error"]}
+                            if result["error"] is not None
+                            else {"result": result["result"]}
+                        ),
+                    )
+                    for result in turn["tool_results"]
+                ],
+            )
+        )
+    return contents
+
+
+class Session:
+    """
+    One conversation, stored as an append-only JSON lines log.
+
+    Every turn (the prompt, the model's text and function calls, the tool
+    results and usage metadata) is appended as one line of
+    <directory>/<session_id>.jsonl; nothing is ever rewritten. A summary line
+    for the session is appended to <directory>/index.jsonl after each turn, so
+    listing sessions only reads the small index, never the logs.
+    """
+
+    def __init__(self, session_id, directory=SESSIONS_DIRECTORY, turns=None):
+        self.session_id = session_id
+        self.directory = Path(directory)
+        self.turns = turns if turns is not None else []
+
+    @property
+    def path(self):
+        return self.directory / f"{self.session_id}.jsonl"
+
+    @classmethod
+    def create(cls, directory=SESSIONS_DIRECTORY):
+        """
+        Starts a new, empty session with a time-ordered unique id.
+
+        Nothing is written until the first turn is appended, so a run that
+        fails before completing a turn leaves no trace.
+        """
+        session_id = time.strftime("%Y%m%d-%H%M%S-") + secrets.token_hex(3)
+        return cls(session_id, directory)
+
+    @classmethod
+    def load(cls, session_id, directory=SESSIONS_DIRECTORY):
+        """
+        Loads a session's turns from its log, without re-running any tools.
+
+        "last" loads the most recently updated session from the index. A torn
+        final line from an interrupted write is cut off so appends continue
+        from the last complete turn.
+
+        Args:
+            session_id (str): The session to load, or "last".
+            directory (Path): The sessions directory.
+
+        Returns:
+            Session: The loaded session.
+
+        Raises:
+            FileNotFoundError: If there is no such session.
+        """
+        directory = Path(directory)
+        if session_id == "last":
+            sessions = list_sessions(directory)
+            if not sessions:
+                raise FileNotFoundError(session_id)
+            session_id = sessions[0]["id"]
+        path = directory / f"{session_id}.jsonl"
+        turns, valid_size = _read_records(path)
+        if valid_size != path.stat().st_size:
+            os.truncate(path, valid_size)
+        return cls(session_id, directory, turns)
+
+    def messages(self):
+        """Returns the conversation so far as a list of types.Content."""
+        messages = []
+        for turn in self.turns:
+            messages.extend(turn_to_contents(turn))
+        return messages
+
+    @property
+    def blob_directory(self):
+        """Content-addressed store of file versions sent in this session."""
+        return self.directory / f"{self.session_id}.blobs"
+
+    @property
+    def workspace(self):
+        """Root of the workspace the latest turn ran in, or None."""
+        for turn in reversed(self.turns):
+            if turn.get("workspace"):
+                return turn["workspace"]
+        return None
+
+    def append_turn(
+        self,
+        user_input,
+        response_text,
+        function_calls,
+        results,
+        usage,
+        workspace=None,
+        files=None,
+    ):
+        """
+        Logs one completed turn and updates the index.
+
+        Args:
+            user_input (str): The prompt sent to the model.
+            response_text (str): The model's text response.
+            function_calls (list): Dicts with "name" and "args".
+            results (list): The scheduler's ToolResult for each call.
+            usage (dict): The usage and routing metadata, or None.
+            workspace (Workspace): The workspace the tools ran in, if any.
+            files (dict): Resolved path -> digest of file versions the model
+                was sent in full or as a diff this turn.
+        """
+        turn = {
+            "turn": len(self.turns) + 1,
+            "time": _now(),
+            "user": user_input,
+            "response": response_text,
+            "function_calls": function_calls,
+            "tool_results": [
+                {"name": r.name, "result": r.result, "error": r.error} for r in results
+            ],
+            "usage": usage,
+            "workspace": str(workspace.root) if workspace is not None else None,
+            "files": files or {},
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _append_line(self.path, turn)
+        self.turns.append(turn)
+        _append_line(
+            self.directory / INDEX_FILE,
+            {
+                "id": self.session_id,
+                "title": self.turns[0]["user"][:TITLE_LENGTH],
+                "created": self.turns[0]["time"],
+                "updated": turn["time"],
+                "turns": len(self.turns),
+                "size": self.path.stat().st_size,
+            },
+        )
+
+
+def list_sessions(directory=SESSIONS_DIRECTORY):
+    """
+    Lists sessions from the index, most recently updated first.
+
+    Args:
+        directory (Path): The sessions directory.
+
+    Returns:
+        list: One dict per session with id, title, created, updated, turns
+              and size, taken from the session's latest index line.
+    """
+    index = Path(directory) / INDEX_FILE
+    if not index.is_file():
+        return []
+    records, _ = _read_records(index)
+    latest = {}
+    for record in records:
+        # Re-insert so the dict ends up ordered by last update
+        latest.pop(record["id"], None)
+        latest[record["id"]] = record
+    return list(reversed(latest.values()))
@@ -0,0 +1,323 @@
+import ast
+import hashlib
+import json
+import os
+import stat
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config.settings import SYMBOL_INDEX_DIRECTORY
+from functions.path_utils import resolve_tool_path, resolve_workspace
+
+INDEX_VERSION = 1
+# Parse in worker processes once at least this many files need parsing
+PARALLEL_PARSE_MIN_FILES = 64
+# Directories never indexed, in addition to hidden ones
+SKIPPED_DIRECTORIES = {"__pycache__", "node_modules"}
+# Most matches find_symbol lists
+MAX_SYMBOL_MATCHES = 20
+
+
+def _signature(node):
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return (
+            f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+        )
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def _first_doc_line(node):
+    doc = ast.get_docstring(node)
+    if not doc:
+        return ""
+    return doc.strip().splitlines()[0].strip()
+
+
+def _collect_symbols(body, parent):
+    symbols = []
+    for node in body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if isinstance(node, ast.ClassDef):
+            kind = "class"
+        else:
+            kind = "method" if parent is not None else "function"
+        qualname = f"{parent}.{node.name}" if parent else node.name
+        symbols.append(
+            {
+                "name": node.name,
+                "qualname": qualname,
+                "kind": kind,
+                "signature": _signature(node),
+                "doc": _first_doc_line(node),
+                "start": min([node.lineno] + [d.lineno for d in node.decorator_list]),
+                "end": node.end_lineno,
+            }
+        )
+        if kind == "class":
+            symbols.extend(_collect_symbols(node.body, qualname))
+    return symbols
+
+
+def extract_symbols(source):
+    """
+    Lists the classes, functions and methods defined in Python source.
+
+    Functions nested inside functions are local and are not listed.
+
+    Args:
+        source (str): The module source.
+
+    Returns:
+        list: One dict per symbol with name, qualname, kind ("class",
+              "function" or "method"), signature, doc (first docstring
+              line), start and end (1-based lines, decorators included),
+              in source order.
+
+    Raises:
+        SyntaxError: If the source does not parse.
+    """
+    return _collect_symbols(ast.parse(source).body, None)
+
+
+def _parse_file(path):
+    """Returns (symbols, error) for one file; runs in worker processes."""
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        return extract_symbols(source), None
+    except SyntaxError as e:
+        return [], f"line {e.lineno}: {e.msg}"
+    except (MemoryError, RecursionError):
+        # Deep nesting overflows the parser's stack (MemoryError before 3.10)
+        return [], "too deeply nested to parse"
+    except (OSError, ValueError) as e:
+        return [], str(e)
+
+
+class SymbolIndex:
+    """
+    Classes, functions and methods of every .py file under a root.
+
+    The index is kept in a JSON file and brought up to date on each
+    lookup: only files whose mtime or size changed are parsed again, and
+    files that disappeared are dropped. When many files need parsing, as
+    on a cold start, they are parsed across processes.
+
+    Args:
+        root (Path): The directory to index.
+        index_file (Path): Where the index is persisted, or None to keep it
+            in memory only.
+    """
+
+    def __init__(self, root, index_file=None):
+        self.root = str(root)
+        self.index_file = index_file
+        self.files = {}  # relative path -> {"mtime", "size", "symbols", "error"}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.index_file is None:
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == INDEX_VERSION
+            and data.get("root") == self.root
+        ):
+            self.files = data["files"]
+
+    def _save(self):
+        if self.index_file is None:
+            return
+        # Unique per process and thread, as agents may share the cache directory
+        temporary = f"{self.index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": INDEX_VERSION, "root": self.root, "files": self.files},
+                    f,
+                )
+            os.replace(temporary, self.index_file)
+        except OSError:
+            # The index is a cache: the next refresh parses the files again
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def _python_files(self):
+        for directory, subdirectories, filenames in os.walk(self.root):
+            subdirectories[:] = sorted(
+                name
+                for name in subdirectories
+                if not name.startswith(".") and name not in SKIPPED_DIRECTORIES
+            )
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    path = os.path.join(directory, filename)
+                    yield os.path.relpath(path, self.root), path
+
+    def _parse(self, paths):
+        if len(paths) >= PARALLEL_PARSE_MIN_FILES:
+            try:
+                with ProcessPoolExecutor() as executor:
+                    return list(executor.map(_parse_file, paths, chunksize=16))
+            except (OSError, BrokenProcessPool):
+                pass  # No usable worker processes here; parse in this one
+        return [_parse_file(path) for path in paths]
+
+    def refresh(self, relative_paths=None):
+        """
+        Re-parses files that changed since they were indexed.
+
+        Args:
+            relative_paths (list): Only check these files, or None to scan the
+                whole root, also dropping files that no longer exist.
+
+        Returns:
+            int: How many files were parsed.
+        """
+        with self._lock:
+            if relative_paths is None:
+                candidates = list(self._python_files())
+                current = {relative for relative, _ in candidates}
+                removed = [r for r in self.files if r not in current]
+            else:
+                candidates = [(r, os.path.join(self.root, r)) for r in relative_paths]
+                removed = []
+            stale = []
+            for relative, path in candidates:
+                try:
+                    status = os.lstat(path)
+                except OSError:
+                    status = None
+                # Symlinks are not followed: they may point out of the root
+                if status is None or not stat.S_ISREG(status.st_mode):
+                    if self.files.pop(relative, None) is not None:
+                        removed.append(relative)
+                    continue
+                entry = self.files.get(relative)
+                if (
+                    entry is None
+                    or entry["mtime"] != status.st_mtime_ns
+                    or entry["size"] != status.st_size
+                ):
+                    stale.append((relative, path, status))
+            for relative in removed:
+                self.files.pop(relative, None)
+            parsed = self._parse([path for _, path, _ in stale])
+            for (relative, _, status), (symbols, error) in zip(stale, parsed):
+                self.files[relative] = {
+                    "mtime": status.st_mtime_ns,
+                    "size": status.st_size,
+                    "symbols": symbols,
+                    "error": error,
+                }
+            if stale or removed:
+                self._save()
+            return len(stale)
+
+    def find(self, name, limit=None):
+        """
+        Finds symbols by name.
+
+        Exact matches on the name or qualified name ("Class.method") are
+        returned if there are any; otherwise case-insensitive substring
+        matches.
+
+        Returns:
+            tuple: (matches, total) where matches is at most `limit` (default
+                   MAX_SYMBOL_MATCHES) (relative path, symbol) pairs, sorted by path and line.
+        """
+        exact, partial = [], []
+        needle = name.lower()
+        with self._lock:
+            files = sorted(self.files.items())
+        for relative, entry in files:
+            for symbol in entry["symbols"]:
+                if name in (symbol["name"], symbol["qualname"]):
+                    exact.append((relative, symbol))
+                elif needle in symbol["qualname"].lower():
+                    partial.append((relative, symbol))
+        matches = exact or partial
+        return matches[: limit or MAX_SYMBOL_MATCHES], len(matches)
+
+
+def index_file_for(root):
+    """Returns where the index of the directory `root` is persisted."""
+    digest = hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]
+    return SYMBOL_INDEX_DIRECTORY / f"{digest}.json"
+
+
+def get_symbol_index(workspace):
+    """Returns the workspace's SymbolIndex, loading it on first use."""
+    index = workspace.cache.get("symbol_index")
+    if index is None:
+        index = workspace.cache.setdefault(
+            "symbol_index", SymbolIndex(workspace.root, index_file_for(workspace.root))
+        )
+    return index
+
+
+def _format_symbol(relative, symbol):
+    line = f"{relative}:{symbol['start']}-{symbol['end']} {symbol['kind']} {symbol['qualname']}: {symbol['signature']}"
+    if symbol["doc"]:
+        line += f"  # {symbol['doc']}"
+    return line
+
+
+def find_symbol(given_work_directory, name):
+    workspace, error_message = resolve_workspace(given_work_directory)
+    if workspace is None:
+        return error_message
+    index = get_symbol_index(workspace)
+    index.refresh()
+    matches, total = index.find(name)
+    if not matches:
+        return workspace.language.get("symbol_not_found", name)
+    lines = [_format_symbol(relative, symbol) for relative, symbol in matches]
+    if total > len(matches):
+        lines.append(workspace.language.get("symbols_truncated", len(matches), total))
+    return "\n".join(lines)
+
+
+def outline_file(given_work_directory, file):
+    workspace, resolved_path, error_message = resolve_tool_path(
+        given_work_directory, file
+    )
+    if resolved_path is None:
+        return error_message
+    if not resolved_path.is_file():
+        return workspace.language.get("error_file_not_found", resolved_path)
+    if resolved_path.suffix != ".py":
+        return workspace.language.get("error_no_py_extension", file)
+    relative = os.path.relpath(resolved_path, workspace.root)
+    index = get_symbol_index(workspace)
+    index.refresh([relative])
+    entry = index.files.get(relative)
+    if entry is None:
+        return workspace.language.get("error_file_access")
+    if entry["error"]:
+        return workspace.language.get("error_outline_parse", file, entry["error"])
+    if not entry["symbols"]:
+        return workspace.language.get("outline_empty", file)
+    return "\n".join(
+        "    " * symbol["qualname"].count(".")
+        + f"{symbol['start']}-{symbol['end']} {symbol['signature']}"
+        + (f"  # {symbol['doc']}" if symbol["doc"] else "")
+        for symbol in entry["symbols"]
+    )
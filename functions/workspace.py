@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from config.settings import (
+    EXECUTION_TIMEOUT,
+    LANGUAGE,
+    MAX_BATCH_READ_CHARS,
+    MAX_FILE_READ_CHARS,
+    WORKING_DIRECTORY,
+)
+from functions.language import Language, language
+
+# Per-workspace resource limits for the tools
+WorkspaceLimits = namedtuple(
+    "WorkspaceLimits",
+    ["max_file_read_chars", "execution_timeout", "max_batch_read_chars"],
+    defaults=[MAX_BATCH_READ_CHARS],
+)
+DEFAULT_LIMITS = WorkspaceLimits(
+    MAX_FILE_READ_CHARS, EXECUTION_TIMEOUT, MAX_BATCH_READ_CHARS
+)
+
+
+class Workspace:
+    """
+    A project directory the tools are sandboxed to.
+
+    The root is resolved once, when the workspace is created; paths given
+    by the model are still resolved on every call, so symlinks changed
+    later cannot be used to escape the root. Each workspace carries its own
+    limits, its own Language for tool messages, and a `cache` dict that
+    tools can keep per-workspace state in.
+
+    Args:
+        root (str or Path): The directory to sandbox the tools to.
+        limits (WorkspaceLimits): Resource limits for the tools.
+        language_code (str): Locale for tool messages.
+
+    Raises:
+        ValueError: If root does not exist or is not a directory.
+    """
+
+    def __init__(self, root, limits=DEFAULT_LIMITS, language_code=LANGUAGE):
+        self.root = Path(root).resolve()
+        if not self.root.is_dir():
+            raise ValueError(
+                f"Working directory '{self.root}' does not exist or is not a directory"
+            )
+        self.limits = limits
+        self.language = (
+            language
+            if language_code == language.language_code
+            else Language(language_code)
+        )
+        self.cache = {}
+        self._root_prefix = os.path.join(str(self.root), "")
+
+    def __repr__(self):
+        return f"Workspace({str(self.root)!r})"
+
+    def __fspath__(self):
+        return str(self.root)
+
+    def resolve_path(self, path):
+        """
+        Resolves a path relative to the root, refusing anything outside it.
+
+        Args:
+            path (str): The path as given by the model.
+
+        Returns:
+            tuple: (resolved_path, error_message) where resolved_path is None
+                   and error_message explains why if the path is not allowed.
+        """
+        try:
+            resolved = Path(os.path.join(self.root, path)).resolve()
+        except (FileNotFoundError, ValueError, RuntimeError, TypeError):
+            return None, self.language.get("error_path_resolution", self.root, path)
+        if resolved == self.root or str(resolved).startswith(self._root_prefix):
+            return resolved, ""
+        return None, self.language.get("error_outside_directory", path, self.root)
+
+
+_workspaces = {}
+_workspaces_lock = threading.Lock()
+
+
+def get_workspace(root=WORKING_DIRECTORY):
+    """
+    Returns the shared Workspace for a root, creating it on first use.
+
+    Workspaces are cached by the root exactly as given, so repeated calls
+    with the same string do not touch the filesystem.
+
+    Raises:
+        ValueError: If root does not exist or is not a directory.
+    """
+    key = str(root)
+    workspace = _workspaces.get(key)
+    if workspace is None:
+        with _workspaces_lock:
+            workspace = _workspaces.get(key)
+            if workspace is None:
+                workspace = _workspaces[key] = Workspace(root)
+    return workspace
+
+
+def clear_workspace_cache():
+    """Forgets all shared workspaces and their tool caches."""
+    with _workspaces_lock:
+        _workspaces.clear()
@@ -2,11 +2,27 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 import sys
+import atexit
 import argparse
 from google import genai
 from google.genai import types
 from functions.language import *  # Import the language module
 from functions.path_utils import *  # Import path utility functions
+from functions.scheduler import run_tool_calls
+from functions.context_cache import ContextCache
+from functions.dedup import (
+    ContentLedger,
+    deduplicated_get_file_content,
+    deduplicated_get_files_content,
+)
+from functions.fake_backend import FakeClient
+from functions.memory_profile import GROWTH_TURNS, MemoryProfiler
+from functions.metrics import TOKENS, metrics
+from functions.prefetch import Prefetcher
+from functions.router import Router
+from functions.session import Session, list_sessions
+from functions.symbol_index import find_symbol, outline_file
+from functions.workspace import Workspace
 from config.settings import *
 
 # Load environment variables
@@ -34,43 +50,59 @@ def initialize_client(api_key: str) -> tuple:
         return None, language.get("error_client_init", str(e))
 
 
-def generate_content(client, user_input: str, verbose: bool = False) -> tuple:
+def generate_content(
+    client,
+    messages: list,
+    verbose: bool = False,
+    router: Router = None,
+    context_cache: ContextCache = None,
+) -> tuple:
     """
-    Generates content using the Gemini API with the given user input.
+    Generates content using the Gemini API for the given conversation.
 
     Args:
         client: The initialized Gemini API client.
-        user_input (str): The user's input text.
-        verbose (bool): Whether to include usage metadata and debug info in the output.
+        messages (list): The conversation so far as types.Content, ending
+            with the user's new input.
+        verbose (bool): Whether to print debug info.
+        router (Router): Chooses the model; a default Router if None.
+        context_cache (ContextCache): Sends the system prompt, the tool
+            declarations and earlier turns as a server-side cached prefix
+            where possible; None sends everything with every request.
 
     Returns:
         tuple: (response_text, metadata, function_calls, error_message)
                where response_text is the API response text,
-               metadata is usage metadata if verbose is True,
+               metadata holds the routing decision under "route" and the
+               usage metadata, including cached prompt tokens, when available,
                function_calls is a list of function call details,
                and error_message is empty if successful.
     """
     SYSTEM_PROMPT = """
     You are a helpful AI coding agent. When a user asks a question or makes a request, make a function call plan. Available functions:
     - get_files_info(directory): List files and directories in the specified directory (relative to the working directory).
-    - get_file_content(file): Read the first 10000 characters of the specified file (relative to the working directory).
+    - get_file_content(file, start_line, end_line): Read the first 10000 characters of the specified file (relative to the working directory), or only the given lines.
+    - get_files_content(files): Read several files at once; prefer it to several get_file_content calls. The files share one 30000 character budget.
+    - find_symbol(name): Find where a Python class, function or method is defined, with its line range.
+    - outline_file(file): List the classes, functions and methods of a Python file with their line ranges.
     - write_file(file): Write to a file.
     - run_python_file(file): Execute a python file.
+    To look at a particular definition, use find_symbol or outline_file and then read just its lines.
     All paths must be relative to the working directory. Do not include the working directory in your function call arguments.
     """
-    messages = [types.Content(role="user", parts=[types.Part(text=user_input)])]
-
+    router = router or Router()
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-001",
-            contents=messages,
-            config=types.GenerateContentConfig(
+        response, route = router.generate(
+            client,
+            messages,
+            types.GenerateContentConfig(
                 tools=[available_functions], system_instruction=SYSTEM_PROMPT
             ),
+            context_cache,
         )
         response_text = ""
         function_calls = []
-        metadata = None
+        metadata = {"route": route}
 
         # Extract response text and function calls from candidates
         if response.candidates:
@@ -101,13 +133,22 @@ def generate_content(client, user_input: str, verbose: bool = False) -> tuple:
                 if verbose:
                     print("Debug: No content parts in candidate")
 
-        # Extract metadata if verbose
-        if verbose and response.usage_metadata:
-            metadata = {
-                "prompt_tokens": response.usage_metadata.prompt_token_count,
-                "response_tokens": response.usage_metadata.candidates_token_count,
-                "total_tokens": response.usage_metadata.total_token_count,
-            }
+        # Extract usage metadata; it is logged with the session
+        if response.usage_metadata:
+            metadata.update(
+                {
+                    "prompt_tokens": response.usage_metadata.prompt_token_count,
+                    "cached_tokens": (
+                        response.usage_metadata.cached_content_token_count or 0
+                    ),
+                    "response_tokens": response.usage_metadata.candidates_token_count,
+                    "total_tokens": response.usage_metadata.total_token_count,
+                }
+            )
+            model = route["model"]
+            TOKENS.inc(metadata["prompt_tokens"] or 0, model=model, kind="prompt")
+            TOKENS.inc(metadata["cached_tokens"], model=model, kind="cached_prompt")
+            TOKENS.inc(metadata["response_tokens"] or 0, model=model, kind="response")
 
         return response_text, metadata, function_calls, ""
     except Exception as e:
@@ -127,7 +168,56 @@ def main() -> int:
     parser.add_argument(
         "--verbose", action="store_true", help=language.get("argparse_verbose_help")
     )
-    parser.add_argument("text", type=str, help=language.get("argparse_text_help"))
+    parser.add_argument(
+        "text", type=str, nargs="?", help=language.get("argparse_text_help")
+    )
+    parser.add_argument(
+        "--resume", metavar="SESSION", help=language.get("argparse_resume_help")
+    )
+    parser.add_argument(
+        "--fake-backend",
+        action="store_true",
+        help=language.get("argparse_fake_backend_help"),
+    )
+    parser.add_argument(
+        "--metrics-address",
+        metavar="HOST:PORT",
+        default=METRICS_ADDRESS,
+        help=language.get("argparse_metrics_address_help"),
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        default=METRICS_FILE,
+        help=language.get("argparse_metrics_file_help"),
+    )
+    parser.add_argument(
+        "--profile-memory",
+        metavar="REPORT",
+        nargs="?",
+        const=str(MEMORY_REPORT_FILE),
+        help=language.get("argparse_profile_memory_help"),
+    )
+    parser.add_argument(
+        "--workspace",
+        metavar="DIRECTORY",
+        help=language.get("argparse_workspace_help"),
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help=language.get("argparse_prefetch_help"),
+    )
+    parser.add_argument(
+        "--no-context-cache",
+        action="store_true",
+        help=language.get("argparse_no_context_cache_help"),
+    )
+    parser.add_argument(
+        "--list-sessions",
+        action="store_true",
+        help=language.get("argparse_list_sessions_help"),
+    )
 
     try:
         args = parser.parse_args()
@@ -138,6 +228,27 @@ def main() -> int:
     verbose = args.verbose
     user_input = args.text
 
+    if args.metrics_address:
+        metrics.serve(args.metrics_address)
+    if args.metrics_file:
+        atexit.register(metrics.dump, args.metrics_file)
+
+    if args.list_sessions:
+        sessions = list_sessions()
+        if not sessions:
+            print(language.get("sessions_empty"))
+        for entry in sessions:
+            print(
+                language.get(
+                    "session_entry",
+                    entry["id"],
+                    entry["turns"],
+                    entry["updated"],
+                    entry["title"],
+                )
+            )
+        return 0
+
     if not user_input:
         print(language.get("error_no_input"))
         return 1
@@ -145,14 +256,57 @@ def main() -> int:
     if verbose:
         print(language.get("verbose_enabled"))
 
-    client, error_message = initialize_client(api_key)
-    if not client:
-        print(error_message)
+    if args.resume:
+        try:
+            session = Session.load(args.resume)
+        except FileNotFoundError:
+            print(language.get("error_session_not_found", args.resume))
+            return 1
+    else:
+        session = Session.create()
+
+    # An explicit --workspace wins, then the resumed session's, then the default
+    root = args.workspace or session.workspace or WORKING_DIRECTORY
+    try:
+        workspace = Workspace(root)
+    except ValueError:
+        print(language.get("error_invalid_dir", root))
         return 1
 
-    response_text, metadata, function_calls, error_message = generate_content(
-        client, user_input, verbose
-    )
+    if args.fake_backend:
+        client = FakeClient()
+    else:
+        client, error_message = initialize_client(api_key)
+        if not client:
+            print(error_message)
+            return 1
+
+    profiler = MemoryProfiler(enabled=bool(args.profile_memory))
+    turn = len(session.turns) + 1
+
+    # Earlier turns come from the log; their tools are not run again
+    with profiler.phase("session", "load_messages", turn):
+        messages = session.messages()
+        ledger = ContentLedger.from_session(session)
+    messages.append(types.Content(role="user", parts=[types.Part(text=user_input)]))
+    router = Router()
+    router.load_stats(ROUTER_STATS_FILE)
+    # Warm the tools' cache while the model call blocks on the network
+    prefetcher = Prefetcher(workspace) if args.prefetch else None
+    if prefetcher:
+        prefetcher.start()
+    context_cache = None
+    if CONTEXT_CACHE_ENABLED and not args.no_context_cache:
+        context_cache = ContextCache(CONTEXT_CACHE_FILE)
+    with profiler.phase("model", "generate_content", turn):
+        response_text, metadata, function_calls, error_message = generate_content(
+            client, messages, verbose, router, context_cache
+        )
+    if prefetcher:
+        prefetcher.cancel()
+    router.save_stats(ROUTER_STATS_FILE)
+    if context_cache:
+        context_cache.save()
     if error_message:
         print(error_message)
         return 1
@@ -164,40 +318,94 @@ def main() -> int:
         print(language.get("error_no_response", user_input))
 
     # Handle function calls
+    results = []
     if function_calls:
         print("\nFunction Calls:")
         # Map function names to their implementations
         function_map = {
             "get_files_info": get_files_info,
-            "get_file_content": get_file_content,
+            # Files the model already has come back as a reference or a diff
+            "get_file_content": deduplicated_get_file_content(ledger, turn),
+            "get_files_content": deduplicated_get_files_content(ledger, turn),
+            "find_symbol": find_symbol,
+            "outline_file": outline_file,
             "run_python_file": run_python_file,
             "write_file": write_file,
         }
-        for call in function_calls:
-            func_name = call["name"]
-            func_args = call["args"]
-            print(f"Function: {func_name}, Arguments: {func_args}")
-
-            # Execute the function if it exists
-            if func_name in function_map:
-                try:
-                    # Inject WORKING_DIRECTORY as the first argument
-                    result = function_map[func_name](WORKING_DIRECTORY, **func_args)
-                    print(f"Result: {result}")
-                    # print(
-                    #    f"Would call function: {func_name} with arguments {func_args}"
-                    # )
-                except Exception as e:
-                    print(language.get("error_function_execution", func_name, str(e)))
+        # Non-conflicting calls run concurrently; results keep the call order.
+        # Profiling runs them one at a time so each allocation has one owner.
+        results = run_tool_calls(
+            function_calls,
+            profiler.wrap_tools(function_map, turn),
+            workspace,
+            max_workers=1 if profiler.enabled else MAX_TOOL_WORKERS,
+        )
+        for call in results:
+            print(f"Function: {call.name}, Arguments: {call.args}")
+            if call.error is not None:
+                print(call.error)
             else:
-                print(language.get("error_unknown_function", func_name))
+                print(f"Result: {call.result}")
+
+    if prefetcher:
+        metadata["prefetch"] = prefetcher.finish()
+
+    session.append_turn(
+        user_input,
+        response_text,
+        function_calls,
+        results,
+        metadata,
+        workspace,
+        ledger.take_recorded(),
+    )
+    print(language.get("session_saved", session.session_id))
+
+    if profiler.enabled:
+        report, error = profiler.write_report(args.profile_memory, session.session_id)
+        if error is None:
+            print(language.get("memory_report_saved", args.profile_memory))
+        else:
+            print(language.get("error_memory_report", args.profile_memory, error))
+        for phase in report["growing"]:
+            print(language.get("memory_growing", phase["name"], GROWTH_TURNS))
 
     # Print metadata if verbose
-    if metadata:
-        print(language.get("user_prompt", user_input))
-        print(language.get("prompt_tokens", metadata["prompt_tokens"]))
-        print(language.get("response_tokens", metadata["response_tokens"]))
-        print(language.get("total_tokens", metadata["total_tokens"]))
+    if verbose and metadata:
+        route = metadata["route"]
+        print(language.get("route_info", route["model"], route["reason"]))
+        if "cache" in route:
+            print(
+                language.get(
+                    "context_cache_info",
+                    route["cache"]["result"],
+                    route["cache"]["contents"],
+                )
+            )
+        if "prefetch" in metadata:
+            stats = metadata["prefetch"]
+            print(
+                language.get(
+                    "prefetch_info",
+                    stats["entries"],
+                    stats["bytes"],
+                    stats["used"],
+                    stats["hits"],
+                    stats["misses"],
+                )
+            )
+        if "total_tokens" in metadata:
+            print(language.get("user_prompt", user_input))
+            print(language.get("prompt_tokens", metadata["prompt_tokens"]))
+            print(
+                language.get(
+                    "cached_tokens",
+                    metadata["cached_tokens"],
+                    (metadata["prompt_tokens"] or 0) - metadata["cached_tokens"],
+                )
+            )
+            print(language.get("response_tokens", metadata["response_tokens"]))
+            print(language.get("total_tokens", metadata["total_tokens"]))
     return 0
 
 
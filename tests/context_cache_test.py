@@ -0,0 +1,193 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from google.genai import errors, types
+
+from functions.context_cache import ContextCache
+from functions.fake_backend import FakeClient
+from functions.router import Route, Router
+
+ROUTES = [Route("model", cost=1, max_prompt_chars=None, tools=True)]
+CONFIG = types.GenerateContentConfig(
+    system_instruction="You are a helpful agent. " * 40,
+    tools=[
+        types.Tool(
+            function_declarations=[
+                types.FunctionDeclaration(name="get_files_info", description="List")
+            ]
+        )
+    ],
+)
+
+
+def conversation(*texts):
+    return [
+        types.Content(
+            role="user" if i % 2 == 0 else "model", parts=[types.Part(text=t)]
+        )
+        for i, t in enumerate(texts)
+    ]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestContextCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = FakeClient(clock=self.clock)
+        self.router = Router(ROUTES, clock=self.clock)
+
+    def _cache(self, **options):
+        options.setdefault("min_tokens", 100)
+        options.setdefault("min_growth_tokens", 500)
+        return ContextCache(clock=self.clock, **options)
+
+    def _generate(self, cache, messages):
+        response, route = self.router.generate(self.client, messages, CONFIG, cache)
+        return response, route["cache"], self.client.calls[-1]
+
+    def test_static_prefix_is_cached_and_reused(self):
+        cache = self._cache()
+        response, info, call = self._generate(cache, conversation("hi"))
+        self.assertEqual(info["result"], "miss")
+        self.assertEqual(info["contents"], 0)
+        self.assertIsNone(call["config"].system_instruction)
+        self.assertIsNone(call["config"].tools)
+        self.assertEqual(call["config"].cached_content, info["name"])
+        self.assertGreater(response.usage_metadata.cached_content_token_count, 200)
+
+        # A later turn reuses it, sending only what follows the prefix
+        messages = conversation("hi", "hello", "read a.py")
+        _, again, call = self._generate(cache, messages)
+        self.assertEqual(again["result"], "hit")
+        self.assertEqual(again["name"], info["name"])
+        self.assertEqual(call["contents"], messages)
+        self.assertEqual(self.client.cache_calls, [("create", "model")])
+
+    def test_long_history_gets_a_longer_handle(self):
+        cache = self._cache()
+        self._generate(cache, conversation("hi"))
+        messages = conversation("hi", "x" * 4000, "next")
+        _, info, call = self._generate(cache, messages)
+        self.assertEqual((info["result"], info["contents"]), ("miss", 2))
+        self.assertEqual(call["contents"], messages[2:])
+        # The static-only handle is kept for other sessions
+        self.assertEqual(len(cache.handles), 2)
+
+        more = messages + conversation("answer", "and then")
+        _, info, call = self._generate(cache, more)
+        self.assertEqual((info["result"], info["contents"]), ("hit", 2))
+        self.assertEqual(call["contents"], more[2:])
+
+    def test_other_conversations_keep_their_handles(self):
+        cache = self._cache()
+        first = conversation("hi", "a" * 4000, "next")
+        _, a, _ = self._generate(cache, first)
+        second = conversation("hello", "b" * 8000, "next", "c" * 4000, "more")
+        _, b, _ = self._generate(cache, second)
+        self.assertEqual((b["result"], b["contents"]), ("miss", 4))
+        self.assertNotIn(("delete", a["name"]), self.client.cache_calls)
+
+        # The first conversation still reuses its own handle
+        _, again, _ = self._generate(cache, first + conversation("ok", "go on"))
+        self.assertEqual((again["result"], again["name"]), ("hit", a["name"]))
+        self.assertEqual(
+            [call for call in self.client.cache_calls if call[0] == "create"],
+            [("create", "model")] * 2,
+        )
+
+    def test_ttl_is_refreshed_and_handles_persist(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "context_cache.json"
+            cache = self._cache(path=path, ttl=1000, refresh=300)
+            _, info, _ = self._generate(cache, conversation("hi"))
+            cache.save()
+
+            self.clock.now += 800
+            reloaded = self._cache(path=path, ttl=1000, refresh=300)
+            _, again, _ = self._generate(reloaded, conversation("hi"))
+            self.assertEqual(
+                (again["result"], again["name"]), ("refresh", info["name"])
+            )
+            self.assertEqual(self.client.cache_calls[-1], ("update", info["name"]))
+            self.assertEqual(reloaded.handles[info["name"]]["expires"], 2800)
+
+    def test_unwritable_or_malformed_file_is_not_fatal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "context_cache.json"
+            path.mkdir()
+            cache = self._cache(path=path)
+            self._generate(cache, conversation("hi"))
+            self.assertFalse(cache.save())
+            self.assertEqual(os.listdir(directory), ["context_cache.json"])
+            path.rmdir()
+            path.write_text('{"handles": {"x": {"expires": 5000}}}')
+            self.assertEqual(self._cache(path=path).handles, {})
+
+    def test_expired_handle_falls_back_to_the_full_prompt(self):
+        cache = self._cache()
+        _, info, _ = self._generate(cache, conversation("hi"))
+        del self.client.caches.entries[info["name"]]
+        response, again, call = self._generate(cache, conversation("hi"))
+        self.assertEqual(again["result"], "error")
+        self.assertIsNotNone(call["config"].system_instruction)
+        self.assertIsNone(response.usage_metadata.cached_content_token_count)
+        self.assertNotIn(info["name"], cache.handles)
+
+    def test_unavailable_caching_is_not_retried_for_a_while(self):
+        self.client.caching = False
+        cache = self._cache(retry=600)
+        _, info, call = self._generate(cache, conversation("hi"))
+        self.assertEqual(info["result"], "unavailable")
+        self.assertIsNone(call["config"].cached_content)
+        self._generate(cache, conversation("hi"))
+        self.assertEqual(len(self.client.cache_calls), 1)
+        self.clock.now += 601
+        self._generate(cache, conversation("hi"))
+        self.assertEqual(len(self.client.cache_calls), 2)
+
+    def test_small_prompts_are_not_cached(self):
+        cache = self._cache(min_tokens=10**6)
+        _, info, _ = self._generate(cache, conversation("hi"))
+        self.assertEqual(info["result"], "skipped")
+        self.assertEqual(self.client.cache_calls, [])
+
+
+class TestFakeCaches(unittest.TestCase):
+    def test_cache_endpoints(self):
+        clock = FakeClock()
+        client = FakeClient(clock=clock, cache_min_tokens=50)
+        with self.assertRaises(errors.ClientError):
+            client.caches.create(
+                model="model",
+                config=types.CreateCachedContentConfig(system_instruction="short"),
+            )
+        cached = client.caches.create(
+            model="model",
+            config=types.CreateCachedContentConfig(
+                system_instruction="long " * 100, ttl="60s"
+            ),
+        )
+        self.assertEqual(cached.usage_metadata.total_token_count, 125)
+        self.assertEqual(cached.expire_time.timestamp(), 1060)
+        client.caches.update(
+            name=cached.name, config=types.UpdateCachedContentConfig(ttl="120s")
+        )
+        self.assertEqual(
+            client.caches.get(name=cached.name).expire_time.timestamp(), 1120
+        )
+        clock.now += 121
+        with self.assertRaises(errors.ClientError):
+            client.caches.get(name=cached.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
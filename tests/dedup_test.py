@@ -0,0 +1,106 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from functions.dedup import (
+    ContentLedger,
+    deduplicated_get_file_content,
+    deduplicated_get_files_content,
+)
+from functions.scheduler import ToolResult
+from functions.session import Session
+from functions.workspace import Workspace
+
+LINES = "".join(f"line {i}\n" for i in range(200))
+
+
+class TestContentLedger(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+        (self.base / "project").mkdir()
+        self.file = self.base / "project" / "a.py"
+        self.file.write_text(LINES)
+        self.workspace = Workspace(self.base / "project")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_full_then_unchanged_then_diff(self):
+        ledger = ContentLedger()
+        read = deduplicated_get_file_content(ledger, turn=1)
+        self.assertEqual(read(self.workspace, "a.py"), LINES)
+        again = deduplicated_get_file_content(ledger, turn=2)(self.workspace, "./a.py")
+        self.assertIn("unchanged since turn 1", again)
+        self.file.write_text(LINES.replace("line 100\n", "line one hundred\n"))
+        diff = deduplicated_get_file_content(ledger, turn=3)(self.workspace, "a.py")
+        self.assertIn("changed since turn 1", diff)
+        self.assertIn("-line 100\n+line one hundred\n", diff)
+        self.assertLess(len(diff), len(LINES) / 5)
+        later = deduplicated_get_file_content(ledger, turn=4)(self.workspace, "a.py")
+        self.assertIn("unchanged since turn 3", later)
+
+    def test_rewritten_file_is_sent_in_full(self):
+        ledger = ContentLedger()
+        deduplicated_get_file_content(ledger, 1)(self.workspace, "a.py")
+        self.file.write_text("something else entirely\n")
+        self.assertEqual(
+            deduplicated_get_file_content(ledger, 2)(self.workspace, "a.py"),
+            "something else entirely\n",
+        )
+
+    def test_batched_reads_share_the_ledger(self):
+        (self.base / "project" / "b.py").write_text("b\n")
+        ledger = ContentLedger()
+        deduplicated_get_file_content(ledger, 1)(self.workspace, "a.py")
+        self.file.write_text(LINES + "line 200\n")
+        files = deduplicated_get_files_content(ledger, 2)(
+            self.workspace, ["a.py", "b.py", "missing.py"]
+        )["files"]
+        self.assertEqual(files[0]["since_turn"], 1)
+        self.assertIn("+line 200\n", files[0]["diff"])
+        self.assertEqual(files[1], {"file": "b.py", "content": "b\n"})
+        self.assertIn("error", files[2])
+        again = deduplicated_get_files_content(ledger, 3)(self.workspace, ["b.py"])
+        self.assertEqual(again["files"], [{"file": "b.py", "unchanged_since_turn": 2}])
+
+    def test_errors_pass_through(self):
+        read = deduplicated_get_file_content(ContentLedger(), 1)
+        self.assertIn("not found", read(self.workspace, "missing.py"))
+
+    def test_unwritable_blob_directory_is_not_fatal(self):
+        blobs = self.base / "blobs"
+        blobs.write_text("not a directory")
+        read = deduplicated_get_file_content(ContentLedger(blobs), 1)
+        self.assertEqual(read(self.workspace, "a.py"), LINES)
+        self.assertIn("unchanged", read(self.workspace, "a.py"))
+        self.assertEqual(
+            sorted(p.name for p in self.base.iterdir()), ["blobs", "project"]
+        )
+
+    def test_resumed_session_remembers_delivered_versions(self):
+        session = Session.create(self.base / "sessions")
+        ledger = ContentLedger.from_session(session)
+        result = deduplicated_get_file_content(ledger, 1)(self.workspace, "a.py")
+        session.append_turn(
+            "read a.py",
+            "",
+            [{"name": "get_file_content", "args": {"file": "a.py"}}],
+            [ToolResult("get_file_content", {"file": "a.py"}, result, None)],
+            None,
+            self.workspace,
+            ledger.take_recorded(),
+        )
+        self.assertEqual(ledger.take_recorded(), {})
+        self.file.write_text(LINES + "line 200\n")
+
+        resumed = Session.load(session.session_id, self.base / "sessions")
+        ledger = ContentLedger.from_session(resumed)
+        diff = deduplicated_get_file_content(ledger, 2)(self.workspace, "a.py")
+        self.assertIn("changed since turn 1", diff)
+        self.assertIn("+line 200\n", diff)
+        self.assertEqual(list(ledger.take_recorded()), [str(self.file.resolve())])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from functions.language import (
+    Language,
+    _cache_path,
+    clear_catalog_cache,
+    fallback_chain,
+    get_catalog,
+)
+
+
+class TestLanguage(unittest.TestCase):
+    def setUp(self):
+        clear_catalog_cache()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.locales = Path(self.temp_dir.name)
+        self._write(
+            "en",
+            {
+                "static": "Directory is {{empty}}",
+                "one": "Error: '{0}' not found",
+                "two": "{0} is outside '{1}'",
+                "auto": "{} and {!r}",
+                "spec": "{0:>5}|",
+                "named": "Hello {name}",
+                "bad_conversion": "{0!x} here",
+                "only_en": "English only",
+            },
+        )
+        self._write("pt", {"one": "Erro: '{0}' ausente"})
+
+    def tearDown(self):
+        clear_catalog_cache()
+        self.temp_dir.cleanup()
+
+    def _write(self, code, translations):
+        with open(self.locales / f"{code}.json", "w", encoding="utf-8") as f:
+            json.dump({code: translations}, f)
+
+    def test_formats_like_str_format(self):
+        language = Language("en", self.locales)
+        self.assertEqual(language.get("static"), "Directory is {empty}")
+        self.assertEqual(language.get("one", Path("a.py")), "Error: 'a.py' not found")
+        self.assertEqual(language.get("two", "x", 3), "x is outside '3'")
+        self.assertEqual(language.get("auto", 1, "b"), "1 and 'b'")
+        self.assertEqual(language.get("spec", 7), "    7|")
+
+    def test_formatting_failures_return_unformatted_message(self):
+        language = Language("en", self.locales)
+        self.assertEqual(language.get("two", "x"), "{0} is outside '{1}'")
+        self.assertEqual(language.get("named", "x"), "Hello {name}")
+
+    def test_invalid_template_only_breaks_its_own_key(self):
+        language = Language("en", self.locales)
+        self.assertEqual(language.get("bad_conversion", "x"), "{0!x} here")
+        self.assertEqual(language.get("one", "a.py"), "Error: 'a.py' not found")
+
+    def test_missing_key(self):
+        language = Language("en", self.locales)
+        self.assertEqual(language.get("nope"), "Missing translation: nope")
+        self.assertEqual(language.get("nope", 1, default="got {0}"), "got 1")
+
+    def test_catalog_loaded_lazily(self):
+        language = Language("en", self.locales)
+        self.assertIsNone(language._entries)
+        language.get("static")
+        self.assertIsNotNone(language._entries)
+
+    def test_fallback_chain(self):
+        self.assertEqual(fallback_chain("pt-BR"), ["pt_BR", "pt", "en"])
+        language = Language("pt_BR", self.locales)
+        self.assertEqual(language.get("one", "x"), "Erro: 'x' ausente")
+        self.assertEqual(language.get("only_en"), "English only")
+
+    def test_catalog_shared_between_instances(self):
+        Language("pt", self.locales).get("one")
+        Language("pt", self.locales).get("one")
+        self.assertIs(get_catalog("pt", self.locales), get_catalog("pt", self.locales))
+
+    def test_binary_cache_invalidated_by_source_change(self):
+        Language("en", self.locales).get("static")
+        cache_file = _cache_path((self.locales / "en.json").resolve())
+        self.assertTrue(cache_file.is_file())
+        # Marshalled bytecode is only valid for the interpreter that wrote it
+        self.assertIn(sys.implementation.cache_tag, cache_file.name)
+        self._write("en", {"static": "Changed and longer"})
+        clear_catalog_cache()
+        self.assertEqual(
+            Language("en", self.locales).get("static"), "Changed and longer"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
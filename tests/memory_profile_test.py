@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from functions.memory_profile import MemoryProfiler, growing_phases
+
+
+def phase(turn, name, retained, kind="tool"):
+    return {"turn": turn, "kind": kind, "name": name, "retained": retained}
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    def setUp(self):
+        self.was_tracing = tracemalloc.is_tracing()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        if not self.was_tracing:
+            tracemalloc.stop()
+        self.temp_dir.cleanup()
+
+    def test_records_retained_and_peak_per_tool(self):
+        profiler = MemoryProfiler()
+        kept = []
+
+        def get_file_content(work_directory, file):
+            kept.append("x" * 1_000_000)
+            scratch = "y" * 4_000_000
+            return len(scratch)
+
+        tools = profiler.wrap_tools({"get_file_content": get_file_content}, turn=2)
+        self.assertEqual(tools["get_file_content"](".", file="a"), 4_000_000)
+        [record] = profiler.phases
+        self.assertEqual((record["turn"], record["kind"]), (2, "tool"))
+        self.assertGreaterEqual(record["retained"], 1_000_000)
+        self.assertLess(record["retained"], 2_000_000)
+        self.assertGreaterEqual(record["peak"], 5_000_000)
+        self.assertTrue(any(site["size_diff"] >= 1_000_000 for site in record["top"]))
+
+    def test_disabled_profiler_is_transparent(self):
+        profiler = MemoryProfiler(enabled=False)
+        tools = {"f": lambda d: d}
+        self.assertIs(profiler.wrap_tools(tools, 1), tools)
+        with profiler.phase("model", "generate_content", 1):
+            pass
+        self.assertEqual(profiler.phases, [])
+
+    def test_growing_phases(self):
+        phases = [
+            phase(1, "run_python_file", 10),
+            phase(2, "run_python_file", 20),
+            phase(3, "run_python_file", 15),
+            phase(3, "run_python_file", 15),
+            phase(4, "run_python_file", 40),
+            phase(1, "get_file_content", 10),
+            phase(2, "get_file_content", 5),
+            phase(3, "get_file_content", 50),
+            phase(4, "get_file_content", 60),
+        ]
+        self.assertEqual(
+            growing_phases(phases),
+            [
+                {
+                    "kind": "tool",
+                    "name": "run_python_file",
+                    "retained": [10, 20, 30, 40],
+                }
+            ],
+        )
+
+    def test_report_accumulates_runs_of_the_same_session(self):
+        path = Path(self.temp_dir.name) / "reports" / "memory.json"
+        for turn in (1, 2):
+            profiler = MemoryProfiler()
+            with profiler.phase("model", "generate_content", turn):
+                pass
+            profiler.write_report(str(path), "s1")
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual(len(report["runs"]), 2)
+        self.assertEqual([p["turn"] for p in report["phases"]], [1, 2])
+        report, error = MemoryProfiler().write_report(str(path), "s2")
+        self.assertIsNone(error)
+        self.assertEqual((len(report["runs"]), report["phases"]), (1, []))
+
+    def test_unwritable_report_is_not_fatal(self):
+        path = Path(self.temp_dir.name) / "memory.json"
+        path.mkdir()
+        report, error = MemoryProfiler().write_report(str(path), "s1")
+        self.assertIsInstance(error, OSError)
+        self.assertEqual(len(report["runs"]), 1)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["memory.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import urllib.request
+
+from functions.language import language
+from functions.metrics import ERRORS, TOOL_CALLS, TOOL_LATENCY, MetricsRegistry
+from functions.scheduler import run_tool_calls
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.calls = self.registry.counter("calls_total", "Calls.", ["tool"])
+        self.latency = self.registry.histogram(
+            "latency_seconds", "Latency.", ["tool"], buckets=(0.1, 1.0)
+        )
+
+    def test_renders_prometheus_text(self):
+        self.calls.inc(tool='say "hi"')
+        self.calls.inc(2, tool='say "hi"')
+        for value in (0.05, 0.1, 0.5, 3.0):
+            self.latency.observe(value, tool="run")
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP calls_total Calls.\n"
+            "# TYPE calls_total counter\n"
+            'calls_total{tool="say \\"hi\\""} 3\n'
+            "# HELP latency_seconds Latency.\n"
+            "# TYPE latency_seconds histogram\n"
+            'latency_seconds_bucket{tool="run",le="0.1"} 2\n'
+            'latency_seconds_bucket{tool="run",le="1"} 3\n'
+            'latency_seconds_bucket{tool="run",le="+Inf"} 4\n'
+            'latency_seconds_sum{tool="run"} 3.65\n'
+            'latency_seconds_count{tool="run"} 4\n',
+        )
+
+    def test_labels_must_match(self):
+        with self.assertRaises(ValueError):
+            self.calls.inc(model="x")
+        self.assertIs(self.registry.counter("calls_total", "Calls."), self.calls)
+        with self.assertRaises(ValueError):
+            self.registry.histogram("calls_total", "Calls.")
+
+    def test_serves_over_http(self):
+        self.calls.inc(tool="get_files_info")
+        server = self.registry.serve("127.0.0.1:0")
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as r:
+                body = r.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('calls_total{tool="get_files_info"} 1', body)
+
+
+class TestAgentMetrics(unittest.TestCase):
+    def test_tool_calls_and_error_keys_are_counted(self):
+        def get_file_content(work_directory, file):
+            return language.get("error_file_access")
+
+        before = TOOL_CALLS.value(tool="get_file_content", outcome="ok")
+        errors_before = ERRORS.value(key="error_file_access")
+        run_tool_calls(
+            [{"name": "get_file_content", "args": {"file": "a"}}],
+            {"get_file_content": get_file_content},
+            ".",
+        )
+        self.assertEqual(
+            TOOL_CALLS.value(tool="get_file_content", outcome="ok"), before + 1
+        )
+        self.assertGreaterEqual(TOOL_LATENCY.count(tool="get_file_content"), 1)
+        self.assertEqual(ERRORS.value(key="error_file_access"), errors_before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
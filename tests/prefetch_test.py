@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from functions.path_utils import get_file_content, get_files_info, write_file
+from functions.prefetch import Prefetcher
+from functions.workspace import Workspace
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve()
+        (self.root / "pkg" / "deep").mkdir(parents=True)
+        for index, name in enumerate(
+            ["old.py", "new.py", "pkg/mod.py", "pkg/deep/x.py", ".hidden"]
+        ):
+            path = self.root / name
+            path.write_text(f"# {name}\n")
+            os.utime(path, ns=(index * 10**9, index * 10**9))
+        (self.root / "big.txt").write_text("x" * 100)
+        os.utime(self.root / "big.txt", ns=(0, 0))
+        self.workspace = Workspace(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _prefetch(self, **limits):
+        prefetcher = Prefetcher(self.workspace, max_file_bytes=50, **limits)
+        prefetcher.start()
+        prefetcher._thread.join()
+        return prefetcher
+
+    def test_prefetches_listing_and_newest_small_files(self):
+        prefetcher = self._prefetch(max_files=2)
+        self.assertEqual(
+            sorted(
+                (kind, os.path.relpath(path, self.root))
+                for kind, path in prefetcher._entries
+            ),
+            [("file", "new.py"), ("file", "pkg/mod.py"), ("listing", ".")],
+        )
+        prefetcher.finish()
+
+    def test_tools_use_fresh_entries_and_report_hits(self):
+        prefetcher = self._prefetch()
+        listing = get_files_info(self.workspace)
+        self.assertIn("- new.py:", listing)
+        self.assertEqual(get_file_content(self.workspace, "new.py"), "# new.py\n")
+        # Not prefetched: too deep, too big
+        get_file_content(self.workspace, "pkg/deep/x.py")
+        get_file_content(self.workspace, "big.txt")
+        (self.root / "old.py").write_text("# changed\n")
+        self.assertEqual(get_file_content(self.workspace, "old.py"), "# changed\n")
+        stats = prefetcher.finish()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual(stats["used"], 2)
+        self.assertEqual(stats["entries"], 4)
+        self.assertNotIn("prefetch", self.workspace.cache)
+
+    def test_listing_is_stale_after_in_place_edit(self):
+        directory_mtime = os.stat(self.root).st_mtime_ns
+        prefetcher = self._prefetch()
+        (self.root / "new.py").write_text("# grown in place\n")
+        os.utime(self.root, ns=(directory_mtime, directory_mtime))
+        self.assertIn("- new.py: file_size=17 bytes", get_files_info(self.workspace))
+        self.assertEqual((prefetcher.hits, prefetcher.misses), (0, 1))
+        prefetcher.finish()
+
+    def test_writes_drop_prefetched_entries(self):
+        prefetcher = self._prefetch()
+        write_file(self.workspace, "new.py", "# rewritten in the same tick\n")
+        self.assertEqual(
+            get_file_content(self.workspace, "new.py"),
+            "# rewritten in the same tick\n",
+        )
+        self.assertEqual(prefetcher.hits, 0)
+        prefetcher.finish()
+
+    def test_memory_limit_and_cancellation(self):
+        prefetcher = self._prefetch(memory_limit=1)
+        self.assertEqual(prefetcher._entries, {})
+        prefetcher.finish()
+
+        cancelled = Prefetcher(self.workspace)
+        cancelled.cancel()
+        cancelled._run()
+        self.assertEqual(cancelled._entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from google.genai import types
+
+from functions.fake_backend import FakeClient
+from functions.router import Route, Router, request_signals
+
+ROUTES = [
+    Route("small", cost=1, max_prompt_chars=100, tools=False),
+    Route("medium", cost=2, max_prompt_chars=1000, tools=True),
+    Route("large", cost=8, max_prompt_chars=None, tools=True),
+]
+
+
+def prompt(text):
+    return [types.Content(role="user", parts=[types.Part(text=text)])]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.router = Router(
+            ROUTES, latency_budget=1.0, max_error_rate=0.2, clock=self.clock
+        )
+
+    def test_signals(self):
+        self.assertEqual(
+            request_signals(prompt("hello there")),
+            {"prompt_chars": 11, "needs_tools": False},
+        )
+        self.assertTrue(request_signals(prompt("fix main.py"))["needs_tools"])
+
+    def test_cheapest_route_that_fits(self):
+        self.assertEqual(self.router.choose(prompt("hi"))[0][0], "small")
+        self.assertEqual(self.router.choose(prompt("run tests"))[0][0], "medium")
+        self.assertEqual(self.router.choose(prompt("x" * 500))[0][0], "medium")
+        self.assertEqual(self.router.choose(prompt("x" * 5000))[0], ["large"])
+
+    def test_slow_or_failing_models_are_tried_last(self):
+        for _ in range(10):
+            self.router.record("medium", 3.0, True)
+        models, _, reason = self.router.choose(prompt("read a file"))
+        self.assertEqual(models, ["large", "medium", "small"])
+        self.assertIn("medium: p95 3.00s over budget", reason)
+        for _ in range(10):
+            self.router.record("large", 0.1, False)
+        models, _, reason = self.router.choose(prompt("read a file"))
+        self.assertEqual(models[:2], ["medium", "large"])
+        self.assertTrue(reason.startswith("no healthy route"))
+
+    def test_falls_back_and_records_route(self):
+        client = FakeClient(
+            latencies={"small": 0.5, "medium": 0.25},
+            failures={"small": 1},
+            sleep=self.clock.advance,
+        )
+        response, route = self.router.generate(client, prompt("hi"), None)
+        self.assertEqual(response.text, "[medium] ok")
+        self.assertEqual(route["model"], "medium")
+        self.assertEqual(
+            [(a["model"], a["seconds"]) for a in route["attempts"]],
+            [("small", 0.5), ("medium", 0.25)],
+        )
+        self.assertIn("overloaded", route["attempts"][0]["error"])
+        self.assertEqual(self.router.health["small"].error_rate(), 1.0)
+        self.assertEqual(self.router.health["medium"].p95(), 0.25)
+
+    def test_raises_when_every_route_fails(self):
+        client = FakeClient(failures={"large": -1})
+        with self.assertRaises(Exception):
+            self.router.generate(client, prompt("x" * 5000), None)
+        self.assertEqual(len(client.calls), 1)
+
+    def test_stats_survive_save_and_load(self):
+        self.router.record("small", 0.5, True)
+        self.router.record("small", 0.0, False)
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "stats" / "router.json")
+            self.router.save_stats(path)
+            router = Router(ROUTES)
+            router.load_stats(path)
+        self.assertEqual(router.health["small"].p95(), 0.5)
+        self.assertEqual(router.health["small"].error_rate(), 0.5)
+
+    def test_malformed_or_unwritable_stats_are_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "router.json"
+            path.write_text(
+                '{"small": {"latencies": [0.5], "outcomes": [true]},'
+                ' "medium": {"latencies": 3}, "large": ["x"]}'
+            )
+            router = Router(ROUTES)
+            router.load_stats(str(path))
+            self.assertEqual(list(router.health["small"].latencies), [0.5])
+            self.assertEqual(len(router.health["medium"].outcomes), 0)
+            self.assertEqual(len(router.health["large"].outcomes), 0)
+            path.write_text("[1, 2]")
+            Router(ROUTES).load_stats(str(path))
+
+            # A directory where the file should go makes the write fail
+            blocked = Path(directory) / "blocked"
+            blocked.mkdir()
+            self.assertFalse(router.save_stats(str(blocked)))
+            self.assertEqual(sorted(os.listdir(directory)), ["blocked", "router.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
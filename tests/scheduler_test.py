@@ -0,0 +1,145 @@
+import threading
+import time
+import unittest
+
+from functions.scheduler import (
+    WORKSPACE,
+    PathLockTable,
+    classify_call,
+    paths_overlap,
+    run_tool_calls,
+)
+
+
+class TestClassification(unittest.TestCase):
+    def test_reads_and_writes(self):
+        self.assertEqual(
+            classify_call("get_file_content", {"file": "./pkg/../a.py"}),
+            (frozenset(["a.py"]), frozenset()),
+        )
+        self.assertEqual(
+            classify_call("write_file", {"file_path": "a.py", "content": ""}),
+            (frozenset(), frozenset(["a.py"])),
+        )
+        self.assertEqual(
+            classify_call("get_files_info", {}), (frozenset([WORKSPACE]), frozenset())
+        )
+        self.assertEqual(
+            classify_call("get_files_content", {"files": ["a.py", "pkg/b.py"]}),
+            (frozenset(["a.py", "pkg/b.py"]), frozenset()),
+        )
+
+    def test_run_python_file_and_unknown_tools_write_everything(self):
+        for name in ("run_python_file", "rm_rf"):
+            self.assertEqual(
+                classify_call(name, {"file_path": "a.py"}),
+                (frozenset(), frozenset([WORKSPACE])),
+            )
+
+    def test_escaping_paths_lock_the_workspace(self):
+        self.assertEqual(
+            classify_call("write_file", {"file_path": "../x"})[1],
+            frozenset([WORKSPACE]),
+        )
+        self.assertEqual(
+            classify_call("write_file", {"file_path": "/etc/x"})[1],
+            frozenset([WORKSPACE]),
+        )
+
+    def test_paths_overlap(self):
+        self.assertTrue(paths_overlap("pkg", "pkg/a.py"))
+        self.assertTrue(paths_overlap(WORKSPACE, "a.py"))
+        self.assertFalse(paths_overlap("pkg", "pkg2/a.py"))
+        self.assertFalse(paths_overlap("a.py", "b.py"))
+
+
+class TestPathLockTable(unittest.TestCase):
+    def test_readers_share_and_writers_wait_in_ticket_order(self):
+        locks = PathLockTable()
+        first = locks.request(frozenset(["a"]), frozenset())
+        second = locks.request(frozenset(["a"]), frozenset())
+        writer = locks.request(frozenset(), frozenset(["a"]))
+        self.assertFalse(locks._blocked(first))
+        self.assertFalse(locks._blocked(second))
+        self.assertTrue(locks._blocked(writer))
+        locks.release(first)
+        locks.release(second)
+        self.assertFalse(locks._blocked(writer))
+
+
+class TestRunToolCalls(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def _record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def _function_map(self):
+        def get_file_content(work_directory, file):
+            self._record(("start", file))
+            time.sleep(0.05)
+            self._record(("end", file))
+            return f"{work_directory}/{file}"
+
+        def write_file(work_directory, file_path, content):
+            self._record(("start", "write " + file_path))
+            time.sleep(0.05)
+            self._record(("end", "write " + file_path))
+            return content
+
+        def run_python_file(work_directory, file_path):
+            self._record(("start", "run " + file_path))
+            self._record(("end", "run " + file_path))
+            raise RuntimeError("boom")
+
+        return {
+            "get_file_content": get_file_content,
+            "write_file": write_file,
+            "run_python_file": run_python_file,
+        }
+
+    def test_independent_reads_run_concurrently(self):
+        calls = [{"name": "get_file_content", "args": {"file": f}} for f in "abc"]
+        start = time.perf_counter()
+        results = run_tool_calls(calls, self._function_map(), "root")
+        self.assertLess(time.perf_counter() - start, 0.12)
+        self.assertEqual([r.result for r in results], ["root/a", "root/b", "root/c"])
+
+    def test_conflicting_calls_keep_model_order(self):
+        calls = [
+            {"name": "write_file", "args": {"file_path": "a.py", "content": "x"}},
+            {"name": "run_python_file", "args": {"file_path": "a.py"}},
+            {"name": "get_file_content", "args": {"file": "a.py"}},
+            {"name": "get_file_content", "args": {"file": "b.py"}},
+            {"name": "no_such_tool", "args": {}},
+        ]
+        results = run_tool_calls(calls, self._function_map(), "root")
+        self.assertEqual([r.name for r in results], [c["name"] for c in calls])
+        self.assertEqual(results[0].result, "x")
+        self.assertIn("boom", results[1].error)
+        self.assertEqual(results[2].result, "root/a.py")
+        self.assertIn("no_such_tool", results[4].error)
+        order = [label for kind, label in self.events if kind == "end"]
+        self.assertEqual(
+            [label for label in order if "a.py" in label],
+            ["write a.py", "run a.py", "a.py"],
+        )
+        # The read of a.py waited for the run, and never overlapped it
+        self.assertLess(
+            self.events.index(("end", "run a.py")),
+            self.events.index(("start", "a.py")),
+        )
+
+    def test_serial_when_single_worker(self):
+        calls = [{"name": "get_file_content", "args": {"file": f}} for f in "ab"]
+        run_tool_calls(calls, self._function_map(), "root", max_workers=1)
+        self.assertEqual(
+            self.events,
+            [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from functions.scheduler import ToolResult
+from functions.session import INDEX_FILE, Session, list_sessions
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _session_with_turns(self):
+        session = Session.create(self.directory)
+        session.append_turn(
+            "read main.py",
+            "Reading it.",
+            [{"name": "get_file_content", "args": {"file": "main.py"}}],
+            [ToolResult("get_file_content", {"file": "main.py"}, "print(1)", None)],
+            {"prompt_tokens": 10, "response_tokens": 5, "total_tokens": 15},
+        )
+        session.append_turn("thanks", "You're welcome.", [], [], None)
+        return session
+
+    def test_resume_rebuilds_messages_without_running_tools(self):
+        session = self._session_with_turns()
+        loaded = Session.load(session.session_id, self.directory)
+        messages = loaded.messages()
+        self.assertEqual(
+            [m.role for m in messages], ["user", "model", "tool", "user", "model"]
+        )
+        self.assertEqual(messages[1].parts[1].function_call.args, {"file": "main.py"})
+        self.assertEqual(
+            messages[2].parts[0].function_response.response, {"result": "print(1)"}
+        )
+        self.assertEqual(loaded.turns[0]["usage"]["total_tokens"], 15)
+
+    def test_index_lists_latest_entry_per_session(self):
+        first = self._session_with_turns()
+        second = Session.create(self.directory)
+        second.append_turn("hello", "hi", [], [], None)
+        sessions = list_sessions(self.directory)
+        self.assertEqual(
+            [s["id"] for s in sessions], [second.session_id, first.session_id]
+        )
+        self.assertEqual(sessions[1]["turns"], 2)
+        self.assertEqual(sessions[1]["title"], "read main.py")
+        self.assertEqual(
+            Session.load("last", self.directory).session_id, second.session_id
+        )
+
+    def test_torn_final_line_is_dropped_and_appends_continue(self):
+        session = self._session_with_turns()
+        with open(session.path, "a", encoding="utf-8") as f:
+            f.write('{"turn": 3, "us')
+        with open(self.directory / INDEX_FILE, "a", encoding="utf-8") as f:
+            f.write('{"id": ')
+        loaded = Session.load(session.session_id, self.directory)
+        self.assertEqual(len(loaded.turns), 2)
+        loaded.append_turn("again", "ok", [], [], None)
+        self.assertEqual(len(Session.load(session.session_id, self.directory).turns), 3)
+        self.assertEqual(len(list_sessions(self.directory)), 1)
+
+    def test_missing_session(self):
+        with self.assertRaises(FileNotFoundError):
+            Session.load("nope", self.directory)
+        with self.assertRaises(FileNotFoundError):
+            Session.load("last", self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
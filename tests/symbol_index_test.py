@@ -0,0 +1,180 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from functions import symbol_index
+from functions.path_utils import get_file_content
+from functions.symbol_index import (
+    SymbolIndex,
+    extract_symbols,
+    find_symbol,
+    outline_file,
+)
+from functions.workspace import Workspace
+
+SOURCE = '''
+import functools
+
+
+class Calculator(Base, metaclass=Meta):
+    """Evaluates infix expressions.
+
+    More detail.
+    """
+
+    @functools.lru_cache
+    def evaluate(self, expression: str) -> float:
+        """Evaluates one expression."""
+
+        def helper():
+            pass
+
+        return 0
+
+    async def _apply_operator(self, operators, values):
+        pass
+
+
+def render(result, *, width=80):
+    return str(result)
+'''
+
+
+class TestExtractSymbols(unittest.TestCase):
+    def test_classes_functions_and_methods(self):
+        symbols = extract_symbols(SOURCE)
+        self.assertEqual(
+            [(s["qualname"], s["kind"]) for s in symbols],
+            [
+                ("Calculator", "class"),
+                ("Calculator.evaluate", "method"),
+                ("Calculator._apply_operator", "method"),
+                ("render", "function"),
+            ],
+        )
+        calculator, evaluate, apply_operator, render = symbols
+        self.assertEqual(
+            calculator["signature"], "class Calculator(Base, metaclass=Meta)"
+        )
+        self.assertEqual(calculator["doc"], "Evaluates infix expressions.")
+        self.assertEqual(
+            evaluate["signature"], "def evaluate(self, expression: str) -> float"
+        )
+        # The range covers the decorator and the whole body
+        self.assertEqual((evaluate["start"], evaluate["end"]), (11, 18))
+        self.assertTrue(apply_operator["signature"].startswith("async def"))
+        self.assertEqual(render["signature"], "def render(result, *, width=80)")
+        self.assertEqual(render["doc"], "")
+
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve() / "project"
+        (self.root / "pkg").mkdir(parents=True)
+        (self.root / "pkg" / "calculator.py").write_text(SOURCE)
+        (self.root / "main.py").write_text("def main():\n    pass\n")
+        (self.root / ".venv").mkdir()
+        (self.root / ".venv" / "hidden.py").write_text("def hidden():\n    pass\n")
+        self.index_file = Path(self.temp_dir.name) / "index.json"
+        patcher = mock.patch.object(
+            symbol_index, "index_file_for", return_value=self.index_file
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.workspace = Workspace(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_refresh_is_incremental_and_persistent(self):
+        index = SymbolIndex(self.root, self.index_file)
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(sorted(index.files), ["main.py", "pkg/calculator.py"])
+        self.assertEqual(index.refresh(), 0)
+
+        # A fresh process picks up the saved index and only parses changes
+        path = self.root / "main.py"
+        path.write_text("def main(argv):\n    pass\n")
+        os.utime(path, ns=(1, 1))
+        reloaded = SymbolIndex(self.root, self.index_file)
+        self.assertEqual(reloaded.refresh(), 1)
+        self.assertEqual(
+            reloaded.files["main.py"]["symbols"][0]["signature"], "def main(argv)"
+        )
+
+        path.unlink()
+        reloaded.refresh()
+        self.assertNotIn("main.py", reloaded.files)
+
+    def test_unwritable_index_and_deep_nesting_are_not_fatal(self):
+        self.index_file.mkdir()
+        (self.root / "deep.py").write_text("x = " + "-" * 100_000 + "1\n")
+        self.assertIn("Calculator.evaluate", find_symbol(self.workspace, "evaluate"))
+        self.assertIn("deeply nested", outline_file(self.workspace, "deep.py"))
+        self.assertEqual(os.listdir(self.index_file), [])
+        self.assertEqual(
+            sorted(os.listdir(self.temp_dir.name)), ["index.json", "project"]
+        )
+
+    def test_parallel_parse_matches_serial(self):
+        for i in range(4):
+            (self.root / f"module{i}.py").write_text(f"def f{i}():\n    pass\n")
+        serial = SymbolIndex(self.root)
+        serial.refresh()
+        with mock.patch.object(symbol_index, "PARALLEL_PARSE_MIN_FILES", 2):
+            parallel = SymbolIndex(self.root)
+            parallel.refresh()
+        self.assertEqual(parallel.files, serial.files)
+
+    def test_find_symbol(self):
+        result = find_symbol(self.workspace, "_apply_operator")
+        self.assertIn(
+            "pkg/calculator.py:20-21 method Calculator._apply_operator", result
+        )
+        # Exact matches hide partial ones; partial ones ignore case
+        self.assertNotIn("render", find_symbol(self.workspace, "Calculator.evaluate"))
+        self.assertIn("Calculator.evaluate", find_symbol(self.workspace, "EVAL"))
+        self.assertIn("No class", find_symbol(self.workspace, "hidden"))
+
+    def test_find_symbol_limits_matches(self):
+        with mock.patch.object(symbol_index, "MAX_SYMBOL_MATCHES", 1):
+            result = find_symbol(self.workspace, "e")
+        self.assertEqual(len(result.splitlines()), 2)
+        self.assertIn("Showing 1 of", result)
+
+    def test_symlinks_are_not_indexed(self):
+        outside = Path(self.temp_dir.name) / "outside"
+        outside.mkdir()
+        (outside / "private.py").write_text('def secret():\n    """Key."""\n')
+        (self.root / "link.py").symlink_to(outside / "private.py")
+        (self.root / "linked").symlink_to(outside, target_is_directory=True)
+        self.assertIn("No class", find_symbol(self.workspace, "secret"))
+        self.assertIn("outside", outline_file(self.workspace, "link.py"))
+
+    def test_outline_file(self):
+        outline = outline_file(self.workspace, "pkg/calculator.py").splitlines()
+        self.assertEqual(
+            outline[0],
+            "5-21 class Calculator(Base, metaclass=Meta)  # Evaluates infix expressions.",
+        )
+        self.assertTrue(outline[1].startswith("    11-18 def evaluate"))
+        (self.root / "broken.py").write_text("def (:\n")
+        self.assertIn("Cannot parse", outline_file(self.workspace, "broken.py"))
+        self.assertIn("outside", outline_file(self.workspace, "../x.py"))
+
+    def test_read_line_range(self):
+        self.assertEqual(
+            get_file_content(self.workspace, "main.py", start_line=2, end_line=2),
+            "2:     pass\n",
+        )
+        self.assertIn(
+            "Invalid line range",
+            get_file_content(self.workspace, "main.py", start_line=3, end_line=1),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from functions.path_utils import (
+    check_path_within_directory,
+    get_file_content,
+    get_files_content,
+    get_files_info,
+    run_python_file,
+    share_budget,
+    write_file,
+)
+from functions.workspace import (
+    Workspace,
+    WorkspaceLimits,
+    clear_workspace_cache,
+    get_workspace,
+)
+
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name).resolve()
+        self.root = self.base / "project"
+        self.root.mkdir()
+        (self.root / "pkg").mkdir()
+        (self.root / "pkg" / "a.txt").write_text("0123456789")
+        (self.base / "secret.txt").write_text("secret")
+        self.workspace = Workspace(self.root)
+
+    def tearDown(self):
+        clear_workspace_cache()
+        self.temp_dir.cleanup()
+
+    def test_resolve_path_stays_inside_root(self):
+        self.assertEqual(
+            self.workspace.resolve_path("pkg/../pkg/a.txt"),
+            (self.root / "pkg" / "a.txt", ""),
+        )
+        self.assertEqual(self.workspace.resolve_path(".")[0], self.root)
+        resolved, error = self.workspace.resolve_path("../secret.txt")
+        self.assertIsNone(resolved)
+        self.assertIn("outside", error)
+
+    def test_symlinks_out_of_the_root_are_refused_on_every_call(self):
+        link = self.root / "link"
+        os.symlink(self.root / "pkg", link)
+        self.assertEqual(get_file_content(self.workspace, "link/a.txt"), "0123456789")
+        link.unlink()
+        os.symlink(self.base, link)
+        self.assertIn("outside", get_file_content(self.workspace, "link/secret.txt"))
+
+    def test_missing_root(self):
+        with self.assertRaises(ValueError):
+            Workspace(self.base / "missing")
+
+    def test_tools_use_the_workspace_limits(self):
+        small = Workspace(self.root, limits=WorkspaceLimits(4, 1))
+        self.assertEqual(
+            get_file_content(small, "pkg/a.txt"),
+            '0123[...File "pkg/a.txt" truncated at 4 characters].',
+        )
+        self.assertEqual(get_file_content(self.workspace, "pkg/a.txt"), "0123456789")
+        (self.root / "slow.py").write_text("import time\ntime.sleep(5)\n")
+        self.assertIn("after 1 seconds", run_python_file(small, "slow.py"))
+
+    def test_get_files_content_reads_a_batch(self):
+        (self.root / "b.txt").write_text("b")
+        result = get_files_content(
+            self.workspace, ["pkg/a.txt", "b.txt", "./b.txt", "../secret.txt", "c"]
+        )
+        files = result["files"]
+        self.assertEqual(
+            files[:2],
+            [
+                {"file": "pkg/a.txt", "content": "0123456789"},
+                {"file": "b.txt", "content": "b"},
+            ],
+        )
+        self.assertIn("outside", files[2]["error"])
+        self.assertIn("not found", files[3]["error"])
+
+    def test_get_files_content_shares_one_budget(self):
+        (self.root / "b.txt").write_text("b")
+        (self.root / "c.txt").write_text("c" * 20)
+        small = Workspace(self.root, limits=WorkspaceLimits(4, 1, 12))
+        files = get_files_content(small, ["b.txt", "pkg/a.txt", "c.txt"])["files"]
+        self.assertEqual(
+            files,
+            [
+                {"file": "b.txt", "content": "b"},
+                {"file": "pkg/a.txt", "content": "01234", "truncated": True},
+                {"file": "c.txt", "content": "cccccc", "truncated": True},
+            ],
+        )
+
+    def test_share_budget(self):
+        self.assertEqual(share_budget([1, 100, 3], 10), [1, 6, 3])
+        self.assertEqual(share_budget([50, 50], 11), [5, 6])
+        self.assertEqual(share_budget([2, 3], 100), [2, 3])
+        self.assertEqual(share_budget([], 100), [])
+
+    def test_workspaces_are_independent(self):
+        other_root = self.base / "other"
+        other_root.mkdir()
+        other = Workspace(other_root)
+        self.assertIn("Successfully", write_file(other, "b.txt", "b"))
+        self.assertIn("a.txt", get_files_info(self.workspace, "pkg"))
+        self.assertIn("b.txt", get_files_info(other))
+        self.assertNotIn("b.txt", get_files_info(self.workspace))
+        self.assertIsNot(self.workspace.cache, other.cache)
+
+    def test_plain_paths_must_be_within_the_working_directory(self):
+        is_valid, error = check_path_within_directory(str(self.root), "pkg")
+        self.assertFalse(is_valid)
+        self.assertIn("outside", error)
+        self.assertIn("not a valid directory", get_files_info(str(self.base / "no")))
+
+    def test_get_workspace_is_cached_by_root(self):
+        self.assertIs(get_workspace(str(self.root)), get_workspace(str(self.root)))
+
+
+if __name__ == "__main__":
+    unittest.main()